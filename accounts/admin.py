@@ -1,27 +1,63 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.http import urlencode
 
-from .models import FriendShip
+from mysite.paginator import EstimatedCountPaginator, capped_count
+from tweets.models import Tweet
+
+from .models import AccountDeletion, FriendShip
 
 User = get_user_model()
+Like = Tweet.liked_by.through
 
 
-class FollowerFriendShipInline(admin.TabularInline):
-    model = FriendShip
-    fk_name = "follower"
+def related_changelist_link(queryset, **params):
+    # 関連する行はインラインで並べず，件数 (ADMIN_COUNT_LIMIT まで) と絞り込んだ一覧へのリンクだけを出す
+    count = capped_count(queryset)
+    label = f"{settings.ADMIN_COUNT_LIMIT}+" if count > settings.ADMIN_COUNT_LIMIT else str(count)
+    opts = queryset.model._meta
+    url = reverse(f"admin:{opts.app_label}_{opts.model_name}_changelist")
+    return format_html('<a href="{}?{}">{}</a>', url, urlencode(params), label)
 
 
-class FollowingFriendShipInline(admin.TabularInline):
-    model = FriendShip
-    fk_name = "following"
+class UserAdmin(admin.ModelAdmin):
+    # フォローやいいねが多いユーザーでも変更画面が重くならないよう，インラインで全件を並べない
+    list_display = ("username", "email", "is_staff", "is_active", "date_joined")
+    list_filter = ("is_staff", "is_active")
+    search_fields = ("username",)
+    readonly_fields = ("follower_list", "following_list", "liking_list")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
+    @admin.display(description="フォロワー")
+    def follower_list(self, obj):
+        return related_changelist_link(FriendShip.objects.filter(follower=obj), follower__id__exact=obj.pk)
 
-class LikingTweetInline(admin.TabularInline):
-    model = User.liking.through
+    @admin.display(description="フォロー中")
+    def following_list(self, obj):
+        return related_changelist_link(FriendShip.objects.filter(following=obj), following__id__exact=obj.pk)
 
+    @admin.display(description="いいね")
+    def liking_list(self, obj):
+        return related_changelist_link(Like.objects.filter(user=obj), user__id__exact=obj.pk)
 
-class UserAdmin(admin.ModelAdmin):
-    inlines = [FollowerFriendShipInline, FollowingFriendShipInline, LikingTweetInline]
+
+class FriendShipAdmin(admin.ModelAdmin):
+    list_display = ("id", "following", "follower", "created_at")
+    list_select_related = ("following", "follower")
+    raw_id_fields = ("following", "follower")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class AccountDeletionAdmin(admin.ModelAdmin):
+    list_display = ("username", "user_id", "stage", "requested_at", "completed_at")
+    list_filter = ("stage",)
 
 
 admin.site.register(User, UserAdmin)
+admin.site.register(FriendShip, FriendShipAdmin)
+admin.site.register(AccountDeletion, AccountDeletionAdmin)
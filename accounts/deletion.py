@@ -0,0 +1,149 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from mysite.db import delete_in
+from tweets.models import ArchivedLike, ArchivedTweet, Like, Tweet
+from tweets.sharding import shard_aliases
+from tweets.tasks import like_count_subquery
+
+from .graph import follow_graph
+from .models import AccountDeletion, FriendShip
+from .summary import record_follows, record_likes
+
+User = get_user_model()
+Stage = AccountDeletion.Stage
+
+
+def request_deletion(user):
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        deletion, _ = AccountDeletion.objects.get_or_create(user_id=user.pk, defaults={"username": user.username})
+    return deletion
+
+
+def across_shards(delete):
+    # ツイートといいねは tweets.sharding で DB が分かれているので，各 DB から合わせて batch_size 行まで消す
+    def run(user_id, batch_size):
+        deleted = 0
+        for alias in shard_aliases():
+            deleted += delete(user_id, batch_size - deleted, using=alias)
+            if deleted >= batch_size:
+                break
+        return deleted
+
+    return run
+
+
+@across_shards
+def _delete_likes(user_id, batch_size, using):
+    # いいねはツイートと同じシャードにあるので，どのシャードにもありうる。
+    # アーカイブしたツイートのいいね (ArchivedLike) も消して，ArchivedTweet.like_count を数え直す
+    deleted = 0
+    for like_model, tweet_model in ((Like, Tweet), (ArchivedLike, ArchivedTweet)):
+        likes = like_model.objects.using(using)
+        rows = list(likes.filter(user_id=user_id).values_list("pk", "tweet_id")[: batch_size - deleted])
+        if not rows:
+            continue
+        likes.filter(pk__in=[pk for pk, _ in rows]).delete()
+        tweets = tweet_model.objects.using(using).filter(pk__in={tweet_id for _, tweet_id in rows})
+        tweets.update(like_count=like_count_subquery(like_model))
+        authors = dict(tweets.values_list("pk", "user_id"))
+        removed = Counter(authors[tweet_id] for _, tweet_id in rows if tweet_id in authors)
+        record_likes({author_id: -count for author_id, count in removed.items()})
+        deleted += len(rows)
+        if deleted >= batch_size:
+            break
+    return deleted
+
+
+@across_shards
+def _delete_tweet_likes(user_id, batch_size, using):
+    # いいねした側のカウンタは持っていないので，行を消すだけでよい
+    deleted = 0
+    for like_model in (Like, ArchivedLike):
+        likes = like_model.objects.using(using)
+        pks = list(likes.filter(tweet__user_id=user_id).values_list("pk", flat=True)[: batch_size - deleted])
+        likes.filter(pk__in=pks).delete()
+        deleted += len(pks)
+        if deleted >= batch_size:
+            break
+    return deleted
+
+
+@across_shards
+def _delete_tweets(user_id, batch_size, using):
+    pks = list(Tweet.objects.using(using).filter(user_id=user_id).values_list("pk", flat=True)[:batch_size])
+    Tweet.objects.using(using).filter(pk__in=pks).delete()
+    return len(pks)
+
+
+@across_shards
+def _delete_archived_tweets(user_id, batch_size, using):
+    archived = ArchivedTweet.objects.using(using)
+    pks = list(archived.filter(user_id=user_id).values_list("pk", flat=True)[:batch_size])
+    archived.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def _delete_follows(user_id, batch_size):
+    # 行ごとの post_delete を飛ばさずに消し，相手側の ProfileSummary はバッチごとにまとめて減らす
+    rows = list(
+        FriendShip.objects.filter(Q(following_id=user_id) | Q(follower_id=user_id)).values_list(
+            "pk", "following_id", "follower_id"
+        )[:batch_size]
+    )
+    if rows:
+        delete_in(FriendShip, [pk for pk, _, _ in rows])
+    for _, following_id, follower_id in rows:
+        follow_graph.invalidate(following_id)
+        follow_graph.invalidate(follower_id)
+    # 退会するユーザーの行は User と一緒に消えるので数えない
+    lost_followings = Counter(following_id for _, following_id, follower_id in rows if follower_id == user_id)
+    lost_followers = Counter(follower_id for _, following_id, follower_id in rows if following_id == user_id)
+    record_follows(
+        {following_id: -count for following_id, count in lost_followings.items() if following_id != user_id},
+        {follower_id: -count for follower_id, count in lost_followers.items() if follower_id != user_id},
+    )
+    return len(rows)
+
+
+STAGES = {
+    Stage.LIKES: _delete_likes,
+    Stage.TWEET_LIKES: _delete_tweet_likes,
+    Stage.TWEETS: _delete_tweets,
+    Stage.ARCHIVED_TWEETS: _delete_archived_tweets,
+    Stage.FOLLOWS: _delete_follows,
+}
+NEXT_STAGE = {
+    Stage.LIKES: Stage.TWEET_LIKES,
+    Stage.TWEET_LIKES: Stage.TWEETS,
+    Stage.TWEETS: Stage.ARCHIVED_TWEETS,
+    Stage.ARCHIVED_TWEETS: Stage.FOLLOWS,
+    Stage.FOLLOWS: Stage.USER,
+    Stage.USER: Stage.DONE,
+}
+
+
+def process_batch(deletion, batch_size):
+    # 1バッチ分だけ進めて，削除した行数を返す。途中で止まっても stage から再開できる
+    with transaction.atomic():
+        if deletion.stage == Stage.USER:
+            User.objects.filter(pk=deletion.user_id).delete()
+            deleted = 1
+        else:
+            deleted = STAGES[deletion.stage](deletion.user_id, batch_size)
+        if deleted < batch_size or deletion.stage == Stage.USER:
+            deletion.stage = NEXT_STAGE[deletion.stage]
+            if deletion.stage == Stage.DONE:
+                deletion.completed_at = timezone.now()
+            deletion.save(update_fields=["stage", "completed_at"])
+    return deleted
+
+
+def process_deletion(deletion, batch_size=1000):
+    while deletion.stage != Stage.DONE:
+        yield deletion.stage, process_batch(deletion, batch_size)
@@ -0,0 +1,125 @@
+import csv
+import json
+import zlib
+from itertools import islice, product
+
+from django.contrib.auth import get_user_model
+
+from tweets.models import ArchivedLike, ArchivedTweet, Like, Tweet
+from tweets.sharding import shard_aliases, shard_for_user
+
+from .models import FriendShip
+
+User = get_user_model()
+
+FIELDS = ("type", "id", "username", "content", "created_at")
+FORMATS = ("jsonl", "csv")
+
+
+def _likes(user, chunk_size):
+    # いいねはいいねされたツイートのシャードにある。シャードでは User と JOIN できないので，作者の名前は default から引く。
+    # アーカイブしたツイートのいいねは ArchivedLike にある
+    for alias, model in product(shard_aliases(), (Like, ArchivedLike)):
+        likes = (
+            model.objects.using(alias)
+            .filter(user_id=user.pk)
+            .order_by("pk")
+            .values_list("tweet_id", "tweet__user_id", "created_at")
+            .iterator(chunk_size=chunk_size)
+        )
+        while chunk := list(islice(likes, chunk_size)):
+            usernames = dict(
+                User.objects.filter(pk__in={author_id for _, author_id, _ in chunk}).values_list("pk", "username")
+            )
+            for tweet_id, author_id, created_at in chunk:
+                yield tweet_id, usernames.get(author_id, ""), created_at
+
+
+def export_rows(user, chunk_size=2000):
+    # .iterator() でチャンクごとに読むので，件数によらずメモリ使用量は一定
+    alias = shard_for_user(user.pk)
+    tweets = Tweet.objects.using(alias).filter(user=user).order_by("pk").only("pk", "created_at", "body")
+    for tweet in tweets.iterator(chunk_size=chunk_size):
+        yield {
+            "type": "tweet",
+            "id": tweet.pk,
+            "username": "",
+            "content": tweet.content,
+            "created_at": tweet.created_at.isoformat(),
+        }
+
+    archived = ArchivedTweet.objects.using(alias).filter(user=user).order_by("pk")
+    for tweet in archived.iterator(chunk_size=chunk_size):
+        yield {
+            "type": "tweet",
+            "id": tweet.pk,
+            "username": "",
+            "content": tweet.content,
+            "created_at": tweet.created_at.isoformat(),
+        }
+
+    for tweet_id, username, created_at in _likes(user, chunk_size):
+        yield {
+            "type": "like",
+            "id": tweet_id,
+            "username": username,
+            "content": "",
+            "created_at": created_at.isoformat(),
+        }
+
+    followings = (
+        FriendShip.objects.filter(following=user).order_by("pk").values_list("follower__username", "created_at")
+    )
+    for username, created_at in followings.iterator(chunk_size=chunk_size):
+        yield {
+            "type": "following",
+            "id": "",
+            "username": username,
+            "content": "",
+            "created_at": created_at.isoformat(),
+        }
+
+    followers = (
+        FriendShip.objects.filter(follower=user).order_by("pk").values_list("following__username", "created_at")
+    )
+    for username, created_at in followers.iterator(chunk_size=chunk_size):
+        yield {"type": "follower", "id": "", "username": username, "content": "", "created_at": created_at.isoformat()}
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in FIELDS])
+
+
+def gzip_stream(lines, buffer_size=64 * 1024):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            chunk = compressor.compress(b"".join(buffer))
+            buffer, size = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b"".join(buffer)) + compressor.flush()
+
+
+def export_archive(user, format="jsonl", chunk_size=2000):
+    rows = export_rows(user, chunk_size=chunk_size)
+    lines = csv_lines(rows) if format == "csv" else jsonl_lines(rows)
+    return gzip_stream(lines)
@@ -0,0 +1,118 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import FriendShip
+
+
+class FollowGraph:
+    # プロセス内のフォロー関係インデックス。ユーザーごとのフォロー先IDをソート済み配列で持ち、
+    # 載っていないユーザーはDBから読み込む。保持する辺の総数が max_edges を超えたら古いものから捨てる。
+    def __init__(self, max_edges=None, ttl=None):
+        self.max_edges = settings.FOLLOW_GRAPH_MAX_EDGES if max_edges is None else max_edges
+        self.ttl = settings.FOLLOW_GRAPH_TTL if ttl is None else ttl
+        self._followings = OrderedDict()
+        self._follower_counts = OrderedDict()
+        self._edge_count = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._edge_count
+
+    def clear(self):
+        with self._lock:
+            self._followings.clear()
+            self._follower_counts.clear()
+            self._edge_count = 0
+
+    def prime(self, user_id, following_ids):
+        ids = array("q", sorted(set(following_ids)))
+        with self._lock:
+            self._discard(user_id)
+            self._followings[user_id] = (time.monotonic(), ids)
+            self._edge_count += len(ids)
+            self._evict()
+        return ids
+
+    def followings(self, user_id):
+        with self._lock:
+            entry = self._followings.get(user_id)
+            if entry is not None and not self._expired(entry[0]):
+                self._followings.move_to_end(user_id)
+                return entry[1]
+        following_ids = FriendShip.objects.filter(following_id=user_id).values_list("follower_id", flat=True)
+        return self.prime(user_id, following_ids)
+
+    def is_following(self, user_id, target_id):
+        ids = self.followings(user_id)
+        i = bisect_left(ids, target_id)
+        return i < len(ids) and ids[i] == target_id
+
+    def is_mutual(self, user_id, target_id):
+        return self.is_following(user_id, target_id) and self.is_following(target_id, user_id)
+
+    def following_count(self, user_id):
+        return len(self.followings(user_id))
+
+    def follower_count(self, user_id):
+        with self._lock:
+            entry = self._follower_counts.get(user_id)
+            if entry is not None and not self._expired(entry[0]):
+                self._follower_counts.move_to_end(user_id)
+                return entry[1]
+        count = FriendShip.objects.filter(follower_id=user_id).count()
+        with self._lock:
+            self._follower_counts[user_id] = (time.monotonic(), count)
+            self._evict()
+        return count
+
+    def add_edge(self, user_id, target_id):
+        with self._lock:
+            entry = self._followings.get(user_id)
+            if entry is not None:
+                ids = entry[1]
+                i = bisect_left(ids, target_id)
+                if i == len(ids) or ids[i] != target_id:
+                    insort(ids, target_id)
+                    self._edge_count += 1
+            self._follower_counts.pop(target_id, None)
+            self._evict()
+
+    def remove_edge(self, user_id, target_id):
+        with self._lock:
+            entry = self._followings.get(user_id)
+            if entry is not None:
+                ids = entry[1]
+                i = bisect_left(ids, target_id)
+                if i < len(ids) and ids[i] == target_id:
+                    del ids[i]
+                    self._edge_count -= 1
+            self._follower_counts.pop(target_id, None)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._discard(user_id)
+            self._follower_counts.pop(user_id, None)
+
+    def _expired(self, loaded_at):
+        return self.ttl is not None and time.monotonic() - loaded_at > self.ttl
+
+    def _discard(self, user_id):
+        entry = self._followings.pop(user_id, None)
+        if entry is not None:
+            self._edge_count -= len(entry[1])
+
+    def _evict(self):
+        # 件数キャッシュも1件=1辺として上限に含める
+        while self._followings and self._edge_count + len(self._follower_counts) > self.max_edges:
+            _, (_, ids) = self._followings.popitem(last=False)
+            self._edge_count -= len(ids)
+        while self._follower_counts and len(self._follower_counts) > self.max_edges:
+            self._follower_counts.popitem(last=False)
+
+
+follow_graph = FollowGraph()
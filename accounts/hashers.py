@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+# settings.PASSWORD_HASHER で選べる形式
+HASHERS = {
+    "scrypt": "accounts.hashers.ScryptPasswordHasher",
+    "argon2": "accounts.hashers.Argon2PasswordHasher",
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+}
+
+
+def password_hashers(preferred):
+    # PASSWORD_HASHERS の値。preferred で保存し，ほかの形式のハッシュも検証できるように後ろに並べる
+    return [HASHERS[preferred], *(path for name, path in HASHERS.items() if name != preferred)]
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    # パラメータは settings.PASSWORD_SCRYPT で調整する。変更すると次のログイン時にハッシュが作り直される
+    def __init__(self):
+        params = settings.PASSWORD_SCRYPT
+        self.work_factor = params["work_factor"]
+        self.block_size = params["block_size"]
+        self.parallelism = params["parallelism"]
+        # OpenSSL の既定の上限 (32MiB) では work_factor=2**15 以上を計算できない
+        self.maxmem = 2 * 128 * self.work_factor * self.block_size * self.parallelism
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    # argon2-cffi が必要。パラメータは settings.PASSWORD_ARGON2 で調整する
+    def __init__(self):
+        params = settings.PASSWORD_ARGON2
+        self.time_cost = params["time_cost"]
+        self.memory_cost = params["memory_cost"]
+        self.parallelism = params["parallelism"]
@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.exports import FORMATS, export_archive
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Export a user's tweets, likes and follow lists as gzip-compressed JSONL or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--format", choices=FORMATS, default="jsonl")
+        parser.add_argument("--output", help="Defaults to <username>.<format>.gz")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, username, format, output, chunk_size, **options):
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f"User {username!r} does not exist.")
+        output = output or f"{username}.{format}.gz"
+        with open(output, "wb") as f:
+            for chunk in export_archive(user, format=format, chunk_size=chunk_size):
+                f.write(chunk)
+        self.stdout.write(f"Exported {username} to {output}")
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.graph import follow_graph
+from accounts.models import FriendShip
+from accounts.services import follow_filters
+from mysite.snowflake import datetime_to_id
+from tweets.models import Tweet
+from tweets.services import like_filters
+from tweets.sharding import shard_aliases, shard_for_user
+from tweets.tasks import rebuild_like_counts
+
+User = get_user_model()
+Like = Tweet.liked_by.through
+
+RECORD_TYPES = ("user", "tweet", "like", "follow")
+
+
+@contextmanager
+def preserve_timestamps(*models):
+    # bulk_create でも auto_now_add が created_at を上書きしないようにする
+    fields = [model._meta.get_field("created_at") for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class UserIdMap:
+    # username -> id の対応。未知の名前はまとめて引き，上限を超えたら古いものから捨てる
+    def __init__(self, max_size=100_000, chunk_size=500):
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self._ids = OrderedDict()
+
+    def resolve(self, usernames):
+        missing = [username for username in set(usernames) if username not in self._ids]
+        for i in range(0, len(missing), self.chunk_size):
+            chunk = missing[i : i + self.chunk_size]
+            self._ids.update(User.objects.filter(username__in=chunk).values_list("username", "pk"))
+        result = {}
+        for username in usernames:
+            if username in self._ids:
+                self._ids.move_to_end(username)
+                result[username] = self._ids[username]
+        while len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+        return result
+
+
+def parse_timestamp(value, default=None):
+    if not value:
+        return default or timezone.now()
+    value = parse_datetime(value)
+    return value if timezone.is_aware(value) else timezone.make_aware(value)
+
+
+def tweet_id(username, created_at, content):
+    # 同じレコードからは何度取り込んでも同じ id になるように，下位 bit をレコードのハッシュから作る
+    key = json.dumps([username, created_at.isoformat(), content]).encode()
+    return datetime_to_id(created_at, int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big"))
+
+
+class Command(BaseCommand):
+    help = "Import users, tweets, likes and follows from JSONL dumps."
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--checkpoint", help="File to record progress in; an existing checkpoint is resumed.")
+
+    def handle(self, *args, files, batch_size, checkpoint, **options):
+        self.user_ids = UserIdMap()
+        self.checkpoint = checkpoint
+        state = self.load_checkpoint()
+        # 日時のないレコードは取り込みを始めた日時にする。再開しても同じ日時 (と id) になるように checkpoint に残す
+        self.started_at = parse_timestamp(state["started_at"])
+        self.save_checkpoint(state)
+        self.rows = 0
+        self.started = time.monotonic()
+
+        with preserve_timestamps(Tweet, FriendShip):
+            for path in files:
+                if path in state["done"]:
+                    continue
+                offset = state["offset"] if state["file"] == path else 0
+                self.import_file(path, offset, batch_size, state)
+                state["done"].append(path)
+                self.save_checkpoint(state)
+
+        # 派生カウンタは最後にシャードごとに1回の UPDATE でまとめて作り直す
+        for alias in shard_aliases():
+            rebuild_like_counts(Tweet.objects.using(alias).all())
+        follow_graph.clear()
+        follow_filters.clear()
+        like_filters.clear()
+        self.report()
+        call_command("rebuild_profile_summaries", stdout=self.stdout)
+
+    def import_file(self, path, offset, batch_size, state):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            batch, batch_type = [], None
+            for line in iter(f.readline, b""):
+                offset += len(line)
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("type") not in RECORD_TYPES:
+                    raise CommandError(f"Unknown record type at {path}:{offset}: {record.get('type')!r}")
+                if batch and (record["type"] != batch_type or len(batch) >= batch_size):
+                    self.flush(batch_type, batch)
+                    self.save_checkpoint({**state, "file": path, "offset": offset - len(line)})
+                    batch = []
+                batch_type = record["type"]
+                batch.append(record)
+            if batch:
+                self.flush(batch_type, batch)
+                self.save_checkpoint({**state, "file": path, "offset": offset})
+
+    def flush(self, record_type, records):
+        with transaction.atomic():
+            getattr(self, f"import_{record_type}s")(records)
+        self.rows += len(records)
+        self.report()
+
+    def import_users(self, records):
+        users = [
+            User(
+                username=record["username"],
+                email=record.get("email", ""),
+                password=record.get("password") or make_password(None),
+                date_joined=parse_timestamp(record.get("date_joined"), self.started_at),
+            )
+            for record in records
+        ]
+        User.objects.bulk_create(users, ignore_conflicts=True)
+
+    def import_tweets(self, records):
+        user_ids = self.user_ids.resolve([record["username"] for record in records])
+        # ツイートは作者のシャードに書く (tweets.sharding)
+        tweets = defaultdict(list)
+        for record in records:
+            if record["username"] not in user_ids:
+                continue
+            created_at = parse_timestamp(record.get("created_at"), self.started_at)
+            # id がなければ投稿日時から作る。取り込んだ時刻の ID だと古いツイートが新しい順の先頭に来てしまう
+            pk = record.get("id") or tweet_id(record["username"], created_at, record["content"])
+            user_id = user_ids[record["username"]]
+            tweets[shard_for_user(user_id)].append(
+                Tweet(pk=pk, user_id=user_id, content=record["content"], created_at=created_at)
+            )
+        for alias, rows in tweets.items():
+            Tweet.objects.using(alias).bulk_create(rows, ignore_conflicts=True)
+
+    def import_likes(self, records):
+        user_ids = self.user_ids.resolve([record["username"] for record in records])
+        records = [record for record in records if record["username"] in user_ids]
+        # いいねはツイートと同じシャードに書く。どのシャードにあるかは id からはわからないので各シャードを引く
+        for alias in shard_aliases():
+            tweet_ids = set(
+                Tweet.objects.using(alias)
+                .filter(pk__in={record["tweet_id"] for record in records})
+                .values_list("pk", flat=True)
+            )
+            likes = [
+                Like(
+                    tweet_id=record["tweet_id"],
+                    user_id=user_ids[record["username"]],
+                    created_at=parse_timestamp(record.get("created_at"), self.started_at),
+                )
+                for record in records
+                if record["tweet_id"] in tweet_ids
+            ]
+            Like.objects.using(alias).bulk_create(likes, ignore_conflicts=True)
+
+    def import_follows(self, records):
+        user_ids = self.user_ids.resolve(
+            [name for record in records for name in (record["username"], record["target"])]
+        )
+        follows = [
+            FriendShip(
+                following_id=user_ids[record["username"]],
+                follower_id=user_ids[record["target"]],
+                created_at=parse_timestamp(record.get("created_at"), self.started_at),
+            )
+            for record in records
+            if record["username"] in user_ids
+            and record["target"] in user_ids
+            and record["username"] != record["target"]
+        ]
+        FriendShip.objects.bulk_create(follows, ignore_conflicts=True)
+
+    def load_checkpoint(self):
+        state = {"file": None, "offset": 0, "done": [], "started_at": timezone.now().isoformat()}
+        if self.checkpoint:
+            try:
+                with open(self.checkpoint) as f:
+                    state.update(json.load(f))
+            except FileNotFoundError:
+                pass
+        return state
+
+    def save_checkpoint(self, state):
+        if self.checkpoint:
+            with open(self.checkpoint, "w") as f:
+                json.dump(state, f)
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.rows / elapsed if elapsed else 0
+        self.stdout.write(f"{self.rows} rows imported ({rate:.0f} rows/s)")
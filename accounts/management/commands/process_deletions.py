@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from accounts.deletion import process_deletion
+from accounts.models import AccountDeletion
+
+
+class Command(BaseCommand):
+    help = "Delete the data of deactivated accounts in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        pending = AccountDeletion.objects.exclude(stage=AccountDeletion.Stage.DONE).order_by("requested_at")
+        for deletion in pending:
+            total = 0
+            for stage, deleted in process_deletion(deletion, batch_size):
+                total += deleted
+                self.stdout.write(f"{deletion.username}: {stage} {deleted} rows")
+            self.stdout.write(f"{deletion.username}: deleted {total} rows")
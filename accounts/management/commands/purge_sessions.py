@@ -0,0 +1,33 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions in bounded batches (like clearsessions, without one large DELETE)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to wait between batches")
+
+    def handle(self, *args, batch_size, sleep, **options):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not issubclass(store, DBStore):
+            # signed_cookies などサーバーに保存しないバックエンドでは消すものがない
+            self.stdout.write(f"{settings.SESSION_ENGINE} does not store sessions in the database")
+            return
+        model = store.get_model_class()
+        now = timezone.now()
+        total = 0
+        while True:
+            keys = list(model.objects.filter(expire_date__lt=now).values_list("pk", flat=True)[:batch_size])
+            if not keys:
+                break
+            total += model.objects.filter(pk__in=keys).delete()[0]
+            if sleep:
+                time.sleep(sleep)
+        self.stdout.write(f"deleted {total} expired sessions")
@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts.summary import rebuild
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Recompute profile summary rows from the tweet, like and follow tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*", help="Only these users (default: every active user).")
+
+    def handle(self, *args, usernames, **options):
+        users = User.objects.filter(username__in=usernames) if usernames else User.objects.filter(is_active=True)
+        total = 0
+        for user_id in users.order_by("pk").values_list("pk", flat=True).iterator():
+            rebuild(user_id)
+            total += 1
+            if total % 1000 == 0:
+                self.stdout.write(f"{total} summaries rebuilt")
+        self.stdout.write(f"Rebuilt {total} summaries")
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.13 on 2026-10-19 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_friendship_user_followings_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AccountDeletion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("user_id", models.BigIntegerField(unique=True)),
+                ("username", models.CharField(max_length=150)),
+                (
+                    "stage",
+                    models.CharField(
+                        choices=[
+                            ("likes", "Likes"),
+                            ("tweet_likes", "Tweet Likes"),
+                            ("tweets", "Tweets"),
+                            ("follows", "Follows"),
+                            ("user", "User"),
+                            ("done", "Done"),
+                        ],
+                        default="likes",
+                        max_length=16,
+                    ),
+                ),
+                ("requested_at", models.DateTimeField(auto_now_add=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
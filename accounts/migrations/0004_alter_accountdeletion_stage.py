@@ -0,0 +1,30 @@
+# Generated by Django 4.1.13 on 2026-10-19 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_accountdeletion"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="accountdeletion",
+            name="stage",
+            field=models.CharField(
+                choices=[
+                    ("likes", "Likes"),
+                    ("tweet_likes", "Tweet Likes"),
+                    ("tweets", "Tweets"),
+                    ("archived_tweets", "Archived Tweets"),
+                    ("follows", "Follows"),
+                    ("user", "User"),
+                    ("done", "Done"),
+                ],
+                default="likes",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.13 on 2026-10-19 16:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0004_alter_accountdeletion_stage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileSummary",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="profile_summary",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("tweet_count", models.IntegerField(default=0)),
+                ("like_count", models.IntegerField(default=0)),
+                ("follower_count", models.IntegerField(default=0)),
+                ("following_count", models.IntegerField(default=0)),
+                ("latest_tweet_ids", models.JSONField(default=list)),
+                ("last_tweet_at", models.DateTimeField(blank=True, null=True)),
+                ("last_active_at", models.DateTimeField(blank=True, null=True)),
+                ("version", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
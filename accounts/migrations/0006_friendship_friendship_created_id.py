@@ -0,0 +1,17 @@
+# Generated by Django 4.1.13 on 2026-10-19 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0005_profilesummary"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="friendship",
+            index=models.Index(fields=["created_at", "id"], name="friendship_created_id"),
+        ),
+    ]
@@ -27,3 +27,47 @@ class FriendShip(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["follower", "following"], name="unique_friendship"),
         ]
+        indexes = [
+            # 集計 (analytics.rollups) が作成順に読む
+            models.Index(fields=["created_at", "id"], name="friendship_created_id"),
+        ]
+
+
+class ProfileSummary(models.Model):
+    # プロフィールの見出しに出す集計。投稿・いいね・フォローのたびに accounts.summary で差分だけ更新し，
+    # ずれたら rebuild_profile_summaries で作り直す
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="profile_summary"
+    )
+    tweet_count = models.IntegerField(default=0)
+    # 自分のツイートが受けたいいねの数
+    like_count = models.IntegerField(default=0)
+    follower_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    # 新しい順のツイート ID。プロフィールの最初のページはこれを主キーで読む
+    latest_tweet_ids = models.JSONField(default=list)
+    last_tweet_at = models.DateTimeField(null=True, blank=True)
+    last_active_at = models.DateTimeField(null=True, blank=True)
+    # 更新のたびに増やす。プロフィールの ETag に使う
+    version = models.PositiveBigIntegerField(default=0)
+
+
+class AccountDeletion(models.Model):
+    # 退会処理の進捗。User 削除後も残るよう user_id は外部キーにしない
+    class Stage(models.TextChoices):
+        LIKES = "likes"
+        TWEET_LIKES = "tweet_likes"
+        TWEETS = "tweets"
+        ARCHIVED_TWEETS = "archived_tweets"
+        FOLLOWS = "follows"
+        USER = "user"
+        DONE = "done"
+
+    user_id = models.BigIntegerField(unique=True)
+    username = models.CharField(max_length=150)
+    stage = models.CharField(max_length=16, choices=Stage.choices, default=Stage.LIKES)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.username} ({self.stage})"
@@ -0,0 +1,39 @@
+from mysite.bloom import CachedBloomFilters
+from mysite.db import delete_where, insert_ignore
+
+from .graph import follow_graph
+from .models import FriendShip
+from .tasks import update_follow_counts
+
+
+def _following_ids(user_id):
+    return FriendShip.objects.filter(following_id=user_id).values_list("follower_id", flat=True)
+
+
+# ユーザーごとのフォロー先 ID。follow_graph と違ってプロセス間で共有し，フォローしていない相手は読み込まずに答える
+follow_filters = CachedBloomFilters("follows", _following_ids)
+
+
+def follow(user_id, target_id):
+    # 生の SQL なので m2m_changed は飛ばない。follow_graph はここで更新し，ProfileSummary はジョブで更新する
+    created = insert_ignore(FriendShip, following_id=user_id, follower_id=target_id)
+    if created:
+        follow_graph.add_edge(user_id, target_id)
+        follow_filters.add(user_id, target_id)
+        update_follow_counts.delay(user_id=user_id, target_id=target_id, delta=1)
+    return created
+
+
+def unfollow(user_id, target_id):
+    deleted = delete_where(FriendShip, following_id=user_id, follower_id=target_id)
+    if deleted:
+        follow_graph.remove_edge(user_id, target_id)
+        update_follow_counts.delay(user_id=user_id, target_id=target_id, delta=-1)
+    return deleted
+
+
+def is_following(user_id, target_id):
+    bloom = follow_filters.get(user_id)
+    if bloom is not None and target_id not in bloom:
+        return False
+    return follow_graph.is_following(user_id, target_id)
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from tweets.models import Tweet
+
+from .graph import follow_graph
+from .models import FriendShip, ProfileSummary
+from .services import follow_filters
+from .summary import record_follow, record_tweet
+
+
+@receiver(post_save, sender=get_user_model())
+def create_profile_summary(sender, instance, created, raw, **kwargs):
+    # 新しいユーザーはすべて 0 なので数えずに作る。プロフィールの表示 (GET) では行を作らない
+    if created and not raw:
+        ProfileSummary.objects.create(user_id=instance.pk)
+
+
+@receiver(post_save, sender=FriendShip)
+def add_follow_edge(sender, instance, created, **kwargs):
+    if created:
+        follow_graph.add_edge(instance.following_id, instance.follower_id)
+        follow_filters.add(instance.following_id, instance.follower_id)
+        record_follow(instance.following_id, instance.follower_id, 1)
+
+
+@receiver(post_delete, sender=FriendShip)
+def remove_follow_edge(sender, instance, **kwargs):
+    follow_graph.remove_edge(instance.following_id, instance.follower_id)
+    record_follow(instance.following_id, instance.follower_id, -1)
+
+
+@receiver(post_save, sender=Tweet)
+def add_latest_tweet(sender, instance, created, raw, **kwargs):
+    # 削除はアーカイブへの移動と区別できないので，TweetDeleteView から forget_deleted_tweet を積む
+    if created and not raw:
+        record_tweet(instance)
+
+
+@receiver(m2m_changed, sender=FriendShip)
+def sync_follow_edges(sender, instance, action, reverse, pk_set, **kwargs):
+    # user.followings.add() は bulk_create で保存されるため post_save が飛ばない。
+    # remove() と clear() は行ごとに post_delete が飛ぶので remove_follow_edge に任せる
+    if action != "post_add":
+        return
+    for pk in pk_set:
+        user_id, target_id = (pk, instance.pk) if reverse else (instance.pk, pk)
+        follow_graph.add_edge(user_id, target_id)
+        follow_filters.add(user_id, target_id)
+        record_follow(user_id, target_id, 1)
@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from tweets.models import ArchivedTweet, Tweet
+from tweets.sharding import shard_for_user
+
+from .models import FriendShip, ProfileSummary
+
+Like = Tweet.liked_by.through
+
+
+def latest_tweet_limit():
+    # 最初のページと，次のページがあるかの判定に使う1件
+    return settings.PROFILE_PAGE_SIZE + 1
+
+
+def compute(user_id):
+    # 今の表から数え直した ProfileSummary。保存はしない
+    alias = shard_for_user(user_id)
+    tweets = Tweet.objects.using(alias).filter(user_id=user_id)
+    archived = ArchivedTweet.objects.using(alias).filter(user_id=user_id)
+    hot = tweets.aggregate(count=Count("pk"), last=Max("created_at"))
+    old = archived.aggregate(count=Count("pk"), likes=Sum("like_count"), last=Max("created_at"))
+    limit = latest_tweet_limit()
+    latest = list(tweets.order_by("-pk").values_list("pk", flat=True)[:limit])
+    if len(latest) < limit:
+        latest += archived.order_by("-pk").values_list("pk", flat=True)[: limit - len(latest)]
+    last_tweet_at = hot["last"] or old["last"]
+    last_follow_at = FriendShip.objects.filter(following_id=user_id).aggregate(last=Max("created_at"))["last"]
+    return ProfileSummary(
+        user_id=user_id,
+        tweet_count=hot["count"] + old["count"],
+        like_count=Like.objects.using(alias).filter(tweet__user_id=user_id).count() + (old["likes"] or 0),
+        follower_count=FriendShip.objects.filter(follower_id=user_id).count(),
+        following_count=FriendShip.objects.filter(following_id=user_id).count(),
+        latest_tweet_ids=latest,
+        last_tweet_at=last_tweet_at,
+        last_active_at=max(filter(None, [last_tweet_at, last_follow_at]), default=None),
+    )
+
+
+def rebuild(user_id):
+    summary = compute(user_id)
+    fields = [field.name for field in ProfileSummary._meta.concrete_fields if field.name not in ("user", "version")]
+    ProfileSummary.objects.update_or_create(
+        user_id=user_id, defaults={name: getattr(summary, name) for name in fields}
+    )
+    ProfileSummary.objects.filter(pk=user_id).update(version=F("version") + 1)
+    return ProfileSummary.objects.get(pk=user_id)
+
+
+def get_summary(user_id):
+    # 行がなければ今の表から数えて返すだけで，書き込まない。行はユーザーの作成時か rebuild_profile_summaries で作る
+    summary = ProfileSummary.objects.filter(pk=user_id).first()
+    return summary if summary is not None else compute(user_id)
+
+
+def _apply(user_id, **changes):
+    # 行がまだなければ何もしない。rebuild で作るときに今の表から数える
+    ProfileSummary.objects.filter(pk=user_id).update(version=F("version") + 1, **changes)
+
+
+def _apply_latest(user_id, edit, attempts=10, **changes):
+    # latest_tweet_ids は読んでから書き戻すので，読んだときから version が変わっていなければ書く。
+    # 変わっていたら読み直す。同時に投稿しても ID を取りこぼさない
+    for _ in range(attempts):
+        row = ProfileSummary.objects.filter(pk=user_id).values_list("latest_tweet_ids", "version").first()
+        if row is None:
+            return
+        latest, version = row
+        if ProfileSummary.objects.filter(pk=user_id, version=version).update(
+            version=F("version") + 1, latest_tweet_ids=edit(latest), **changes
+        ):
+            return
+    # 競合が続いたら一覧を空にする。UserTimeline.page は空なら表から読む
+    _apply(user_id, latest_tweet_ids=[], **changes)
+
+
+def record_tweet(tweet):
+    _apply_latest(
+        tweet.user_id,
+        # 先に採番したツイートがあとから保存されることもあるので，ID の順に並べ直す
+        lambda latest: sorted({tweet.pk, *latest}, reverse=True)[: latest_tweet_limit()],
+        tweet_count=F("tweet_count") + 1,
+        last_tweet_at=tweet.created_at,
+        last_active_at=tweet.created_at,
+    )
+
+
+def record_tweet_deleted(user_id, tweet_id, like_count):
+    _apply_latest(
+        user_id,
+        lambda latest: [pk for pk in latest if pk != tweet_id],
+        tweet_count=F("tweet_count") - 1,
+        like_count=F("like_count") - like_count,
+    )
+
+
+def record_likes(author_counts):
+    # author_counts は {ツイートの作者: 増減}
+    for author_id, delta in author_counts.items():
+        if delta:
+            _apply(author_id, like_count=F("like_count") + delta)
+
+
+def record_like(author_id, actor_id, delta):
+    record_likes({author_id: delta})
+    if delta > 0:
+        touch(actor_id)
+
+
+def record_follows(following_counts, follower_counts):
+    # following_counts はフォローする側の，follower_counts はフォローされる側の {ユーザー: 増減}
+    for user_id, delta in following_counts.items():
+        if delta:
+            _apply(user_id, following_count=F("following_count") + delta)
+    for user_id, delta in follower_counts.items():
+        if delta:
+            _apply(user_id, follower_count=F("follower_count") + delta)
+
+
+def record_follow(user_id, target_id, delta):
+    active = {"last_active_at": timezone.now()} if delta > 0 else {}
+    _apply(user_id, following_count=F("following_count") + delta, **active)
+    _apply(target_id, follower_count=F("follower_count") + delta)
+
+
+def touch(user_id):
+    # プロフィールの表示は変わらないので version は増やさない
+    ProfileSummary.objects.filter(pk=user_id).update(last_active_at=timezone.now())
+
+
+def bump(user_id):
+    # ツイートのいいね数など，集計以外でプロフィールの表示が変わったとき
+    ProfileSummary.objects.filter(pk=user_id).update(version=F("version") + 1)
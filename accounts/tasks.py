@@ -0,0 +1,13 @@
+from jobs.queue import task
+
+from .summary import record_follow, record_tweet_deleted
+
+
+@task
+def update_follow_counts(user_id, target_id, delta):
+    record_follow(user_id, target_id, delta)
+
+
+@task
+def forget_deleted_tweet(user_id, tweet_id, like_count):
+    record_tweet_deleted(user_id, tweet_id, like_count)
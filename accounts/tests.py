@@ -1,11 +1,39 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import tracemalloc
+from datetime import timedelta
+from itertools import islice
+from unittest import mock, skipUnless
+
 from django.conf import settings
 from django.contrib.auth import SESSION_KEY, get_user_model
-from django.test import TestCase
+from django.contrib.auth.hashers import make_password
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
+from mysite import snowflake
+from mysite.checks import check_session_cache
+from mysite.paginator import EstimatedCountPaginator
 from tweets.models import Tweet
 
-from .models import FriendShip
+from .deletion import process_batch
+from .exports import export_archive
+from .graph import FollowGraph, follow_graph
+from .hashers import ScryptPasswordHasher, password_hashers
+from .models import AccountDeletion, FriendShip, ProfileSummary
+from .services import follow, unfollow
+from .summary import _apply_latest, rebuild, record_tweet
 
 User = get_user_model()
 
@@ -37,6 +65,21 @@ class TestSignupView(TestCase):
         self.assertTrue(User.objects.filter(username=valid_data["username"]).exists())
         self.assertIn(SESSION_KEY, self.client.session)
 
+    @override_settings(PASSWORD_HASHERS=password_hashers(settings.PASSWORD_HASHER))
+    def test_success_post_hashes_password_once(self):
+        valid_data = {
+            "username": "testuser",
+            "email": "test@test.com",
+            "password1": "testpassword",
+            "password2": "testpassword",
+        }
+        with mock.patch.object(ScryptPasswordHasher, "verify") as verify:
+            self.client.post(self.url, valid_data)
+
+        verify.assert_not_called()
+        self.assertIn(SESSION_KEY, self.client.session)
+        self.assertTrue(User.objects.get(username="testuser").password.startswith("scrypt$"))
+
     def test_failure_post_with_empty_form(self):
         invalid_data = {
             "username": "",
@@ -217,6 +260,24 @@ class TestLoginView(TestCase):
         )
         self.assertIn(SESSION_KEY, self.client.session)
 
+    @override_settings(PASSWORD_HASHERS=password_hashers(settings.PASSWORD_HASHER))
+    def test_rehash_legacy_password_on_login(self):
+        User.objects.filter(username="testuser").update(password=make_password("testpassword", hasher="pbkdf2_sha256"))
+        self.client.post(self.url, {"username": "testuser", "password": "testpassword"})
+
+        self.assertIn(SESSION_KEY, self.client.session)
+        self.assertTrue(User.objects.get(username="testuser").password.startswith("scrypt$"))
+
+    @override_settings(PASSWORD_HASHERS=password_hashers(settings.PASSWORD_HASHER))
+    def test_rehash_when_parameters_change(self):
+        weaker = {"work_factor": 2**14, "block_size": 8, "parallelism": 1}
+        with self.settings(PASSWORD_SCRYPT=weaker, PASSWORD_HASHERS=list(settings.PASSWORD_HASHERS)):
+            User.objects.filter(username="testuser").update(password=make_password("testpassword"))
+        self.client.post(self.url, {"username": "testuser", "password": "testpassword"})
+
+        self.assertIn(SESSION_KEY, self.client.session)
+        self.assertTrue(User.objects.get(username="testuser").password.startswith("scrypt$32768$"))
+
     def test_failure_post_with_not_exists_user(self):
         invalid_data = {
             "username": "testU",
@@ -259,8 +320,69 @@ class TestLogoutView(TestCase):
         self.assertNotIn(SESSION_KEY, self.client.session)
 
 
+class TestSessionModes(TestCase):
+    def setUp(self):
+        caches["sessions"].clear()
+        User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.login_data = {"username": "testuser", "password": "testpassword"}
+
+    def session_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query["sql"] for query in queries if "django_session" in query["sql"]]
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cached_db")
+    def test_cached_db_reads_from_cache(self):
+        self.client.post(reverse(settings.LOGIN_URL), self.login_data)
+
+        self.assertTrue(Session.objects.exists())
+        self.assertEqual(self.session_queries(reverse("tweets:home")), [])
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_signed_cookies_store_nothing(self):
+        self.client.post(reverse(settings.LOGIN_URL), self.login_data)
+
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(self.session_queries(reverse("tweets:home")), [])
+        self.client.post(reverse(settings.LOGOUT_URL))
+        self.assertEqual(self.client.get(reverse("tweets:home")).status_code, 302)
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.db")
+    def test_purge_sessions(self):
+        past = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create(
+            Session(session_key=f"expired{i}", session_data="", expire_date=past) for i in range(5)
+        )
+        self.client.post(reverse(settings.LOGIN_URL), self.login_data)
+        out = io.StringIO()
+        call_command("purge_sessions", batch_size=2, stdout=out)
+
+        self.assertIn("deleted 5 expired sessions", out.getvalue())
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(self.client.get(reverse("tweets:home")).status_code, 200)
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_purge_sessions_without_database_backend(self):
+        out = io.StringIO()
+        call_command("purge_sessions", stdout=out)
+
+        self.assertIn("does not store sessions", out.getvalue())
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cached_db")
+    def test_cached_db_requires_shared_cache(self):
+        self.assertEqual([error.id for error in check_session_cache()], ["mysite.E003"])
+
+        redis = {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://localhost:6379"}
+        with override_settings(CACHES={**settings.CACHES, "sessions": redis}):
+            self.assertEqual(check_session_cache(), [])
+
+
+@override_settings(JOBS_EAGER=True)
 class TestUserProfileView(TestCase):
     def setUp(self):
+        cache.clear()
+        follow_graph.clear()
         self.user1 = User.objects.create_user(username="testuser1", email="test@test.com", password="testpassword")
         self.user2 = User.objects.create_user(username="testuser2", email="test@test.com", password="testpassword")
         self.client.force_login(self.user1)
@@ -278,6 +400,160 @@ class TestUserProfileView(TestCase):
         self.assertEqual(response.context["following_count"], FriendShip.objects.filter(following=self.user1).count())
         self.assertEqual(response.context["follower_count"], FriendShip.objects.filter(follower=self.user1).count())
 
+    def test_success_get_after_follow(self):
+        user3 = User.objects.create_user(username="testuser3", email="test@test.com", password="testpassword")
+        url = reverse("accounts:user_profile", args=[user3.username])
+        state_url = reverse("tweets:viewer_state") + f"?user={user3.username}"
+        self.assertFalse(self.client.get(state_url).json()["following"])
+
+        self.client.post(reverse("accounts:follow", args=[user3.username]))
+        self.assertTrue(self.client.get(state_url).json()["following"])
+        self.assertEqual(self.client.get(url).context["follower_count"], 1)
+
+        self.client.post(reverse("accounts:unfollow", args=[user3.username]))
+        self.assertFalse(self.client.get(state_url).json()["following"])
+        self.assertEqual(self.client.get(url).context["follower_count"], 0)
+
+    def test_success_get_anonymous(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("public", response["Cache-Control"])
+        self.assertNotIn("Cookie", response.get("Vary", ""))
+        self.assertFalse(response.cookies)
+
+    def test_same_page_for_every_viewer(self):
+        body = self.client.get(self.url).content
+        self.client.logout()
+
+        self.assertEqual(self.client.get(self.url).content, body)
+
+    def test_not_modified_with_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_after_new_tweet(self):
+        etag = self.client.get(self.url)["ETag"]
+        Tweet.objects.create(user=self.user1, content="testcontent")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(list(response.context["tweet_list"])), 2)
+
+
+@override_settings(JOBS_EAGER=True)
+class TestProfileSummary(TestCase):
+    fields = ("tweet_count", "like_count", "follower_count", "following_count", "latest_tweet_ids")
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        self.user1 = User.objects.create_user(username="testuser1", email="test@test.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test@test.com", password="testpassword")
+        self.url = reverse("accounts:user_profile", args=[self.user1.username])
+
+    def assertSummaryMatchesTables(self, user):
+        summary = ProfileSummary.objects.values(*self.fields).get(pk=user.pk)
+        self.assertEqual(summary, ProfileSummary.objects.values(*self.fields).get(pk=rebuild(user.pk).pk))
+
+    def test_updated_by_events(self):
+        self.client.get(self.url)
+        self.client.force_login(self.user1)
+        self.client.post(reverse("tweets:create"), {"content": "testcontent1"})
+        self.client.post(reverse("tweets:create"), {"content": "testcontent2"})
+        first, second = Tweet.objects.filter(user=self.user1).order_by("pk")
+        self.client.force_login(self.user2)
+        self.client.post(reverse("accounts:follow", args=[self.user1.username]))
+        self.client.post(reverse("tweets:like", args=[first.pk]))
+        self.client.post(reverse("tweets:like", args=[second.pk]))
+        self.client.post(reverse("tweets:unlike", args=[first.pk]))
+
+        summary = ProfileSummary.objects.get(pk=self.user1.pk)
+        self.assertEqual((summary.tweet_count, summary.like_count, summary.follower_count), (2, 1, 1))
+        self.assertEqual(summary.latest_tweet_ids, [second.pk, first.pk])
+        self.assertSummaryMatchesTables(self.user1)
+        self.client.force_login(self.user1)
+        self.client.post(reverse("tweets:delete", args=[second.pk]))
+        summary.refresh_from_db()
+        self.assertEqual((summary.tweet_count, summary.like_count, summary.latest_tweet_ids), (1, 0, [first.pk]))
+        self.assertSummaryMatchesTables(self.user1)
+
+    def test_header_and_first_page_from_summary(self):
+        Tweet.objects.create(user=self.user1, content="testcontent")
+        FriendShip.objects.create(following=self.user2, follower=self.user1)
+        self.client.get(self.url)
+        cache.clear()
+
+        # ETag (ユーザーと version)，ユーザーと ProfileSummary，最初のページ
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertContains(response, "1 ツイート 0 いいね")
+        self.assertEqual(response.context["follower_count"], 1)
+
+    def test_concurrent_posts_keep_latest_ids(self):
+        first, second = Tweet.objects.bulk_create(Tweet(user=self.user1, content=f"testcontent{i}") for i in range(2))
+        calls = []
+
+        def edit(latest):
+            # 読んでから書くまでの間にもう1件投稿される
+            if not calls:
+                calls.append(latest)
+                record_tweet(second)
+            return sorted({first.pk, *latest}, reverse=True)
+
+        _apply_latest(self.user1.pk, edit)
+
+        self.assertEqual(ProfileSummary.objects.get(pk=self.user1.pk).latest_tweet_ids, [second.pk, first.pk])
+
+    def test_clear_updates_only_affected_users(self):
+        user3 = User.objects.create_user(username="testuser3", email="test@test.com", password="testpassword")
+        self.user1.followings.add(self.user2, user3)
+        self.user2.followings.add(self.user1)
+        self.user1.followings.clear()
+
+        self.assertEqual(ProfileSummary.objects.count(), 3)
+        for user in (self.user1, self.user2, user3):
+            self.assertSummaryMatchesTables(user)
+        self.user1.followers.clear()
+        self.user2.followings.add(user3)
+        self.user2.followings.remove(user3)
+        self.assertEqual(ProfileSummary.objects.get(pk=self.user2.pk).following_count, 0)
+        self.assertSummaryMatchesTables(self.user1)
+
+    def test_missing_row_is_not_written_on_get(self):
+        Tweet.objects.create(user=self.user1, content="testcontent")
+        ProfileSummary.objects.filter(pk=self.user1.pk).delete()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertContains(response, "1 ツイート 0 いいね")
+        self.assertFalse([query for query in queries if not query["sql"].startswith("SELECT")])
+        self.assertFalse(ProfileSummary.objects.filter(pk=self.user1.pk).exists())
+
+    @override_settings(PROFILE_PAGE_SIZE=20)
+    def test_keyset_pages(self):
+        tweets = Tweet.objects.bulk_create(Tweet(user=self.user1, content="testcontent") for _ in range(25))
+        rebuild(self.user1.pk)
+        tweet_ids = sorted((tweet.pk for tweet in tweets), reverse=True)
+        response = self.client.get(self.url)
+
+        self.assertEqual([tweet.pk for tweet in response.context["tweet_list"]], tweet_ids[:20])
+        response = self.client.get(self.url, {"before": response.context["next_cursor"]})
+        self.assertEqual([tweet.pk for tweet in response.context["tweet_list"]], tweet_ids[20:])
+        self.assertIsNone(response.context["next_cursor"])
+        self.assertEqual(self.client.get(self.url, {"before": "x"}).status_code, 400)
+
+    def test_rebuild_command(self):
+        Tweet.objects.bulk_create(Tweet(user=self.user1, content="testcontent") for _ in range(3))
+        call_command("rebuild_profile_summaries", stdout=io.StringIO())
+
+        self.assertEqual(ProfileSummary.objects.get(pk=self.user1.pk).tweet_count, 3)
+        self.assertEqual(ProfileSummary.objects.get(pk=self.user2.pk).tweet_count, 0)
+
 
 # class TestUserProfileEditView(TestCase):
 #     def test_success_get(self):
@@ -351,6 +627,104 @@ class TestUnfollowView(TestCase):
         self.assertEqual(FriendShip.objects.all().count(), count_former)
 
 
+@override_settings(JOBS_EAGER=True)
+class TestFollowRace(TransactionTestCase):
+    threads = 8
+    toggles = 250
+
+    def setUp(self):
+        follow_graph.clear()
+        self.users = [
+            User.objects.create_user(username=f"testuser{i}", email="test@test.com", password="testpassword")
+            for i in range(5)
+        ]
+        self.target = self.users.pop()
+
+    def test_concurrent_toggles(self):
+        # 2スレッドずつ同じユーザーのフォローを切り替え続ける。報告された変化の差し引きが最終的な行と一致すること
+        net = [0] * len(self.users)
+        errors = []
+        lock = threading.Lock()
+
+        def toggle(i):
+            user = self.users[i % len(self.users)]
+            try:
+                for n in range(self.toggles):
+                    if n % 2 == 0:
+                        changed = follow(user.pk, self.target.pk)
+                    else:
+                        changed = unfollow(user.pk, self.target.pk)
+                    if changed:
+                        with lock:
+                            net[i % len(self.users)] += 1 if n % 2 == 0 else -1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=toggle, args=(i,)) for i in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        followers = set(FriendShip.objects.filter(follower=self.target).values_list("following_id", flat=True))
+
+        self.assertEqual(errors, [])
+        self.assertEqual(net, [int(user.pk in followers) for user in self.users])
+        self.assertEqual(follow_graph.follower_count(self.target.pk), len(followers))
+
+    def test_follow_reports_change_once(self):
+        user = self.users[0]
+
+        self.assertTrue(follow(user.pk, self.target.pk))
+        self.assertFalse(follow(user.pk, self.target.pk))
+        self.assertTrue(follow_graph.is_following(user.pk, self.target.pk))
+        self.assertTrue(unfollow(user.pk, self.target.pk))
+        self.assertFalse(unfollow(user.pk, self.target.pk))
+        self.assertFalse(follow_graph.is_following(user.pk, self.target.pk))
+
+
+class TestFollowGraph(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test@test.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test@test.com", password="testpassword")
+        self.user3 = User.objects.create_user(username="testuser3", email="test@test.com", password="testpassword")
+        self.graph = FollowGraph(max_edges=2, ttl=None)
+
+    def test_is_following_loads_from_db(self):
+        FriendShip.objects.create(following=self.user1, follower=self.user2)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(self.graph.is_following(self.user1.pk, self.user2.pk))
+            self.assertFalse(self.graph.is_following(self.user1.pk, self.user3.pk))
+
+    def test_is_mutual(self):
+        FriendShip.objects.create(following=self.user1, follower=self.user2)
+        FriendShip.objects.create(following=self.user2, follower=self.user1)
+        FriendShip.objects.create(following=self.user1, follower=self.user3)
+
+        self.assertTrue(self.graph.is_mutual(self.user1.pk, self.user2.pk))
+        self.assertFalse(self.graph.is_mutual(self.user1.pk, self.user3.pk))
+
+    def test_edges_are_kept_in_sync(self):
+        self.graph.followings(self.user1.pk)
+        self.graph.add_edge(self.user1.pk, self.user2.pk)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(self.graph.is_following(self.user1.pk, self.user2.pk))
+        self.graph.remove_edge(self.user1.pk, self.user2.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(self.graph.is_following(self.user1.pk, self.user2.pk))
+
+    def test_memory_is_bounded(self):
+        self.graph.prime(self.user1.pk, [self.user2.pk, self.user3.pk])
+        self.graph.prime(self.user2.pk, [self.user1.pk])
+
+        self.assertLessEqual(len(self.graph), 2)
+        with self.assertNumQueries(1):
+            self.graph.is_following(self.user1.pk, self.user2.pk)
+
+
 class TestFollowingListView(TestCase):
     def setUp(self):
         self.user1 = User.objects.create_user(username="testuser1", email="test@test.com", password="testpassword")
@@ -369,3 +743,313 @@ class TestFollowerListView(TestCase):
     def test_success_get(self):
         response = self.client.get(reverse("accounts:follower_list", args=[self.user1.username]))
         self.assertEqual(response.status_code, 200)
+
+
+class TestExportView(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test@test.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test@test.com", password="testpassword")
+        self.client.force_login(self.user1)
+        self.tweet1 = Tweet.objects.create(user=self.user1, content="testcontent1")
+        self.tweet2 = Tweet.objects.create(user=self.user2, content="testcontent2")
+        self.tweet2.liked_by.add(self.user1)
+        FriendShip.objects.create(following=self.user1, follower=self.user2)
+        self.url = reverse("accounts:export")
+
+    def read(self, response):
+        return gzip.decompress(b"".join(response.streaming_content)).decode()
+
+    def test_success_get_jsonl(self):
+        response = self.client.get(self.url)
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertEqual([row["type"] for row in rows], ["tweet", "like", "following"])
+        self.assertEqual(rows[0]["content"], "testcontent1")
+        self.assertEqual(rows[1]["id"], self.tweet2.pk)
+        self.assertEqual(rows[2]["username"], "testuser2")
+
+    def test_success_get_csv(self):
+        response = self.client.get(self.url, {"format": "csv"})
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["content"], "testcontent1")
+
+    def test_failure_get_with_invalid_format(self):
+        response = self.client.get(self.url, {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_account_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "export.jsonl.gz")
+            call_command("export_account", "testuser1", output=output, stdout=io.StringIO())
+            with gzip.open(output, "rt") as f:
+                self.assertEqual(len(f.readlines()), 3)
+
+    def test_user_named_export_has_a_profile(self):
+        user = User.objects.create_user(username="export", email="test@test.com", password="testpassword")
+        response = self.client.get(reverse("accounts:user_profile", args=[user.username]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["user"], user)
+
+
+class TestExportMemory(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+
+    def create_tweets(self, count, batch_size=10000):
+        tweets = (Tweet(user=self.user, content="x" * 140) for _ in range(count))
+        while batch := list(islice(tweets, batch_size)):
+            Tweet.objects.bulk_create(batch)
+
+    def export_peak_memory(self):
+        tracemalloc.start()
+        try:
+            for _ in export_archive(self.user):
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_memory_is_constant(self):
+        self.create_tweets(5000)
+        small = self.export_peak_memory()
+        self.create_tweets(20000)
+        large = self.export_peak_memory()
+
+        self.assertLess(large, small * 1.5)
+
+    @skipUnless(os.environ.get("RUN_SLOW_TESTS"), "exports 1M tweets")
+    def test_memory_ceiling_with_1m_tweets(self):
+        self.create_tweets(1_000_000)
+        self.assertLess(self.export_peak_memory(), 16 * 2**20)
+
+
+class TestImportDumpCommand(TestCase):
+    records = [
+        {"type": "user", "username": "alice", "email": "alice@test.com"},
+        {"type": "user", "username": "bob", "email": "bob@test.com"},
+        {"type": "tweet", "id": 100, "username": "alice", "content": "hello", "created_at": "2020-01-01T00:00:00Z"},
+        {"type": "tweet", "id": 101, "username": "alice", "content": "world", "created_at": "2020-01-02T00:00:00Z"},
+        {"type": "like", "username": "bob", "tweet_id": 100},
+        {"type": "follow", "username": "bob", "target": "alice", "created_at": "2020-01-03T00:00:00+00:00"},
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "dump.jsonl")
+        with open(self.path, "w") as f:
+            for record in self.records:
+                f.write(json.dumps(record) + "\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_import(self):
+        out = io.StringIO()
+        call_command("import_dump", self.path, batch_size=1, stdout=out)
+        alice = User.objects.get(username="alice")
+        bob = User.objects.get(username="bob")
+
+        self.assertEqual(Tweet.objects.filter(user=alice).count(), 2)
+        self.assertEqual(Tweet.objects.get(pk=100).created_at.year, 2020)
+        self.assertEqual(Tweet.objects.get(pk=100).like_count, 1)
+        self.assertTrue(FriendShip.objects.filter(following=bob, follower=alice).exists())
+        self.assertFalse(alice.has_usable_password())
+        self.assertIn("rows/s", out.getvalue())
+
+    def test_import_is_resumable(self):
+        checkpoint = os.path.join(self.directory.name, "checkpoint.json")
+        call_command("import_dump", self.path, checkpoint=checkpoint, stdout=io.StringIO())
+        Tweet.objects.filter(pk=101).delete()
+
+        call_command("import_dump", self.path, checkpoint=checkpoint, stdout=io.StringIO())
+        self.assertFalse(Tweet.objects.filter(pk=101).exists())
+
+        with open(checkpoint, "w") as f:
+            json.dump({"file": self.path, "offset": 0, "done": []}, f)
+        call_command("import_dump", self.path, checkpoint=checkpoint, stdout=io.StringIO())
+        self.assertTrue(Tweet.objects.filter(pk=101).exists())
+        self.assertEqual(Tweet.objects.count(), 2)
+
+    def test_tweet_without_id_is_ordered_by_created_at(self):
+        live = Tweet.objects.create(user=User.objects.create_user(username="carol"), content="live")
+        with open(self.path, "a") as f:
+            record = {"type": "tweet", "username": "alice", "content": "old", "created_at": "2021-06-01T12:00:00Z"}
+            f.write(json.dumps(record) + "\n")
+        call_command("import_dump", self.path, stdout=io.StringIO())
+
+        old = Tweet.objects.get(content="old")
+        self.assertEqual(snowflake.id_to_datetime(old.pk), old.created_at)
+        self.assertEqual(list(Tweet.objects.order_by("-pk")[:2]), [live, old])
+
+    def test_resume_does_not_duplicate_tweets_without_id(self):
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"type": "tweet", "username": "alice", "content": "no id"}) + "\n")
+            f.write(json.dumps({"type": "tweet", "username": "bob", "content": "no id either"}) + "\n")
+        checkpoint = os.path.join(self.directory.name, "checkpoint.json")
+        call_command("import_dump", self.path, checkpoint=checkpoint, stdout=io.StringIO())
+        ids = set(Tweet.objects.values_list("pk", flat=True))
+
+        # 最後まで終わる前に止まったことにして，同じファイルをはじめから取り込み直す
+        with open(checkpoint) as f:
+            state = json.load(f)
+        with open(checkpoint, "w") as f:
+            json.dump({**state, "file": self.path, "offset": 0, "done": []}, f)
+        call_command("import_dump", self.path, checkpoint=checkpoint, stdout=io.StringIO())
+
+        self.assertEqual(set(Tweet.objects.values_list("pk", flat=True)), ids)
+        self.assertEqual(len(ids), 4)
+
+
+class TestAccountDeleteView(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test@test.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test@test.com", password="testpassword")
+        self.client.force_login(self.user1)
+        self.url = reverse("accounts:delete")
+
+        self.tweets = [Tweet.objects.create(user=self.user1, content="testcontent") for _ in range(3)]
+        self.other_tweet = Tweet.objects.create(user=self.user2, content="testcontent")
+        self.other_tweet.liked_by.add(self.user1)
+        self.other_tweet.like_count = 1
+        self.other_tweet.save()
+        self.tweets[0].liked_by.add(self.user2)
+        FriendShip.objects.create(following=self.user1, follower=self.user2)
+        FriendShip.objects.create(following=self.user2, follower=self.user1)
+
+    def test_success_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_named_delete_has_a_profile(self):
+        user = User.objects.create_user(username="delete", email="test@test.com", password="testpassword")
+        response = self.client.get(reverse("accounts:user_profile", args=[user.username]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["user"], user)
+
+    def test_success_post_disables_account(self):
+        response = self.client.post(self.url)
+
+        self.assertRedirects(response, reverse(settings.LOGIN_URL))
+        self.assertNotIn(SESSION_KEY, self.client.session)
+        self.user1.refresh_from_db()
+        self.assertFalse(self.user1.is_active)
+        self.assertTrue(AccountDeletion.objects.filter(user_id=self.user1.pk).exists())
+        self.assertFalse(self.client.login(username="testuser1", password="testpassword"))
+
+        self.client.force_login(self.user2)
+        response = self.client.get(reverse("accounts:user_profile", args=[self.user1.username]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("tweets:home"))
+        self.assertNotIn(self.tweets[0], response.context["tweet_list"])
+
+    def test_process_deletions_command(self):
+        self.client.post(self.url)
+        call_command("process_deletions", batch_size=2, stdout=io.StringIO())
+
+        self.assertFalse(User.objects.filter(pk=self.user1.pk).exists())
+        self.assertFalse(Tweet.objects.filter(user_id=self.user1.pk).exists())
+        self.assertFalse(FriendShip.objects.exists())
+        self.other_tweet.refresh_from_db()
+        self.assertEqual(self.other_tweet.like_count, 0)
+        self.assertEqual(AccountDeletion.objects.get(user_id=self.user1.pk).stage, AccountDeletion.Stage.DONE)
+
+    def test_deletion_updates_counterparty_follow_counts(self):
+        user3 = User.objects.create_user(username="testuser3", email="test@test.com", password="testpassword")
+        FriendShip.objects.create(following=user3, follower=self.user1)
+        self.client.post(self.url)
+        call_command("process_deletions", batch_size=2, stdout=io.StringIO())
+
+        summaries = ProfileSummary.objects.in_bulk([self.user2.pk, user3.pk])
+        self.assertEqual((summaries[self.user2.pk].following_count, summaries[self.user2.pk].follower_count), (0, 0))
+        self.assertEqual((summaries[user3.pk].following_count, summaries[user3.pk].follower_count), (0, 0))
+
+    def test_deletion_is_resumable(self):
+        self.client.post(self.url)
+        deletion = AccountDeletion.objects.get(user_id=self.user1.pk)
+        while deletion.stage != AccountDeletion.Stage.TWEETS:
+            process_batch(deletion, batch_size=2)
+        process_batch(deletion, batch_size=2)
+        self.assertEqual(Tweet.objects.filter(user_id=self.user1.pk).count(), 1)
+
+        call_command("process_deletions", batch_size=2, stdout=io.StringIO())
+        self.assertFalse(Tweet.objects.filter(user_id=self.user1.pk).exists())
+        self.assertFalse(User.objects.filter(pk=self.user1.pk).exists())
+
+
+class TestAdminPerformance(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", email="test@test.com", password="testpassword")
+        self.client.force_login(self.admin)
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+
+    def add_relations(self, count):
+        start = User.objects.count()
+        others = User.objects.bulk_create(User(username=f"testuser{start + i}", password="x") for i in range(count))
+        FriendShip.objects.bulk_create(FriendShip(follower=self.user, following=other) for other in others)
+        FriendShip.objects.bulk_create(FriendShip(follower=other, following=self.user) for other in others)
+        tweets = Tweet.objects.bulk_create(Tweet(user=other, content="testcontent") for other in others)
+        Tweet.liked_by.through.objects.bulk_create(
+            Tweet.liked_by.through(tweet=tweet, user=self.user) for tweet in tweets
+        )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_user_change_page_does_not_grow_with_relations(self):
+        url = reverse("admin:accounts_user_change", args=[self.user.pk])
+        self.add_relations(3)
+        # ContentType のキャッシュを温めておく
+        self.count_queries(url)
+        few = self.count_queries(url)
+        self.add_relations(30)
+
+        self.assertEqual(self.count_queries(url), few)
+        response = self.client.get(url)
+        follows_url = reverse("admin:accounts_friendship_changelist")
+        likes_url = reverse("admin:tweets_like_changelist")
+        self.assertContains(response, f'href="{follows_url}?follower__id__exact={self.user.pk}">33</a>')
+        self.assertContains(response, f'href="{likes_url}?user__id__exact={self.user.pk}">33</a>')
+
+    def test_filtered_changelists(self):
+        self.add_relations(3)
+        follows_url = reverse("admin:accounts_friendship_changelist")
+        follows = self.client.get(follows_url, {"follower__id__exact": self.user.pk})
+        likes = self.client.get(reverse("admin:tweets_like_changelist"), {"user__id__exact": self.user.pk})
+
+        self.assertEqual(follows.context["cl"].result_count, 3)
+        self.assertIsNone(follows.context["cl"].full_result_count)
+        self.assertEqual(likes.context["cl"].result_count, 3)
+
+    def test_tweet_change_page_has_no_user_selects(self):
+        tweet = Tweet.objects.create(user=self.user, content="testcontent")
+        response = self.client.get(reverse("admin:tweets_tweet_change", args=[tweet.pk]))
+
+        self.assertNotContains(response, 'name="liked_by"')
+        self.assertNotContains(response, f'<option value="{self.admin.pk}"')
+        self.assertContains(response, "testcontent")
+
+    def test_add_tweet(self):
+        data = {"user": self.user.pk, "content": "testcontent"}
+        response = self.client.post(reverse("admin:tweets_tweet_add"), data)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Tweet.objects.get(user=self.user).content, "testcontent")
+
+    @override_settings(ADMIN_COUNT_LIMIT=5)
+    def test_paginator_counts(self):
+        self.add_relations(10)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        self.assertEqual(EstimatedCountPaginator(Tweet.objects.order_by("pk"), 2).count, 10)
+        follows = FriendShip.objects.filter(follower=self.user).order_by("pk")
+        self.assertEqual(EstimatedCountPaginator(follows, 2).count, 6)
@@ -9,6 +9,9 @@ urlpatterns = [
     path("signup/", views.SignupView.as_view(), name="signup"),
     path("login/", auth_views.LoginView.as_view(template_name="accounts/login.html"), name="login"),
     path("logout/", auth_views.LogoutView.as_view(), name="logout"),
+    # <str:username>/ より前でも，ユーザー名と同じ1階層の URL はそのユーザーのプロフィールを隠してしまうので2階層にする
+    path("settings/export/", views.ExportView.as_view(), name="export"),
+    path("settings/delete/", views.AccountDeleteView.as_view(), name="delete"),
     path("<str:username>/", views.UserProfileView.as_view(), name="user_profile"),
     path("<str:username>/follow/", views.FollowView.as_view(), name="follow"),
     path("<str:username>/unfollow/", views.UnfollowView.as_view(), name="unfollow"),
@@ -1,16 +1,23 @@
 from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import authenticate, get_user_model, login
+from django.contrib.auth import get_user_model, login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponseBadRequest
-from django.shortcuts import get_object_or_404
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
-from django.views.generic import CreateView, DetailView, ListView, RedirectView
+from django.utils.decorators import method_decorator
+from django.views.generic import CreateView, DetailView, ListView, RedirectView, TemplateView, View
 
-from tweets.models import Tweet
+from mysite.decorators import public_page
+from notifications.tasks import notify_follow
+from tweets.archive import UserTimeline
 
+from .deletion import request_deletion
+from .exports import FORMATS, export_archive
 from .forms import SignupForm
-from .models import FriendShip
+from .models import FriendShip, ProfileSummary
+from .services import follow, unfollow
+from .summary import get_summary
 
 User = get_user_model()
 
@@ -22,29 +29,50 @@ class SignupView(CreateView):
 
     def form_valid(self, form):
         response = super().form_valid(form)
-        username = form.cleaned_data["username"]
-        password = form.cleaned_data["password1"]
-        user = authenticate(self.request, username=username, password=password)
-        login(self.request, user)
+        # フォームでハッシュ化したばかりなので authenticate() でもう一度ハッシュを計算しない
+        login(self.request, self.object, backend="django.contrib.auth.backends.ModelBackend")
         return response
 
 
-class UserProfileView(LoginRequiredMixin, DetailView):
-    model = User
+def user_profile_etag(request, username):
+    # 閲覧者によらない内容だけで作る。request.user に触れると Vary: Cookie が付いて共有キャッシュできなくなる。
+    # プロフィールの表示が変わるたびに ProfileSummary.version が増える。行がなければ共有キャッシュしない
+    row = User.objects.filter(username=username, is_active=True).values_list("pk", "profile_summary__version").first()
+    if row is None or row[1] is None:
+        return None
+    pk, version = row
+    return f"profile-{pk}-{version}"
+
+
+@method_decorator(public_page(user_profile_etag), name="get")
+class UserProfileView(DetailView):
+    # 誰が見ても同じ内容を返し，フォローやいいねの状態は like.js が viewer_state から取得する
+    # 見出しは ProfileSummary の1行だけで作る
+    queryset = User.objects.filter(is_active=True).select_related("profile_summary")
     template_name = "accounts/profile.html"
     slug_field = "username"
     slug_url_kwarg = "username"
 
+    def get(self, request, *args, **kwargs):
+        try:
+            self.before = int(request.GET["before"]) if "before" in request.GET else None
+        except ValueError:
+            return HttpResponseBadRequest()
+        return super().get(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         profile_user = self.object
-        context["tweet_list"] = (
-            Tweet.objects.select_related("user").prefetch_related("liked_by").filter(user=profile_user)
-        )
-        context["is_following"] = self.request.user.followings.filter(username=profile_user).exists()
-        context["follower_count"] = profile_user.followers.count()
-        context["following_count"] = profile_user.followings.count()
-        context["liking_tweet_list"] = self.request.user.liking.all()
+        try:
+            summary = profile_user.profile_summary
+        except ProfileSummary.DoesNotExist:
+            summary = get_summary(profile_user.pk)
+        tweets, next_cursor = UserTimeline(profile_user).page(self.before, settings.PROFILE_PAGE_SIZE, summary)
+        context["summary"] = summary
+        context["tweet_list"] = tweets
+        context["next_cursor"] = next_cursor
+        context["follower_count"] = summary.follower_count
+        context["following_count"] = summary.following_count
         return context
 
 
@@ -52,13 +80,13 @@ class FollowView(LoginRequiredMixin, RedirectView):
     url = reverse_lazy("tweets:home")
 
     def post(self, request, *args, **kwargs):
-        target_user = get_object_or_404(User, username=self.kwargs["username"])
+        target_user = get_object_or_404(User, username=self.kwargs["username"], is_active=True)
 
         if self.request.user == target_user:
             messages.error(self.request, "自分自身をフォローできません")
             return HttpResponseBadRequest()
-        else:
-            self.request.user.followings.add(target_user)
+        elif follow(self.request.user.pk, target_user.pk):
+            notify_follow.delay(target_id=target_user.pk, actor_id=self.request.user.pk)
 
         return super().post(request, *args, **kwargs)
 
@@ -73,11 +101,32 @@ class UnfollowView(LoginRequiredMixin, RedirectView):
             messages.error(self.request, "自分自身をフォロー解除できません")
             return HttpResponseBadRequest()
         else:
-            self.request.user.followings.remove(target_user)
+            unfollow(self.request.user.pk, target_user.pk)
 
         return super().post(request, *args, **kwargs)
 
 
+class ExportView(LoginRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        format = request.GET.get("format", "jsonl")
+        if format not in FORMATS:
+            return HttpResponseBadRequest()
+        response = StreamingHttpResponse(export_archive(request.user, format=format), content_type="application/gzip")
+        response["Content-Disposition"] = f'attachment; filename="{request.user.username}.{format}.gz"'
+        return response
+
+
+class AccountDeleteView(LoginRequiredMixin, TemplateView):
+    template_name = "accounts/delete.html"
+
+    def post(self, request, *args, **kwargs):
+        # すぐにログインできなくし，関連データは process_deletions コマンドで少しずつ消す
+        request_deletion(request.user)
+        logout(request)
+        messages.info(request, "退会手続きを受け付けました")
+        return redirect(settings.LOGIN_URL)
+
+
 class FollowingListView(LoginRequiredMixin, ListView):
     template_name = "accounts/following_list.html"
     model = FriendShip
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from analytics.rollups import reset, roll_up
+
+
+class Command(BaseCommand):
+    help = "Add new tweets, likes and follows to the hourly and daily analytics rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--lag", type=int, help="Skip rows newer than this many seconds (default: ANALYTICS_ROLLUP_LAG)."
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Drop the rollups and start over; past likes land in the current hour.",
+        )
+
+    def handle(self, *args, batch_size, lag, rebuild, **options):
+        if rebuild:
+            reset()
+        totals = {}
+        for source, processed in roll_up(batch_size, lag):
+            totals[source] = totals.get(source, 0) + processed
+            self.stdout.write(f"{source}: {totals[source]} rows")
+        self.stdout.write(f"Rolled up {sum(totals.values())} rows")
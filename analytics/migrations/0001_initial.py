@@ -0,0 +1,43 @@
+# Generated by Django 4.1.13 on 2026-10-19 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Rollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "metric",
+                    models.CharField(
+                        choices=[("tweets", "Tweets"), ("likes", "Likes"), ("follows", "Follows")], max_length=16
+                    ),
+                ),
+                ("period", models.CharField(choices=[("hour", "Hour"), ("day", "Day")], max_length=8)),
+                ("subject_id", models.BigIntegerField(default=0)),
+                ("bucket", models.DateTimeField()),
+                ("count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                ("source", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(null=True)),
+                ("last_id", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="rollup",
+            constraint=models.UniqueConstraint(
+                fields=("metric", "period", "subject_id", "bucket"), name="unique_rollup"
+            ),
+        ),
+    ]
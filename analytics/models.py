@@ -0,0 +1,33 @@
+from django.db import models
+
+
+class Rollup(models.Model):
+    # 1時間・1日ごとの件数。analytics.rollups が元の表に増えた行だけを足していく
+    class Period(models.TextChoices):
+        HOUR = "hour"
+        DAY = "day"
+
+    class Metric(models.TextChoices):
+        TWEETS = "tweets"
+        LIKES = "likes"
+        FOLLOWS = "follows"
+
+    metric = models.CharField(max_length=16, choices=Metric.choices)
+    period = models.CharField(max_length=8, choices=Period.choices)
+    # 0 は全体。likes はツイートの ID，follows はフォローされた側のユーザーの ID
+    subject_id = models.BigIntegerField(default=0)
+    # TIME_ZONE での時・日の始まり
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["metric", "period", "subject_id", "bucket"], name="unique_rollup"),
+        ]
+
+
+class RollupWatermark(models.Model):
+    # どこまで集計したか。source は "tweets:default" のように元の表と DB の別名
+    source = models.CharField(max_length=64, primary_key=True)
+    created_at = models.DateTimeField(null=True)
+    last_id = models.BigIntegerField(default=0)
@@ -0,0 +1,125 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import FriendShip
+from tweets.models import Like, Tweet
+from tweets.sharding import shard_aliases
+
+from .models import Rollup, RollupWatermark
+
+Metric = Rollup.Metric
+Period = Rollup.Period
+
+
+def buckets(moment):
+    hour = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    return {Period.HOUR: hour, Period.DAY: hour.replace(hour=0)}
+
+
+def _after(mark):
+    # (created_at, id) の順で watermark より後の行
+    if mark.created_at is None:
+        return Q()
+    return Q(created_at__gt=mark.created_at) | Q(created_at=mark.created_at, pk__gt=mark.last_id)
+
+
+def _read_tweets(alias):
+    def read(mark, cutoff, batch_size):
+        rows = (
+            Tweet.objects.using(alias)
+            .filter(_after(mark), created_at__lt=cutoff)
+            .order_by("created_at", "pk")
+            .values_list("created_at", "pk")[:batch_size]
+        )
+        return [(created_at, pk, [(Metric.TWEETS, 0)]) for created_at, pk in rows]
+
+    return read
+
+
+def _read_follows(mark, cutoff, batch_size):
+    rows = (
+        FriendShip.objects.filter(_after(mark), created_at__lt=cutoff)
+        .order_by("created_at", "pk")
+        .values_list("created_at", "pk", "follower_id")[:batch_size]
+    )
+    return [(created_at, pk, [(Metric.FOLLOWS, 0), (Metric.FOLLOWS, user_id)]) for created_at, pk, user_id in rows]
+
+
+def _read_likes(alias):
+    def read(mark, cutoff, batch_size):
+        rows = (
+            Like.objects.using(alias)
+            .filter(_after(mark), created_at__lt=cutoff)
+            .order_by("created_at", "pk")
+            .values_list("created_at", "pk", "tweet_id")[:batch_size]
+        )
+        return [(created_at, pk, [(Metric.LIKES, 0), (Metric.LIKES, tweet_id)]) for created_at, pk, tweet_id in rows]
+
+    return read
+
+
+def sources():
+    for alias in shard_aliases():
+        yield f"tweets:{alias}", _read_tweets(alias)
+        yield f"likes:{alias}", _read_likes(alias)
+    yield "follows:default", _read_follows
+
+
+def _add(counts):
+    existing = Rollup.objects.filter(
+        metric__in={key[0] for key in counts},
+        period__in={key[1] for key in counts},
+        subject_id__in={key[2] for key in counts},
+        bucket__in={key[3] for key in counts},
+    )
+    rows = {(row.metric, row.period, row.subject_id, row.bucket): row for row in existing}
+    updated, created = [], []
+    for key, count in counts.items():
+        row = rows.get(key)
+        if row is None:
+            metric, period, subject_id, bucket = key
+            created.append(Rollup(metric=metric, period=period, subject_id=subject_id, bucket=bucket, count=count))
+        else:
+            row.count += count
+            updated.append(row)
+    Rollup.objects.bulk_update(updated, ["count"])
+    Rollup.objects.bulk_create(created)
+
+
+def roll_up_chunk(source, read, cutoff, batch_size=1000):
+    # 集計と watermark の更新を同じトランザクションで行うので，途中で止まっても二重に数えない
+    with transaction.atomic():
+        mark, _ = RollupWatermark.objects.select_for_update().get_or_create(source=source)
+        rows = read(mark, cutoff, batch_size)
+        if not rows:
+            return 0
+        counts = Counter()
+        for created_at, _, events in rows:
+            for period, bucket in buckets(created_at).items():
+                for metric, subject_id in events:
+                    counts[metric, period, subject_id, bucket] += 1
+        _add(counts)
+        mark.created_at, mark.last_id, _ = rows[-1]
+        mark.save()
+    return len(rows)
+
+
+def roll_up(batch_size=1000, lag=None):
+    # 書き込み中のトランザクションの行を飛ばさないように，lag 秒より前に作られた行だけを集計する。
+    # 同時に1つだけ動かすこと。(source, 件数) をチャンクごとに返す
+    lag = settings.ANALYTICS_ROLLUP_LAG if lag is None else lag
+    cutoff = timezone.now() - timedelta(seconds=lag)
+    for source, read in sources():
+        while processed := roll_up_chunk(source, read, cutoff, batch_size):
+            yield source, processed
+
+
+def reset():
+    with transaction.atomic():
+        Rollup.objects.all().delete()
+        RollupWatermark.objects.all().delete()
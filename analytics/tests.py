@@ -0,0 +1,113 @@
+import io
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import FriendShip
+from tweets.models import Like, Tweet
+
+from .models import Rollup, RollupWatermark
+from .rollups import buckets, roll_up
+
+User = get_user_model()
+
+
+class TestRollup(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test@test.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test@test.com", password="testpassword")
+        self.hour_ago = timezone.now() - timedelta(hours=1)
+        self.tweets = [Tweet.objects.create(user=self.user1, content=f"testcontent{i}") for i in range(3)]
+        Tweet.objects.filter(pk=self.tweets[0].pk).update(created_at=self.hour_ago)
+        self.tweets[1].liked_by.add(self.user2)
+        FriendShip.objects.create(following=self.user2, follower=self.user1)
+
+    def count(self, metric, period, subject_id=0):
+        return sum(
+            Rollup.objects.filter(metric=metric, period=period, subject_id=subject_id).values_list("count", flat=True)
+        )
+
+    def test_counts_each_row_once(self):
+        processed = sum(count for _, count in roll_up(batch_size=2, lag=0))
+        self.assertEqual(processed, 5)
+
+        bucket = buckets(self.hour_ago)[Rollup.Period.HOUR]
+        self.assertEqual(Rollup.objects.get(metric="tweets", period="hour", subject_id=0, bucket=bucket).count, 1)
+        self.assertEqual(self.count("tweets", "hour"), 3)
+        self.assertEqual(self.count("tweets", "day"), 3)
+        self.assertEqual(self.count("likes", "hour", self.tweets[1].pk), 1)
+        self.assertEqual(self.count("follows", "day", self.user1.pk), 1)
+
+        Tweet.objects.create(user=self.user2, content="testcontent")
+        self.tweets[2].liked_by.add(self.user2)
+        self.assertEqual(sum(count for _, count in roll_up(lag=0)), 2)
+        self.assertEqual(list(roll_up(lag=0)), [])
+        self.assertEqual(self.count("tweets", "day"), 4)
+        self.assertEqual(self.count("likes", "day"), 2)
+
+    def test_skips_rows_newer_than_lag(self):
+        list(roll_up(lag=600))
+
+        self.assertEqual(self.count("tweets", "hour"), 1)
+        self.assertEqual(self.count("follows", "hour"), 0)
+        self.assertEqual(self.count("likes", "hour"), 0)
+
+    def test_likes_are_bucketed_by_created_at(self):
+        Like.objects.filter(tweet=self.tweets[1]).update(created_at=self.hour_ago)
+        list(roll_up(lag=600))
+
+        bucket = buckets(self.hour_ago)[Rollup.Period.HOUR]
+        self.assertEqual(Rollup.objects.get(metric="likes", period="hour", subject_id=0, bucket=bucket).count, 1)
+
+    def test_command_rebuild(self):
+        call_command("rollup_analytics", lag=0, stdout=io.StringIO())
+        stdout = io.StringIO()
+        call_command("rollup_analytics", lag=0, rebuild=True, stdout=stdout)
+
+        self.assertIn("Rolled up 5 rows", stdout.getvalue())
+        self.assertEqual(self.count("tweets", "hour"), 3)
+        self.assertEqual(RollupWatermark.objects.count(), 3)
+
+
+class TestAnalyticsView(TestCase):
+    def setUp(self):
+        self.url = reverse("analytics:dashboard")
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.staff = User.objects.create_user(
+            username="staff", email="test@test.com", password="testpassword", is_staff=True
+        )
+        hour = buckets(timezone.now())[Rollup.Period.HOUR]
+        Rollup.objects.bulk_create(
+            [
+                Rollup(metric="likes", period="hour", subject_id=0, bucket=hour, count=5),
+                Rollup(metric="likes", period="hour", subject_id=42, bucket=hour, count=3),
+                Rollup(metric="likes", period="hour", subject_id=7, bucket=hour, count=2),
+                Rollup(metric="likes", period="hour", subject_id=0, bucket=hour - timedelta(days=3), count=9),
+            ]
+        )
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_reads_rollups_only(self):
+        self.client.force_login(self.staff)
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url, {"metric": "likes", "period": "hour"})
+
+        self.assertEqual(response.context["total"], 5)
+        self.assertEqual([row["subject_id"] for row in response.context["top_subjects"]], [42, 7])
+        response = self.client.get(self.url, {"metric": "likes", "period": "hour", "subject": 42})
+        self.assertEqual(response.context["total"], 3)
+
+    def test_failure_get_with_invalid_params(self):
+        self.client.force_login(self.staff)
+
+        self.assertEqual(self.client.get(self.url, {"metric": "users"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"days": "abc"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"days": 1000}).status_code, 400)
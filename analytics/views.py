@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.db.models import Sum
+from django.http import HttpResponseBadRequest
+from django.utils import timezone
+from django.views.generic import TemplateView
+
+from .models import Rollup
+from .rollups import buckets
+
+
+class AnalyticsView(UserPassesTestMixin, TemplateView):
+    # Rollup だけを読む。元の表には問い合わせない
+    template_name = "analytics/dashboard.html"
+    max_days = 90
+    top_count = 10
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        self.metric = request.GET.get("metric", Rollup.Metric.TWEETS)
+        self.period = request.GET.get("period", Rollup.Period.HOUR)
+        try:
+            self.subject_id = int(request.GET.get("subject", 0))
+            self.days = int(request.GET.get("days", 1 if self.period == Rollup.Period.HOUR else 30))
+        except ValueError:
+            return HttpResponseBadRequest()
+        if (
+            self.metric not in Rollup.Metric.values
+            or self.period not in Rollup.Period.values
+            or not 1 <= self.days <= self.max_days
+        ):
+            return HttpResponseBadRequest()
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        since = buckets(timezone.now() - timedelta(days=self.days))[Rollup.Period.DAY]
+        rollups = Rollup.objects.filter(metric=self.metric, period=self.period, bucket__gte=since)
+        series = list(rollups.filter(subject_id=self.subject_id).order_by("bucket").values_list("bucket", "count"))
+        context.update(
+            metric=self.metric,
+            period=self.period,
+            subject_id=self.subject_id,
+            days=self.days,
+            metrics=Rollup.Metric.choices,
+            periods=Rollup.Period.choices,
+            series=series,
+            total=sum(count for _, count in series),
+        )
+        if self.metric != Rollup.Metric.TWEETS:
+            # 期間内にいいねの多かったツイート・フォロワーの増えたユーザー
+            context["top_subjects"] = (
+                rollups.filter(subject_id__gt=0)
+                .values("subject_id")
+                .annotate(total=Sum("count"))
+                .order_by("-total", "subject_id")[: self.top_count]
+            )
+        return context
@@ -0,0 +1,51 @@
+"""Benchmark for mysite.bloom.BloomFilter: false-positive rate against memory use.
+
+Compares the serialized filter size with a pickled set of the same ids, which is
+what caching the raw liked-tweet ids would cost.
+
+$ python -m benchmarks.bloom --items 1000 --lookups 100000
+"""
+
+import argparse
+import os
+import pickle
+import random
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+django.setup()
+
+from mysite.bloom import BloomFilter  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 100, 1_000, 10_000])
+    parser.add_argument("--error-rates", type=float, nargs="+", default=[0.1, 0.01, 0.001])
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'items':>8} {'target':>8} {'measured':>9} {'hashes':>6} {'filter':>10} {'set':>10} {'lookup':>10}")
+    for items in args.items:
+        # snowflake ID のような大きな整数で試す
+        keys = rng.sample(range(1 << 60), items + args.lookups)
+        members, others = keys[:items], keys[items:]
+        raw = len(pickle.dumps(set(members)))
+        for error_rate in args.error_rates:
+            bloom = BloomFilter.build(members, error_rate)
+            assert all(key in bloom for key in members)
+            start = time.perf_counter()
+            false_positives = sum(key in bloom for key in others)
+            lookup_us = (time.perf_counter() - start) / len(others) * 1e6
+            print(
+                f"{items:>8,} {error_rate:>8.3%} {false_positives / len(others):>9.3%} {bloom.num_hashes:>6} "
+                f"{len(bloom.to_bytes()):>9,}B {raw:>9,}B {lookup_us:>7.2f} us"
+            )
+
+
+if __name__ == "__main__":
+    main()
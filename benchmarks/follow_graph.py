@@ -0,0 +1,59 @@
+"""Benchmark for accounts.graph.FollowGraph.
+
+$ python -m benchmarks.follow_graph --edges 1000000
+"""
+
+import argparse
+import os
+import random
+import time
+import tracemalloc
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+django.setup()
+
+from accounts.graph import FollowGraph  # noqa: E402
+
+
+def timeit(func, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--edges", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    adjacency = {}
+    for _ in range(args.edges):
+        adjacency.setdefault(rng.randrange(args.users), set()).add(rng.randrange(args.users))
+
+    tracemalloc.start()
+    graph = FollowGraph(max_edges=args.edges, ttl=None)
+    start = time.perf_counter()
+    for user_id, ids in adjacency.items():
+        graph.prime(user_id, ids)
+    load_seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    pairs = [(rng.randrange(args.users), rng.randrange(args.users)) for _ in range(args.lookups)]
+    users = list(adjacency)
+    print(f"edges: {len(graph):,}  users: {len(adjacency):,}")
+    print(f"load: {load_seconds:.2f}s  peak memory: {peak / 2**20:.1f} MiB")
+    print(f"is_following:    {timeit(graph.is_following, pairs):.2f} us/op")
+    print(f"is_mutual:       {timeit(graph.is_mutual, pairs):.2f} us/op")
+    print(f"following_count: {timeit(graph.following_count, [(u,) for u in users]):.2f} us/op")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Multi-process load test of mysite.wsgi / mysite.asgi on localhost, using only the standard library.
+
+Seeds a throwaway SQLite database, serves the application from --workers forked processes sharing one listening
+socket, and drives a weighted scenario mix from --clients processes with a pool of logged-in sessions.
+
+    $ python -m benchmarks.loadtest --server wsgi --workers 4 --clients 8 --duration 20
+    $ python -m benchmarks.loadtest --server asgi
+"""
+
+import argparse
+import asyncio
+import http.client
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from http import HTTPStatus
+from urllib.parse import unquote, urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+import django
+
+os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+os.environ.setdefault("LOADTEST_DB", os.path.join(tempfile.mkdtemp(prefix="loadtest"), "db.sqlite3"))
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY  # noqa: E402
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.contrib.sessions.backends.db import SessionStore  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django.utils.crypto import get_random_string  # noqa: E402
+
+from accounts.models import FriendShip  # noqa: E402
+from tweets.models import Tweet  # noqa: E402
+
+User = get_user_model()
+
+SCENARIOS = {"home": 40, "profile": 15, "detail": 20, "like": 15, "follow": 5, "post": 5}
+
+
+def seed(users, tweets, sessions, rng):
+    call_command("migrate", verbosity=0)
+    with connection.cursor() as cursor:
+        # 複数プロセスから書き込むので読み取りが書き込みを待たないようにする
+        cursor.execute("PRAGMA journal_mode=WAL")
+    password = make_password("loadtest")
+    User.objects.bulk_create(User(username=f"load{i}", password=password) for i in range(users))
+    user_ids = list(User.objects.values_list("pk", flat=True))
+    Tweet.objects.bulk_create(
+        Tweet(user_id=rng.choice(user_ids), content=get_random_string(rng.randint(10, 140))) for _ in range(tweets)
+    )
+    tweet_ids = list(Tweet.objects.values_list("pk", flat=True))
+    follows = {(rng.choice(user_ids), rng.choice(user_ids)) for _ in range(users * 10)}
+    FriendShip.objects.bulk_create(
+        (FriendShip(following_id=a, follower_id=b) for a, b in follows if a != b), ignore_conflicts=True
+    )
+    likes = {(rng.choice(tweet_ids), rng.choice(user_ids)) for _ in range(tweets * 2)}
+    Tweet.liked_by.through.objects.bulk_create(
+        (Tweet.liked_by.through(tweet_id=t, user_id=u) for t, u in likes), ignore_conflicts=True
+    )
+    pool = []
+    for user in User.objects.order_by("?")[:sessions]:
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        pool.append((session.session_key, get_random_string(32), user.username))
+    usernames = list(User.objects.values_list("username", flat=True))
+    return usernames, tweet_ids, pool
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_wsgi(sock):
+    from mysite.wsgi import application
+
+    server = WSGIServer(sock.getsockname(), QuietHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    server.server_name, server.server_port = sock.getsockname()[:2]
+    server.setup_environ()
+    server.set_app(application)
+    server.serve_forever()
+
+
+def serve_asgi(sock):
+    # 最小限の HTTP/1.1 サーバー。1接続1リクエストで，レスポンス後に接続を閉じる
+    from mysite.asgi import application
+
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = []
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, value = line.decode("latin-1").split(":", 1)
+                headers.append((name.strip().lower().encode("latin-1"), value.strip().encode("latin-1")))
+            length = int(dict(headers).get(b"content-length", b"0"))
+            body = await reader.readexactly(length) if length else b""
+            path, _, query = target.partition("?")
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": method,
+                "scheme": "http",
+                "path": unquote(path),
+                "raw_path": path.encode("latin-1"),
+                "query_string": query.encode("latin-1"),
+                "root_path": "",
+                "headers": headers,
+                "client": writer.get_extra_info("peername")[:2],
+                "server": writer.get_extra_info("sockname")[:2],
+            }
+            messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+            async def receive():
+                return messages.pop() if messages else {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status = HTTPStatus(message["status"])
+                    lines = [f"HTTP/1.1 {status.value} {status.phrase}".encode("latin-1")]
+                    lines += [name + b": " + value for name, value in message.get("headers", [])]
+                    lines.append(b"Connection: close")
+                    writer.write(b"\r\n".join(lines) + b"\r\n\r\n")
+                else:
+                    writer.write(message.get("body", b""))
+
+            await application(scope, receive, send)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, sock=sock)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def next_request(rng, usernames, tweet_ids, username):
+    scenario = rng.choices(list(SCENARIOS), weights=list(SCENARIOS.values()))[0]
+    if scenario == "home":
+        return "tweets:home", "GET", reverse("tweets:home"), None
+    if scenario == "profile":
+        return "accounts:user_profile", "GET", reverse("accounts:user_profile", args=[rng.choice(usernames)]), None
+    if scenario == "detail":
+        return "tweets:detail", "GET", reverse("tweets:detail", args=[rng.choice(tweet_ids)]), None
+    if scenario == "like":
+        name = rng.choice(["tweets:like", "tweets:unlike"])
+        return name, "POST", reverse(name, args=[rng.choice(tweet_ids)]), {}
+    if scenario == "follow":
+        name = rng.choice(["accounts:follow", "accounts:unfollow"])
+        target = rng.choice([other for other in rng.sample(usernames, 2) if other != username])
+        return name, "POST", reverse(name, args=[target]), {}
+    return "tweets:create", "POST", reverse("tweets:create"), {"content": get_random_string(rng.randint(10, 140))}
+
+
+def run_client(index, port, duration, seed, usernames, tweet_ids, pool, results):
+    rng = random.Random(seed + index)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        session_key, csrf_token, username = rng.choice(pool)
+        name, method, path, data = next_request(rng, usernames, tweet_ids, username)
+        headers = {"Cookie": f"{settings.SESSION_COOKIE_NAME}={session_key}; {settings.CSRF_COOKIE_NAME}={csrf_token}"}
+        body = None
+        if method == "POST":
+            body = urlencode(data)
+            headers.update({"X-CSRFToken": csrf_token, "Content-Type": "application/x-www-form-urlencoded"})
+        start = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            ok = response.status < 400
+        except OSError:
+            ok = False
+        latencies[name].append(time.perf_counter() - start)
+        if not ok:
+            errors[name] += 1
+    results.put((dict(latencies), dict(errors)))
+
+
+def report(latencies, errors, duration):
+    print(f"{'url name':24} {'requests':>8} {'errors':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name in sorted(latencies, key=lambda name: -len(latencies[name])):
+        samples = sorted(latencies[name])
+        p50, p95, p99 = (samples[min(len(samples) - 1, int(len(samples) * q))] * 1000 for q in (0.5, 0.95, 0.99))
+        print(
+            f"{name:24} {len(samples):8} {errors.get(name, 0):6} {len(samples) / duration:8.1f}"
+            f" {p50:8.1f} {p95:8.1f} {p99:8.1f}"
+        )
+    total = sum(len(samples) for samples in latencies.values())
+    mean = statistics.fmean(s for samples in latencies.values() for s in samples) * 1000 if total else 0
+    print(f"{'total':24} {total:8} {sum(errors.values()):6} {total / duration:8.1f}  mean {mean:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi")
+    parser.add_argument("--workers", type=int, default=2, help="Server processes")
+    parser.add_argument("--clients", type=int, default=4, help="Load generator processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tweets", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    usernames, tweet_ids, pool = seed(args.users, args.tweets, args.sessions, random.Random(args.seed))
+    # fork する前に閉じておき，各プロセスが自分の接続を開くようにする
+    connections.close_all()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(1024)
+    port = sock.getsockname()[1]
+
+    context = multiprocessing.get_context("fork")
+    serve = serve_wsgi if args.server == "wsgi" else serve_asgi
+    workers = [context.Process(target=serve, args=(sock,), daemon=True) for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    results = context.Queue()
+    clients = [
+        context.Process(
+            target=run_client, args=(i, port, args.duration, args.seed, usernames, tweet_ids, pool, results)
+        )
+        for i in range(args.clients)
+    ]
+    try:
+        for client in clients:
+            client.start()
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        for _ in clients:
+            client_latencies, client_errors = results.get()
+            for name, samples in client_latencies.items():
+                latencies[name].extend(samples)
+            for name, count in client_errors.items():
+                errors[name] += count
+        for client in clients:
+            client.join()
+    finally:
+        for worker in workers:
+            worker.terminate()
+        sock.close()
+        for suffix in ("", "-wal", "-shm"):
+            path = f"{settings.DATABASES['default']['NAME']}{suffix}"
+            if os.path.exists(path):
+                os.remove(path)
+
+    print(f"{args.server}: {args.workers} workers, {args.clients} clients, {args.duration:.0f}s")
+    report(latencies, errors, args.duration)
+
+
+if __name__ == "__main__":
+    main()
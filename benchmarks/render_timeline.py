@@ -0,0 +1,87 @@
+"""Rendering benchmark for the tweet list: the previous inline markup vs tweets/tweet_card.html.
+
+$ python -m benchmarks.render_timeline --tweets 1000
+"""
+
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.template import Context, engines  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from tweets.context_processors import url_prefixes  # noqa: E402
+from tweets.models import Tweet  # noqa: E402
+
+User = get_user_model()
+
+BEFORE = """
+{% for tweet in tweet_list %}
+<div>
+    <br>
+    <p><a href="{% url 'accounts:user_profile' tweet.user %}">{{ tweet.user }}</a> {{ tweet.created_at }}</p>
+    <p>{{ tweet.content }}</p>
+    <p>
+        {% if tweet in liking_tweet_list %}
+        <button onclick="changeLike(event)" data-is-liked="true" data-pk="{{ tweet.pk }}">❤︎</button>
+        {% else %}
+        <button onclick="changeLike(event)" data-is-liked="false" data-pk="{{ tweet.pk }}">♡</button>
+        {% endif %}
+        <span id="{{ tweet.pk }}">{{ tweet.like_count }}</span>
+        <a href=" {% url 'tweets:detail' tweet.pk %}">詳細</a>
+    </p>
+</div>
+{% endfor %}
+"""
+
+AFTER = """
+{% for tweet in tweet_list %}
+{% include "tweets/tweet_card.html" %}
+{% endfor %}
+"""
+
+
+def measure(template, context, tweets, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        template.render(Context(context))
+        best = min(best, time.perf_counter() - start)
+    return best / tweets * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tweets", type=int, default=1000)
+    parser.add_argument("--liked", type=int, default=100, help="Number of tweets the viewer has liked")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    users = [User(pk=i, username=f"user{i}") for i in range(1, 51)]
+    now = timezone.now()
+    tweets = [
+        Tweet(pk=i, user=users[i % len(users)], content="x" * 140, created_at=now, like_count=i % 7)
+        for i in range(1, args.tweets + 1)
+    ]
+    liked = tweets[: args.liked]
+
+    engine = engines["django"].engine
+    before = engine.from_string(BEFORE)
+    after = engine.from_string(AFTER)
+    before_context = {"tweet_list": tweets, "liking_tweet_list": liked}
+    after_context = {"tweet_list": tweets, "liked_tweet_ids": {tweet.pk for tweet in liked}, **url_prefixes(None)}
+    # 事前に描画してテンプレートキャッシュを温めておく
+    after.render(Context(after_context))
+
+    print(f"before: {measure(before, before_context, args.tweets, args.repeat):.1f} us/tweet")
+    print(f"after:  {measure(after, after_context, args.tweets, args.repeat):.1f} us/tweet")
+
+
+if __name__ == "__main__":
+    main()
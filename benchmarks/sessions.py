@@ -0,0 +1,88 @@
+"""Per-request session overhead for each SESSION_ENGINE, measured on a throwaway test database.
+
+$ python -m benchmarks.sessions --requests 2000
+"""
+
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.contrib.auth.middleware import AuthenticationMiddleware  # noqa: E402
+from django.contrib.sessions.middleware import SessionMiddleware  # noqa: E402
+from django.core.cache import caches  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import Client, RequestFactory, override_settings  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+User = get_user_model()
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+
+
+class SessionQueryCounter:
+    def __init__(self):
+        self.sessions = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if "django_session" in sql:
+            self.sessions += 1
+        return execute(sql, params, many, context)
+
+
+def view(request):
+    # LoginRequiredMixin と同じくセッションからログインユーザーを読む
+    request.user.is_authenticated
+    return HttpResponse()
+
+
+def measure(engine, user, requests):
+    with override_settings(SESSION_ENGINE=engine):
+        caches["sessions"].clear()
+        client = Client()
+        start = time.perf_counter()
+        client.force_login(user)
+        login = time.perf_counter() - start
+        cookie = client.cookies[settings.SESSION_COOKIE_NAME].value
+        middleware = SessionMiddleware(AuthenticationMiddleware(view))
+        factory = RequestFactory()
+        counter = SessionQueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            for _ in range(requests):
+                request = factory.get("/")
+                request.COOKIES[settings.SESSION_COOKIE_NAME] = cookie
+                middleware(request)
+            elapsed = time.perf_counter() - start
+    return login * 1e6, elapsed / requests * 1e6, counter.sessions / requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create_user(username="bench", password="bench")
+        for mode, engine in ENGINES.items():
+            login, per_request, queries = measure(engine, user, args.requests)
+            print(f"{mode:15} login {login:8.1f} us  request {per_request:6.1f} us  session queries {queries:.2f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
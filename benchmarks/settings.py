@@ -0,0 +1,20 @@
+# benchmarks.loadtest 用の設定。使い捨ての SQLite ファイルに対して本番に近い設定で動かす
+import os
+
+from mysite.settings import *  # noqa: F401,F403
+from mysite.settings import BASE_DIR
+
+DEBUG = False
+ALLOWED_HOSTS = ["127.0.0.1", "localhost"]
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("LOADTEST_DB", BASE_DIR / "loadtest.sqlite3"),
+        "OPTIONS": {"timeout": 30},
+    }
+}
+# collectstatic を前提にしない
+STATICFILES_STORAGE = "django.contrib.staticfiles.storage.StaticFilesStorage"
+RATELIMITS = {}
+# シードのユーザー作成を速くするため。計測対象のリクエストではハッシュを計算しない
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
@@ -0,0 +1,73 @@
+"""Signup throughput on one core for each password hasher, measured on a throwaway test database.
+
+"authenticate" repeats the authenticate() call SignupView used to make after the form had saved the user.
+
+    $ python -m benchmarks.signup --signups 20
+"""
+
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+django.setup()
+
+from django.contrib.auth import authenticate  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+try:
+    import argon2  # noqa: F401
+except ImportError:
+    argon2 = None
+
+HASHERS = {
+    "scrypt": "accounts.hashers.ScryptPasswordHasher",
+    "argon2": "accounts.hashers.Argon2PasswordHasher",
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+}
+
+
+def measure(hasher, signups, prefix, extra_authenticate):
+    client = Client()
+    url = reverse("accounts:signup")
+    with override_settings(PASSWORD_HASHERS=[hasher]):
+        start = time.perf_counter()
+        for i in range(signups):
+            username = f"{prefix}{i}"
+            data = {"username": username, "email": "bench@example.com", "password1": "benchpassword"}
+            data["password2"] = data["password1"]
+            response = client.post(url, data)
+            assert response.status_code == 302, response.status_code
+            if extra_authenticate:
+                authenticate(username=username, password=data["password1"])
+            client.cookies.clear()
+        elapsed = time.perf_counter() - start
+    return signups / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--signups", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        for name, hasher in HASHERS.items():
+            if name == "argon2" and argon2 is None:
+                print(f"{name:7} skipped (argon2-cffi is not installed)")
+                continue
+            before = measure(hasher, args.signups, f"{name}a", extra_authenticate=True)
+            after = measure(hasher, args.signups, f"{name}b", extra_authenticate=False)
+            print(f"{name:7} authenticate {before:6.1f} signups/s  login only {after:6.1f} signups/s")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Cold start of mysite.wsgi in a fresh interpreter: slowest imports (python -X importtime),
+AppConfig.ready durations, boot time and the latency of the first request.
+
+    $ python -m benchmarks.startup --top 20
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+CHILD = """
+import time
+from wsgiref.util import setup_testing_defaults
+
+start = time.perf_counter()
+import mysite.wsgi
+
+booted = time.perf_counter()
+environ = {"PATH_INFO": "/accounts/login/"}
+setup_testing_defaults(environ)
+b"".join(mysite.wsgi.application(environ, lambda status, headers: None))
+done = time.perf_counter()
+print(f"startup: import mysite.wsgi {(booted - start) * 1000:.2f} ms", file=sys.stderr)
+print(f"startup: first request {(done - booted) * 1000:.2f} ms", file=sys.stderr)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    env = dict(os.environ, DJANGO_PROFILE_STARTUP="1")
+    env.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import sys\n" + CHILD],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "[us]" not in line:
+            self_us, cumulative_us, module = line[len("import time:") :].split("|")
+            imports.append((int(self_us), int(cumulative_us), module.strip()))
+        elif line.startswith("startup: "):
+            print(line[len("startup: ") :])
+
+    print(f"\nslowest imports (self, cumulative ms) of {len(imports)} modules:")
+    for self_us, cumulative_us, module in sorted(imports, reverse=True)[: args.top]:
+        print(f"{self_us / 1000:8.2f} {cumulative_us / 1000:8.2f}  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import work
+
+
+def worker_loop(batch_size, sleep, once):
+    connections.close_all()
+    while True:
+        processed = work(batch_size)
+        if processed == 0:
+            if once:
+                return
+            time.sleep(sleep)
+
+
+class Command(BaseCommand):
+    help = "Run background jobs queued in the jobs table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1)
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--sleep", type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty.")
+
+    def handle(self, *args, processes, batch_size, sleep, once, **options):
+        if processes == 1:
+            worker_loop(batch_size, sleep, once)
+            return
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=worker_loop, args=(batch_size, sleep, once), daemon=True)
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
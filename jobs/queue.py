@@ -0,0 +1,77 @@
+import functools
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+
+def task(func):
+    # @task を付けた関数は func.delay(**kwargs) でキューに積める
+    func.delay = functools.partial(enqueue, func)
+    return func
+
+
+def enqueue(func, **kwargs):
+    if settings.JOBS_EAGER:
+        func(**kwargs)
+        return None
+    return Job.objects.create(name=f"{func.__module__}.{func.__qualname__}", kwargs=kwargs)
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOBS_RETRY_BACKOFF_MAX))
+
+
+def claim(batch_size):
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    runnable = Job.objects.filter(
+        Q(status=Job.Status.QUEUED, run_at__lte=now) | Q(status=Job.Status.RUNNING, locked_until__lt=now)
+    ).order_by("run_at")
+    claimed = {
+        "status": Job.Status.RUNNING,
+        "claimed_by": token,
+        "locked_until": now + timedelta(seconds=settings.JOBS_LEASE),
+        "attempts": F("attempts") + 1,
+    }
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            ids = list(runnable.select_for_update(skip_locked=True).values_list("pk", flat=True)[:batch_size])
+            Job.objects.filter(pk__in=ids).update(**claimed)
+        else:
+            # SQLite などは1つの UPDATE ... WHERE id IN (SELECT ... LIMIT n) で取り合いを防ぐ
+            Job.objects.filter(pk__in=runnable.values("pk")[:batch_size]).update(**claimed)
+    return list(Job.objects.filter(claimed_by=token, status=Job.Status.RUNNING).order_by("run_at"))
+
+
+def run(job):
+    # 本体と Job の削除を1つのトランザクションで行い，取ったときの claimed_by のままの行だけを消す。
+    # リースが切れて別のワーカーが取り直していたら実行しないので，default の DB への書き込みは二重に反映されない
+    owned = Job.objects.filter(pk=job.pk, claimed_by=job.claimed_by)
+    try:
+        with transaction.atomic():
+            if not owned.delete()[0]:
+                return False
+            import_string(job.name)(**job.kwargs)
+    except Exception:
+        if job.attempts >= settings.JOBS_MAX_ATTEMPTS:
+            status, run_at = Job.Status.FAILED, job.run_at
+        else:
+            status, run_at = Job.Status.QUEUED, timezone.now() + backoff(job.attempts)
+        owned.update(status=status, run_at=run_at, locked_until=None, last_error=traceback.format_exc())
+        return False
+    return True
+
+
+def work(batch_size=100):
+    jobs = claim(batch_size)
+    for job in jobs:
+        run(job)
+    return len(jobs)
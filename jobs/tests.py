@@ -0,0 +1,119 @@
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim, enqueue, run, task, work
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task
+def fail():
+    raise ValueError("boom")
+
+
+@task
+def record_then_fail(value):
+    record.delay(value=value)
+    raise ValueError("boom")
+
+
+class TestEnqueue(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_inserts_job(self):
+        with self.assertNumQueries(1):
+            job = record.delay(value=1)
+
+        self.assertEqual(job.name, "jobs.tests.record")
+        self.assertEqual(job.kwargs, {"value": 1})
+        self.assertEqual(calls, [])
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        self.assertIsNone(enqueue(record, value=1))
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+
+class TestWorker(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_work_runs_and_deletes_jobs(self):
+        record.delay(value=1)
+        record.delay(value=2)
+
+        self.assertEqual(work(batch_size=10), 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertFalse(Job.objects.exists())
+
+    def test_claim_is_batched(self):
+        for i in range(3):
+            record.delay(value=i)
+
+        self.assertEqual(len(claim(batch_size=2)), 2)
+        self.assertEqual(len(claim(batch_size=2)), 1)
+        self.assertEqual(claim(batch_size=2), [])
+
+    def test_future_jobs_are_not_claimed(self):
+        job = record.delay(value=1)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now() + timezone.timedelta(minutes=1))
+
+        self.assertEqual(work(), 0)
+
+    @override_settings(JOBS_MAX_ATTEMPTS=2)
+    def test_failed_job_is_retried_with_backoff(self):
+        job = fail.delay()
+        work()
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn("ValueError", job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        work()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_expired_lease_is_reclaimed(self):
+        record.delay(value=1)
+        claim(batch_size=1)
+        Job.objects.update(locked_until=timezone.now() - timezone.timedelta(seconds=1))
+
+        self.assertEqual(work(), 1)
+        self.assertEqual(calls, [1])
+
+    def test_job_taken_over_after_lease_is_not_run_twice(self):
+        record.delay(value=1)
+        (job,) = claim(batch_size=1)
+        Job.objects.update(locked_until=timezone.now() - timezone.timedelta(seconds=1))
+        (taken,) = claim(batch_size=1)
+
+        self.assertFalse(run(job))
+        self.assertEqual(calls, [])
+        self.assertTrue(run(taken))
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_job_rolls_back_its_writes(self):
+        record_then_fail.delay(value=1)
+        work()
+
+        self.assertEqual(list(Job.objects.values_list("name", flat=True)), ["jobs.tests.record_then_fail"])
+
+    def test_runjobs_command(self):
+        record.delay(value=1)
+        call_command("runjobs", "--once")
+
+        self.assertEqual(calls, [1])
@@ -0,0 +1,61 @@
+from django.contrib import admin
+from django.contrib.admin.apps import SimpleAdminConfig
+from django.contrib.admin.checks import check_admin_app, check_dependencies
+from django.core import checks
+from django.urls import URLResolver
+from django.urls.resolvers import RoutePattern
+
+
+def check_lazy_admin_app(app_configs, **kwargs):
+    admin.autodiscover()
+    return check_admin_app(app_configs, **kwargs)
+
+
+class LazyAdminConfig(SimpleAdminConfig):
+    # 起動時に各アプリの admin.py を読み込まない。/admin/ の URL を初めて使うときかシステムチェックのときに読み込む
+    def ready(self):
+        checks.register(check_dependencies, checks.Tags.admin)
+        checks.register(check_lazy_admin_app, checks.Tags.admin)
+
+
+class LazyAdminURLConf:
+    def __init__(self, site):
+        self.site = site
+        self.loaded = False
+
+    @property
+    def urlpatterns(self):
+        if not self.loaded:
+            admin.autodiscover()
+            self._urlpatterns = self.site.get_urls()
+            self.loaded = True
+        return self._urlpatterns
+
+
+class LazyAdminResolver(URLResolver):
+    # 他の URL の逆引きで親が _populate() しても admin は読み込まず，
+    # admin の URL を解決・逆引きするときに初めて admin.autodiscover() する
+    def __init__(self, route, site=admin.site):
+        super().__init__(RoutePattern(route), LazyAdminURLConf(site), app_name="admin", namespace=site.name)
+
+    def _populate(self):
+        if self.urlconf_name.loaded:
+            super()._populate()
+
+    def load(self):
+        self.urlconf_name.urlpatterns
+
+    @property
+    def reverse_dict(self):
+        self.load()
+        return super().reverse_dict
+
+    @property
+    def namespace_dict(self):
+        self.load()
+        return super().namespace_dict
+
+    @property
+    def app_dict(self):
+        self.load()
+        return super().app_dict
@@ -11,6 +11,11 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from mysite import startup
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
 
+startup.begin()
 application = get_asgi_application()
+startup.warm_up()
+startup.finish("asgi")
@@ -0,0 +1,125 @@
+import hashlib
+import math
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+_HEADER = struct.Struct(">IB")
+
+
+class BloomFilter:
+    # 「含まれていない」は確実で，「含まれている」は error_rate の確率で誤る集合。要素は消せない
+    def __init__(self, num_bits, num_hashes, bits=None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray((num_bits + 7) // 8) if bits is None else bytearray(bits)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        # capacity 件入れたときに偽陽性率が error_rate になるビット数とハッシュの数
+        capacity = max(capacity, 1)
+        num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    @classmethod
+    def build(cls, keys, error_rate, min_capacity=0):
+        keys = list(keys)
+        bloom = cls.for_capacity(max(len(keys), min_capacity), error_rate)
+        for key in keys:
+            bloom.add(key)
+        return bloom
+
+    def _positions(self, key):
+        # 2つのハッシュの線形結合で k 個の位置を作る (Kirsch-Mitzenmacher)
+        digest = hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def to_bytes(self):
+        return _HEADER.pack(self.num_bits, self.num_hashes) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        num_bits, num_hashes = _HEADER.unpack_from(data)
+        return cls(num_bits, num_hashes, data[_HEADER.size :])
+
+
+class CachedBloomFilters:
+    # ユーザーごとの BloomFilter をキャッシュに置く。なければ load(user_id) が返すキーから作り直す。
+    # 追加はキャッシュ上のフィルタにビットを立てて反映するので，1件のいいね・フォローで全件を読み直すことはない。
+    # 別のプロセスの追加 (LocMemCache のとき) や同時に書き戻して消えた追加は，作ってから
+    # BLOOM_FILTER_TIMEOUT 秒後に作り直すまで見えないことがある (accounts.graph の FOLLOW_GRAPH_TTL と同じ考え方)
+    def __init__(self, name, load):
+        self.name = name
+        self.load = load
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return settings.BLOOM_FILTER_CACHE is not None
+
+    @property
+    def cache(self):
+        return caches[settings.BLOOM_FILTER_CACHE]
+
+    def _key(self, user_id):
+        # 名前空間の世代のキーが消えていたら時刻から新しく始める。clear() より前に作ったフィルタを読まないように
+        key = f"bloom:{self.name}"
+        namespace = self.cache.get(key)
+        if namespace is None:
+            self.cache.add(key, time.time_ns(), timeout=None)
+            namespace = self.cache.get(key)
+        return f"bloom:{self.name}:{namespace}:{user_id}"
+
+    def get(self, user_id):
+        # 使わない設定なら None を返す。キャッシュには (作り直す時刻, フィルタ) を置く
+        if not self.enabled:
+            return None
+        key = self._key(user_id)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return BloomFilter.from_bytes(entry[1])
+        bloom = BloomFilter.build(
+            self.load(user_id), settings.BLOOM_FILTER_ERROR_RATE, settings.BLOOM_FILTER_MIN_CAPACITY
+        )
+        timeout = settings.BLOOM_FILTER_TIMEOUT
+        self.cache.add(key, (time.time() + timeout, bloom.to_bytes()), timeout)
+        return bloom
+
+    def add(self, user_id, member):
+        # キャッシュにフィルタがあれば member のビットを立てる。作り直す時刻は延ばさない
+        if not self.enabled:
+            return
+        key = self._key(user_id)
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                # 次に読んだときに DB から作るので member も入る
+                return
+            expires_at, data = entry
+            timeout = expires_at - time.time()
+            if timeout <= 0:
+                return
+            bloom = BloomFilter.from_bytes(data)
+            bloom.add(member)
+            self.cache.set(key, (expires_at, bloom.to_bytes()), timeout)
+
+    def clear(self):
+        if not self.enabled:
+            return
+        try:
+            self.cache.incr(f"bloom:{self.name}")
+        except ValueError:
+            # 世代のキーがなければ，次に読んだときに新しい世代になる
+            pass
@@ -0,0 +1,70 @@
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.checks import Error, Tags, register
+from django.template import engines
+
+STATIC_TAG = re.compile(r"""{%\s*static\s+(["'])(?P<name>[^"']+)\1""")
+HARDCODED_URL = re.compile(r"""(?:src|href)\s*=\s*["'](?:{{\s*STATIC_URL\s*}}|/?static/)""")
+# プロセスごとに別の中身を持つキャッシュ
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def template_dirs():
+    for engine in engines.all():
+        loaders = list(engine.engine.template_loaders)
+        while loaders:
+            loader = loaders.pop()
+            loaders.extend(getattr(loader, "loaders", []))
+            if hasattr(loader, "get_dirs"):
+                yield from (Path(d) for d in loader.get_dirs())
+
+
+@register(Tags.staticfiles, Tags.templates)
+def check_templates_use_hashed_assets(app_configs=None, **kwargs):
+    # 静的ファイルは {% static %} 経由でのみ参照させる。直書きの URL は本番でハッシュ付きの名前にならない
+    errors = []
+    seen = set()
+    for directory in template_dirs():
+        for path in directory.rglob("*.html"):
+            if path in seen:
+                continue
+            seen.add(path)
+            source = path.read_text(encoding="utf-8")
+            if HARDCODED_URL.search(source):
+                errors.append(
+                    Error(
+                        f"{path} references a static file without the static tag.",
+                        hint="Use {% static %} so the hashed file name is used in production.",
+                        id="mysite.E001",
+                    )
+                )
+            for match in STATIC_TAG.finditer(source):
+                if not finders.find(match["name"]):
+                    errors.append(Error(f"{path} references missing static file '{match['name']}'.", id="mysite.E002"))
+    return errors
+
+
+def is_shared_cache(alias):
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_session_cache(app_configs=None, **kwargs):
+    # cached_db はキャッシュから読むので，プロセスごとのキャッシュだとログアウトしたセッションを他のプロセスが読み続ける
+    if settings.SESSION_ENGINE == "django.contrib.sessions.backends.cached_db" and not is_shared_cache(
+        settings.SESSION_CACHE_ALIAS
+    ):
+        return [
+            Error(
+                f"SESSION_MODE 'cached_db' needs a shared cache; '{settings.SESSION_CACHE_ALIAS}' is process-local.",
+                hint="Point SESSION_CACHE_ALIAS at a cache shared by every process (e.g. Redis) or use 'db'.",
+                id="mysite.E003",
+            )
+        ]
+    return []
@@ -0,0 +1,54 @@
+from django.db import connections, router
+from django.utils import timezone
+
+
+def _table_and_params(model, values, connection):
+    qn = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in values]
+    columns = [qn(field.column) for field in fields]
+    params = [field.get_db_prep_save(value, connection) for field, value in zip(fields, values.values())]
+    return qn(model._meta.db_table), columns, params
+
+
+def insert_ignore(model, using=None, **values):
+    # INSERT ... ON CONFLICT DO NOTHING を1文で実行し，行が増えたかを返す。
+    # QuerySet.add() のような事前の SELECT がなく，同時に実行されても IntegrityError にならない
+    for field in model._meta.concrete_fields:
+        if field.name in values:
+            continue
+        if getattr(field, "auto_now_add", False):
+            values[field.name] = timezone.now()
+        elif field.has_default():
+            values[field.name] = field.get_default()
+    connection = connections[using or router.db_for_write(model)]
+    table, columns, params = _table_and_params(model, values, connection)
+    placeholders = ", ".join(["%s"] * len(params))
+    if connection.vendor == "mysql":
+        sql = f"INSERT IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    else:
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) ON CONFLICT DO NOTHING"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount > 0
+
+
+def delete_where(model, using=None, **values):
+    # シグナルや関連の収集をせずに DELETE を1文で実行し，行が消えたかを返す
+    connection = connections[using or router.db_for_write(model)]
+    table, columns, params = _table_and_params(model, values, connection)
+    where = " AND ".join(f"{column} = %s" for column in columns)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {where}", params)
+        return cursor.rowcount > 0
+
+
+def delete_in(model, pks, using=None):
+    # Collector を通さずに主キーで DELETE する。別の DB にコピー済みの行を消すときに，
+    # こちらの DB に残っている参照先 (通知など) を CASCADE で巻き込まないために使う
+    connection = connections[using or router.db_for_write(model)]
+    qn = connection.ops.quote_name
+    table, column = qn(model._meta.db_table), qn(model._meta.pk.column)
+    placeholders = ", ".join(["%s"] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", pks)
+        return cursor.rowcount
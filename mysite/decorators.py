@@ -0,0 +1,39 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+def public_page(etag_func, timeout=None):
+    # 閲覧者によらないページを ETag で検証し，ETag ごとにキャッシュする。
+    # cache_page は URL だけをキーにするため更新後も古い本文を返してしまうので使わない。
+    def cached_etag(request, *args, **kwargs):
+        if not hasattr(request, "_public_page_etag"):
+            request._public_page_etag = etag_func(request, *args, **kwargs)
+        return request._public_page_etag
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            etag = cached_etag(request, *args, **kwargs)
+            if etag is None:
+                return view_func(request, *args, **kwargs)
+            max_age = settings.PUBLIC_PAGE_CACHE_TIMEOUT if timeout is None else timeout
+            url = hashlib.md5(request.get_full_path().encode(), usedforsecurity=False).hexdigest()
+            key = f"public_page:{url}:{etag}"
+            response = cache.get(key)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if callable(getattr(response, "render", None)):
+                    response = response.render()
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(key, response, max_age)
+            patch_cache_control(response, public=True, max_age=max_age)
+            return response
+
+        return condition(etag_func=cached_etag)(wrapper)
+
+    return decorator
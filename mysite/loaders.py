@@ -0,0 +1,22 @@
+import re
+
+from django.template.loaders import filesystem
+
+PRESERVE_WHITESPACE = re.compile(r"<(pre|textarea)\b", re.IGNORECASE)
+LINE_BREAK = re.compile(r"\s*\n\s*")
+TAG_LINE = re.compile(r"^({%[^%]*%})\n", re.MULTILINE)
+
+
+def minify(source):
+    # 改行をまたぐ空白（インデントや空行）を改行1つにまとめ，タグだけの行はその後の改行も出力しないようにする。
+    # 直前の改行は残るので HTML の表示は変わらない
+    return TAG_LINE.sub(r"\1", LINE_BREAK.sub("\n", source))
+
+
+class Loader(filesystem.Loader):
+    # cached.Loader の下で使い，テンプレートのコンパイル前に一度だけ空白を詰める
+    def get_contents(self, origin):
+        contents = super().get_contents(origin)
+        if PRESERVE_WHITESPACE.search(contents):
+            return contents
+        return minify(contents)
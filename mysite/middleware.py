@@ -0,0 +1,89 @@
+import math
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import BigIntegerField, F, Value
+from django.db.models.functions import Greatest
+from django.http import HttpResponse
+from django.middleware.gzip import GZipMiddleware
+
+from mysite.db import insert_ignore
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    limit, period = rate.split("/")
+    return int(limit), PERIODS[period]
+
+
+class RateLimitMiddleware:
+    # 書き込み系の URL 名ごとにユーザー単位・IP 単位で GCRA (トークンバケットと同じ結果になる) の制限をかける。
+    # 理論上の到着時刻 (TAT, マイクロ秒) を tweets.RateLimitBucket に置き，条件付きの UPDATE 1文で進めるので，
+    # プロセスがいくつあっても同時に来たリクエストが払いすぎることはない
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.buckets = apps.get_model("tweets", "RateLimitBucket")
+        self.rates = {
+            view_name: {scope: parse_rate(rate) for scope, rate in rates.items()}
+            for view_name, rates in settings.RATELIMITS.items()
+        }
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def _take(self, key, interval, burst, now):
+        # 1回分を払えたら None を，払えなければ次に払えるまでの秒数を返す
+        buckets = self.buckets.objects.filter(key=key)
+        # max(tat, now) + interval <= now + burst のときだけ進める
+        payable = buckets.filter(tat__lte=now + burst - interval)
+        advanced = Greatest(F("tat"), Value(now, output_field=BigIntegerField())) + interval
+        if payable.update(tat=advanced):
+            return None
+        # 行がなければ満タンのバケットから払う。同時に作られていたらもう一度 UPDATE する
+        if insert_ignore(self.buckets, key=key, tat=now + interval) or payable.update(tat=advanced):
+            return None
+        tat = buckets.values_list("tat", flat=True).first()
+        return math.ceil((tat + interval - burst - now) / 1_000_000)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in SAFE_METHODS:
+            return None
+        rates = self.rates.get(request.resolver_match.view_name)
+        if not rates:
+            return None
+        now = time.time_ns() // 1000
+        taken = []
+        for scope, (limit, period) in rates.items():
+            if scope == "user":
+                if not request.user.is_authenticated:
+                    continue
+                ident = request.user.pk
+            else:
+                ident = request.META.get("REMOTE_ADDR", "")
+            key = f"{request.resolver_match.view_name}:{scope}:{ident}"
+            interval = period * 1_000_000 // limit
+            retry_after = self._take(key, interval, period * 1_000_000, now)
+            if retry_after is not None:
+                # 先に払った他の単位の分は返す
+                for taken_key, taken_interval in taken:
+                    self.buckets.objects.filter(key=taken_key).update(tat=F("tat") - taken_interval)
+                response = HttpResponse("Too Many Requests", status=429)
+                response["Retry-After"] = retry_after
+                return response
+            taken.append((key, interval))
+        return None
+
+
+class CompressionMiddleware(GZipMiddleware):
+    # 小さすぎるレスポンスや圧縮済みの形式（gzip のエクスポートや画像）は圧縮しない。
+    # StreamingHttpResponse は GZipMiddleware がチャンクごとに圧縮する。
+    def process_response(self, request, response):
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        if not content_type.startswith(settings.GZIP_CONTENT_TYPES):
+            return response
+        if not response.streaming and len(response.content) < settings.GZIP_MIN_LENGTH:
+            return response
+        return super().process_response(request, response)
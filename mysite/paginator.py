@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_count(model, using="default"):
+    # DB の統計情報にある行数。統計がなければ None
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        elif connection.vendor == "sqlite":
+            # ANALYZE のあとにしか sqlite_stat1 はない
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+def capped_count(queryset, limit=None):
+    # limit + 1 件まで数えたところで止める。limit を超えたら limit + 1 を返す
+    limit = settings.ADMIN_COUNT_LIMIT if limit is None else limit
+    return queryset.order_by()[: limit + 1].count()
+
+
+class EstimatedCountPaginator(Paginator):
+    # admin の一覧用。大きな表を COUNT(*) で全件数えないように，絞り込みがなければ統計情報の行数を，
+    # 絞り込みがあれば ADMIN_COUNT_LIMIT 件までを数えた値をページ数の計算に使う
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > settings.ADMIN_COUNT_LIMIT:
+                return estimate
+        return capped_count(queryset)
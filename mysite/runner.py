@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    # テストではユーザーを作るたびに scrypt を計算しないよう，速いハッシャーで保存する。
+    # ハッシャー自体を確かめるテストは PASSWORD_HASHERS を上書きする
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._hashers = override_settings(
+            PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher", *settings.PASSWORD_HASHERS]
+        )
+        self._hashers.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._hashers.disable()
+        super().teardown_test_environment(**kwargs)
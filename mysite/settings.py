@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from accounts.hashers import password_hashers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -31,7 +34,7 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
-    "django.contrib.admin",
+    "mysite.apps.LazyAdminConfig",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -40,31 +43,51 @@ INSTALLED_APPS = [
     "accounts.apps.AccountsConfig",
     "tweets.apps.TweetsConfig",
     "welcome.apps.WelcomeConfig",
+    "jobs.apps.JobsConfig",
+    "notifications.apps.NotificationsConfig",
+    "analytics.apps.AnalyticsConfig",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "mysite.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "mysite.middleware.RateLimitMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# これより短いレスポンスは圧縮してもヘッダーの分だけ得にならない
+GZIP_MIN_LENGTH = 860
+GZIP_CONTENT_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
 ROOT_URLCONF = "mysite.urls"
 
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
-        "APP_DIRS": True,
         "OPTIONS": {
+            # テンプレートはプロセスごとに一度だけコンパイルしてキャッシュする
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "mysite.loaders.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "notifications.context_processors.unread_notification_count",
+                "tweets.context_processors.url_prefixes",
             ],
         },
     },
@@ -103,6 +126,18 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# 新しいパスワードは PASSWORD_HASHER のハッシャーで保存する。
+# 他の形式のハッシュも検証でき，ログイン時に PASSWORD_HASHER の形式・パラメータで作り直される
+PASSWORD_HASHER = "scrypt"
+PASSWORD_SCRYPT = {"work_factor": 2**15, "block_size": 8, "parallelism": 1}
+# "argon2" を使うには argon2-cffi が必要
+PASSWORD_ARGON2 = {"time_cost": 2, "memory_cost": 19456, "parallelism": 1}
+PASSWORD_HASHERS = password_hashers(PASSWORD_HASHER)
+
+# manage.py test は mysite.runner.TestRunner で速いハッシャーに差し替える
+TEST_RUNNER = "mysite.runner.TestRunner"
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.0/topics/i18n/
 
@@ -120,6 +155,11 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
+STATIC_ROOT = BASE_DIR / "staticfiles"
+# 本番では collectstatic でハッシュ付きの名前と gzip/brotli 版を作り，wsgi.py の StaticFilesMiddleware で配信する
+if not DEBUG:
+    STATICFILES_STORAGE = "mysite.storage.CompressedManifestStaticFilesStorage"
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
@@ -129,11 +169,98 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "accounts.User"
 
+DATABASE_ROUTERS = ["tweets.sharding.TweetShardRouter"]
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "sessions",
+        "OPTIONS": {"MAX_ENTRIES": 100_000},
+    },
+    "bloom": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "bloom",
+        "OPTIONS": {"MAX_ENTRIES": 10_000},
+    },
+}
+
+# セッションの保存先。"db" は毎リクエスト django_session を読む。
+# "cached_db" は SESSION_CACHE_ALIAS のキャッシュから読み（書き込みは DB にも行う），
+# "signed_cookies" はサーバーに保存しない（ログアウトしても以前の Cookie は期限まで有効なので注意）
+# "cached_db" は SESSION_CACHE_ALIAS を共有キャッシュ (Redis など) にしないとログアウトが他のプロセスに伝わらないので，
+# LocMemCache のままだとシステムチェック (mysite.E003) で起動を止める
+SESSION_MODE = "db"
+SESSION_ENGINE = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}[SESSION_MODE]
+SESSION_CACHE_ALIAS = "sessions"
+
 LOGIN_URL = "accounts:login"
 LOGOUT_URL = "accounts:logout"
 LOGIN_REDIRECT_URL = "tweets:home"
 LOGOUT_REDIRECT_URL = "accounts:login"
 
+# フォロー関係のプロセス内インデックス (accounts.graph)
+FOLLOW_GRAPH_MAX_EDGES = 1_000_000
+FOLLOW_GRAPH_TTL = 60
+
+# いいね・フォローの有無を先に判定する BloomFilter (mysite.bloom)。置き場所のキャッシュ，偽陽性率，最低限確保する件数，
+# 作り直すまでの秒数。LocMemCache だと他のプロセスでの追加は作り直すまで見えないので，その間は「いいえ」と答えることがある。
+# None ならフィルタを使わずに DB を読む
+BLOOM_FILTER_CACHE = "bloom"
+BLOOM_FILTER_ERROR_RATE = 0.01
+BLOOM_FILTER_MIN_CAPACITY = 64
+BLOOM_FILTER_TIMEOUT = 60
+
+# バックグラウンドジョブ (jobs)。True ならキューに積まずその場で実行する
+JOBS_EAGER = False
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BACKOFF = 2
+JOBS_RETRY_BACKOFF_MAX = 3600
+JOBS_LEASE = 300
+
+# admin の一覧・件数表示で数える行数の上限。これより多い表は統計情報の推定値を使う
+ADMIN_COUNT_LIMIT = 10000
+
+# ツイート詳細・プロフィールはログイン状態によらず共有キャッシュする (秒)
+PUBLIC_PAGE_CACHE_TIMEOUT = 60
+
+# プロフィールのツイート一覧の1ページの件数
+PROFILE_PAGE_SIZE = 20
+
+# ツイート ID (mysite.snowflake) のワーカー ID (0〜1023)。環境変数で決めるときは同時に動くプロセスごとに別の値にする。
+# None なら tweets.SnowflakeLease から空いている ID を借りる。決めた ID を別のプロセスが借りていたら起動時に失敗する
+SNOWFLAKE_WORKER_ID = int(os.environ["SNOWFLAKE_WORKER_ID"]) if "SNOWFLAKE_WORKER_ID" in os.environ else None
+
+# ワーカー ID を借りる期間 (秒)。半分が過ぎたら延長する
+SNOWFLAKE_LEASE = 600
+
+# ツイートといいねを置く DB の別名 (tweets.sharding)。空なら default だけを使う。
+# 変えたら reshard_tweets で既存の行を移す
+TWEET_SHARDS = []
+
+# 同じユーザーがこの秒数以内に同じ本文を投稿したら拒否する (tweets.services.is_duplicate)
+TWEET_DUPLICATE_WINDOW = 24 * 60 * 60
+
+# 集計 (analytics.rollups) はこの秒数より前に作られた行までを対象にする。書き込み中のトランザクションの行を飛ばさないため
+ANALYTICS_ROLLUP_LAG = 60
+
+# この日数より古いツイートは archive_tweets で ArchivedTweet に移す
+TWEET_ARCHIVE_AFTER_DAYS = 365
+
+# 書き込み系エンドポイントのレート制限 (mysite.middleware.RateLimitMiddleware)。バケットは DB (tweets.RateLimitBucket) に置く。
+# 満タンに戻ったバケットの行は purge_ratelimits で消す
+RATELIMITS = {
+    "tweets:create": {"user": "10/m", "ip": "30/m"},
+    "tweets:like": {"user": "60/m", "ip": "300/m"},
+    "tweets:unlike": {"user": "60/m", "ip": "300/m"},
+    "accounts:follow": {"user": "30/m", "ip": "150/m"},
+    "accounts:unfollow": {"user": "30/m", "ip": "150/m"},
+}
+
 
 SQL_DEBUG = False
 
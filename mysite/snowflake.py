@@ -0,0 +1,139 @@
+import os
+import secrets
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone as django_timezone
+
+# 64bit の ID。上から 2020-01-01 (UTC) からのミリ秒 41bit，ワーカー ID 10bit，同じミリ秒内の連番 12bit。
+# 符号ビットは使わないので 2089 年まで正の整数のまま時刻順に並ぶ
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+EPOCH_MS = int(EPOCH.timestamp() * 1000)
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+TIMESTAMP_SHIFT = WORKER_BITS + SEQUENCE_BITS
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+def _now_ms():
+    return time.time_ns() // 1_000_000
+
+
+class Snowflake:
+    def __init__(self, worker_id):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}")
+        self.worker_id = worker_id
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            now = _now_ms()
+            # 時計が戻ったら追いつくまで待つ。戻った時刻で払い出すと過去の ID と衝突しうる
+            while now < self._last_ms:
+                time.sleep((self._last_ms - now) / 1000)
+                now = _now_ms()
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # このミリ秒の連番を使い切った
+                    while now <= self._last_ms:
+                        now = _now_ms()
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return ((now - EPOCH_MS) << TIMESTAMP_SHIFT) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+
+def id_to_datetime(snowflake_id):
+    return EPOCH + timedelta(milliseconds=snowflake_id >> TIMESTAMP_SHIFT)
+
+
+def datetime_to_id(moment, low=0):
+    # moment の時刻の ID。下位 22bit (ワーカー ID と連番の位置) は low で決める
+    return ((moment - EPOCH) // timedelta(milliseconds=1)) << TIMESTAMP_SHIFT | (low & ((1 << TIMESTAMP_SHIFT) - 1))
+
+
+def _claim(worker_id, owner, now, until):
+    # 期限切れか自分の行なら延長し，まだ行がなければ作る
+    SnowflakeLease = apps.get_model("tweets", "SnowflakeLease")
+    claimed = SnowflakeLease.objects.filter(Q(expires_at__lt=now) | Q(owner=owner), worker_id=worker_id)
+    if claimed.update(owner=owner, expires_at=until):
+        return True
+    try:
+        with transaction.atomic():
+            SnowflakeLease.objects.create(worker_id=worker_id, owner=owner, expires_at=until)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _period():
+    now = django_timezone.now()
+    return now, now + timedelta(seconds=settings.SNOWFLAKE_LEASE)
+
+
+def lease_worker_id(owner, worker_id=None):
+    # owner にワーカー ID を SNOWFLAKE_LEASE 秒貸す。worker_id を指定したときはその ID だけを試す
+    now, until = _period()
+    if worker_id is not None:
+        if not _claim(worker_id, owner, now, until):
+            raise ImproperlyConfigured(f"SNOWFLAKE_WORKER_ID {worker_id} is already used by another process")
+        return worker_id
+    leases = dict(apps.get_model("tweets", "SnowflakeLease").objects.values_list("worker_id", "expires_at"))
+    free = [candidate for candidate in range(MAX_WORKER_ID + 1) if candidate not in leases]
+    expired = [candidate for candidate, expires_at in leases.items() if expires_at < now]
+    for candidate in free + expired:
+        if _claim(candidate, owner, now, until):
+            return candidate
+    raise RuntimeError("no snowflake worker id is free")
+
+
+_lock = threading.Lock()
+_generator = None
+_owner = None
+_renew_at = 0.0
+
+
+def _lease():
+    # 期限の半分で延長する。期限切れで別のプロセスに取られていたら，空いている ID を借り直す
+    global _generator, _owner, _renew_at
+    if _owner is None:
+        _owner = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+    if settings.SNOWFLAKE_WORKER_ID is not None:
+        worker_id = lease_worker_id(_owner, settings.SNOWFLAKE_WORKER_ID)
+    elif _generator is not None and _claim(_generator.worker_id, _owner, *_period()):
+        worker_id = _generator.worker_id
+    else:
+        worker_id = lease_worker_id(_owner)
+    if _generator is None or _generator.worker_id != worker_id:
+        _generator = Snowflake(worker_id)
+    _renew_at = time.monotonic() + settings.SNOWFLAKE_LEASE / 2
+
+
+def next_id():
+    with _lock:
+        if _generator is None or time.monotonic() >= _renew_at:
+            _lease()
+        return _generator.next_id()
+
+
+def _reset():
+    global _generator, _owner
+    _generator = None
+    _owner = None
+
+
+# fork した子プロセスは親のワーカー ID を使わず，自分で借り直す。
+# SNOWFLAKE_WORKER_ID を決めてあるときは親が借りているので ImproperlyConfigured になる
+os.register_at_fork(after_in_child=_reset)
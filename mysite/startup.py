@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+
+from django.apps.config import AppConfig
+from django.urls import URLResolver, get_resolver
+
+from mysite.apps import LazyAdminResolver
+
+PROFILE = bool(os.environ.get("DJANGO_PROFILE_STARTUP"))
+
+_started = None
+_ready_times = {}
+
+
+def begin():
+    # DJANGO_PROFILE_STARTUP を設定すると AppConfig.ready ごとの所要時間と起動全体の時間を標準エラーに出す。
+    # モジュールごとの import 時間は python -X importtime で取る (benchmarks/startup.py)
+    global _started
+    if not PROFILE:
+        return
+    _started = time.perf_counter()
+    create = AppConfig.create.__func__
+
+    def timed_create(cls, entry):
+        app_config = create(cls, entry)
+        ready = app_config.ready
+
+        def timed_ready():
+            start = time.perf_counter()
+            ready()
+            _ready_times[app_config.label] = time.perf_counter() - start
+
+        app_config.ready = timed_ready
+        return app_config
+
+    AppConfig.create = classmethod(timed_create)
+
+
+def warm_up(resolver=None):
+    # 最初のリクエストで URLconf の import と正規表現のコンパイルをしないよう，起動時に済ませておく
+    resolver = get_resolver() if resolver is None else resolver
+    resolver.reverse_dict
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver) and not isinstance(pattern, LazyAdminResolver):
+            warm_up(pattern)
+
+
+def finish(label):
+    if not PROFILE:
+        return
+    total = time.perf_counter() - _started
+    for app_label, seconds in sorted(_ready_times.items(), key=lambda item: -item[1]):
+        print(f"startup: ready {app_label} {seconds * 1000:.2f} ms", file=sys.stderr)
+    print(f"startup: {label} {total * 1000:.2f} ms", file=sys.stderr)
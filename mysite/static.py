@@ -0,0 +1,70 @@
+import json
+import mimetypes
+from email.utils import formatdate
+from pathlib import Path
+
+from django.conf import settings
+
+
+class StaticFilesMiddleware:
+    # collectstatic 済みのファイルを Django を通さずに返す WSGI ミドルウェア。
+    # ハッシュ付きの名前は内容が変わらないので immutable で長期間キャッシュさせ，それ以外は毎回検証させる。
+    encodings = (("br", ".br"), ("gzip", ".gz"))
+
+    def __init__(self, application, root=None, prefix=None, max_age=None):
+        self.application = application
+        self.root = Path(settings.STATIC_ROOT if root is None else root).resolve()
+        self.prefix = settings.STATIC_URL if prefix is None else prefix
+        self.max_age = settings.STATIC_MAX_AGE if max_age is None else max_age
+        self.hashed_names = self.load_hashed_names()
+
+    def load_hashed_names(self):
+        try:
+            with open(self.root / "staticfiles.json", encoding="utf-8") as f:
+                return set(json.load(f)["paths"].values())
+        except (OSError, ValueError, KeyError):
+            return set()
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if environ["REQUEST_METHOD"] not in ("GET", "HEAD") or not path.startswith(self.prefix):
+            return self.application(environ, start_response)
+        name = path[len(self.prefix) :]
+        file_path = (self.root / name).resolve()
+        if not file_path.is_relative_to(self.root) or not file_path.is_file():
+            return self.application(environ, start_response)
+        return self.serve(environ, start_response, name, file_path)
+
+    def serve(self, environ, start_response, name, file_path):
+        content_type, _ = mimetypes.guess_type(name)
+        headers = [("Content-Type", content_type or "application/octet-stream"), ("Vary", "Accept-Encoding")]
+        accepted = {e.split(";")[0].strip() for e in environ.get("HTTP_ACCEPT_ENCODING", "").split(",")}
+        for encoding, suffix in self.encodings:
+            compressed = file_path.with_name(file_path.name + suffix)
+            if encoding in accepted and compressed.is_file():
+                file_path = compressed
+                headers.append(("Content-Encoding", encoding))
+                break
+        if name in self.hashed_names:
+            headers.append(("Cache-Control", f"public, max-age={self.max_age}, immutable"))
+        else:
+            headers.append(("Cache-Control", "no-cache"))
+        stat = file_path.stat()
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        headers += [("ETag", etag), ("Last-Modified", formatdate(stat.st_mtime, usegmt=True))]
+        if environ.get("HTTP_IF_NONE_MATCH") == etag:
+            start_response("304 Not Modified", headers)
+            return []
+        start_response("200 OK", headers + [("Content-Length", str(stat.st_size))])
+        if environ["REQUEST_METHOD"] == "HEAD":
+            return []
+        f = open(file_path, "rb")
+        file_wrapper = environ.get("wsgi.file_wrapper")
+        if file_wrapper is not None:
+            return file_wrapper(f)
+        return read_chunks(f)
+
+
+def read_chunks(f, chunk_size=64 * 1024):
+    with f:
+        yield from iter(lambda: f.read(chunk_size), b"")
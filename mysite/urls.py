@@ -14,13 +14,16 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.conf import settings
-from django.contrib import admin
 from django.urls import include, path
 
+from mysite.apps import LazyAdminResolver
+
 urlpatterns = [
-    path("admin/", admin.site.urls),
+    LazyAdminResolver("admin/"),
     path("accounts/", include("accounts.urls")),
     path("tweets/", include("tweets.urls")),
+    path("notifications/", include("notifications.urls")),
+    path("analytics/", include("analytics.urls")),
     path("", include("welcome.urls")),
 ]
 
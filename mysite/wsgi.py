@@ -11,6 +11,12 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from mysite import startup
+from mysite.static import StaticFilesMiddleware
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
 
-application = get_wsgi_application()
+startup.begin()
+application = StaticFilesMiddleware(get_wsgi_application())
+startup.warm_up()
+startup.finish("wsgi")
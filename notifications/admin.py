@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from .models import Notification, NotificationCounter
+
+
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ("recipient", "verb", "last_actor", "actor_count", "is_read", "updated_at")
+    list_filter = ("verb", "is_read")
+    raw_id_fields = ("recipient", "tweet", "last_actor")
+
+
+class NotificationCounterAdmin(admin.ModelAdmin):
+    list_display = ("user", "unread_count")
+    raw_id_fields = ("user",)
+
+
+admin.site.register(Notification, NotificationAdmin)
+admin.site.register(NotificationCounter, NotificationCounterAdmin)
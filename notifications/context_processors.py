@@ -0,0 +1,9 @@
+from .services import unread_count
+
+
+def unread_notification_count(request):
+    # テンプレートで使われたときだけ request.user とカウンタを読む
+    def count():
+        return unread_count(request.user.pk) if request.user.is_authenticated else 0
+
+    return {"unread_notification_count": count}
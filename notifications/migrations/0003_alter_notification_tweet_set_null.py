@@ -0,0 +1,27 @@
+# Generated by Django 4.1.13 on 2026-10-19 17:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0012_snowflakelease"),
+        ("notifications", "0002_alter_notification_tweet"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="tweet",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="tweets.tweet",
+            ),
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Notification(models.Model):
+    # 未読の間は同じ group_key の通知を1行にまとめ，actor_count を増やしていく
+    class Verb(models.TextChoices):
+        LIKE = "like"
+        FOLLOW = "follow"
+
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="notifications")
+    verb = models.CharField(max_length=16, choices=Verb.choices)
+    group_key = models.CharField(max_length=64)
+    # ツイートは別の DB (tweets.sharding) にあることがある。ツイートを消しても未読の数がずれないように通知は残す
+    tweet = models.ForeignKey(
+        "tweets.Tweet", on_delete=models.SET_NULL, null=True, blank=True, related_name="+", db_constraint=False
+    )
+    last_actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    actor_count = models.PositiveIntegerField(default=1)
+    is_read = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipient", "group_key"], condition=Q(is_read=False), name="unique_unread_notification"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["recipient", "-updated_at", "-id"], name="notification_feed"),
+        ]
+
+    @property
+    def other_count(self):
+        return self.actor_count - 1
+
+
+class NotificationActor(models.Model):
+    # 通知にまとめたユーザー。actor_count は初めての組み合わせのときだけ増やすので，いいねを取り消してやり直しても増えない
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name="actors")
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["notification", "actor"], name="unique_notification_actor"),
+        ]
+
+
+class NotificationCounter(models.Model):
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="notification_counter"
+    )
+    unread_count = models.PositiveIntegerField(default=0)
@@ -0,0 +1,53 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from mysite.db import insert_ignore
+
+from .models import Notification, NotificationActor, NotificationCounter
+
+
+def notify(recipient_id, verb, actor_id, tweet_id=None):
+    if recipient_id == actor_id:
+        return
+    group_key = f"{verb}:{tweet_id}" if tweet_id else verb
+    unread = Notification.objects.filter(recipient_id=recipient_id, group_key=group_key, is_read=False)
+    with transaction.atomic():
+        notification_id = unread.values_list("pk", flat=True).first()
+        if notification_id is None:
+            try:
+                with transaction.atomic():
+                    notification = Notification.objects.create(
+                        recipient_id=recipient_id,
+                        verb=verb,
+                        group_key=group_key,
+                        tweet_id=tweet_id,
+                        last_actor_id=actor_id,
+                    )
+            except IntegrityError:
+                # 同時に作られた未読行があればそちらにまとめる
+                notification_id = unread.values_list("pk", flat=True).first()
+            else:
+                NotificationActor.objects.create(notification=notification, actor_id=actor_id)
+                counter = NotificationCounter.objects.filter(user_id=recipient_id)
+                if not counter.update(unread_count=F("unread_count") + 1):
+                    NotificationCounter.objects.get_or_create(user_id=recipient_id)
+                    counter.update(unread_count=F("unread_count") + 1)
+                return
+        # 同じユーザーの2回目以降 (いいねの取り消しとやり直し，ジョブの再実行) は数えない
+        if notification_id is not None and insert_ignore(
+            NotificationActor, notification_id=notification_id, actor_id=actor_id
+        ):
+            Notification.objects.filter(pk=notification_id).update(
+                actor_count=F("actor_count") + 1, last_actor_id=actor_id, updated_at=timezone.now()
+            )
+
+
+def mark_all_read(user_id):
+    with transaction.atomic():
+        Notification.objects.filter(recipient_id=user_id, is_read=False).update(is_read=True)
+        NotificationCounter.objects.filter(user_id=user_id).update(unread_count=0)
+
+
+def unread_count(user_id):
+    return NotificationCounter.objects.filter(user_id=user_id).values_list("unread_count", flat=True).first() or 0
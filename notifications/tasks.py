@@ -0,0 +1,9 @@
+from jobs.queue import task
+
+from .models import Notification
+from .services import notify
+
+
+@task
+def notify_follow(target_id, actor_id):
+    notify(target_id, Notification.Verb.FOLLOW, actor_id)
@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from tweets.models import Tweet
+
+from .models import Notification, NotificationCounter
+from .services import notify, unread_count
+
+User = get_user_model()
+
+
+@override_settings(JOBS_EAGER=True)
+class TestNotify(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.actors = [
+            User.objects.create_user(username=f"actor{i}", email="test@test.com", password="testpassword")
+            for i in range(3)
+        ]
+        self.tweet = Tweet.objects.create(user=self.user, content="testcontent")
+
+    def test_likes_are_coalesced(self):
+        for actor in self.actors:
+            self.client.force_login(actor)
+            self.client.post(reverse("tweets:like", args=[self.tweet.pk]))
+
+        notification = Notification.objects.get(recipient=self.user)
+        self.assertEqual(notification.actor_count, 3)
+        self.assertEqual(notification.other_count, 2)
+        self.assertEqual(notification.last_actor, self.actors[-1])
+        self.assertEqual(unread_count(self.user.pk), 1)
+
+    def test_relike_does_not_count_twice(self):
+        self.client.force_login(self.actors[0])
+        self.client.post(reverse("tweets:like", args=[self.tweet.pk]))
+        self.client.post(reverse("tweets:like", args=[self.tweet.pk]))
+
+        self.assertEqual(Notification.objects.get(recipient=self.user).actor_count, 1)
+
+    def test_like_unlike_like_counts_actor_once(self):
+        self.client.force_login(self.actors[0])
+        for _ in range(3):
+            self.client.post(reverse("tweets:like", args=[self.tweet.pk]))
+            self.client.post(reverse("tweets:unlike", args=[self.tweet.pk]))
+        self.client.post(reverse("tweets:like", args=[self.tweet.pk]))
+        self.client.force_login(self.actors[1])
+        self.client.post(reverse("tweets:like", args=[self.tweet.pk]))
+
+        notification = Notification.objects.get(recipient=self.user)
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(notification.last_actor, self.actors[1])
+        self.assertEqual(unread_count(self.user.pk), 1)
+
+    def test_refollow_counts_actor_once(self):
+        self.client.force_login(self.actors[0])
+        self.client.post(reverse("accounts:follow", args=[self.user.username]))
+        self.client.post(reverse("accounts:unfollow", args=[self.user.username]))
+        self.client.post(reverse("accounts:follow", args=[self.user.username]))
+
+        self.assertEqual(Notification.objects.get(recipient=self.user).actor_count, 1)
+
+    def test_follow_notification(self):
+        self.client.force_login(self.actors[0])
+        self.client.post(reverse("accounts:follow", args=[self.user.username]))
+
+        notification = Notification.objects.get(recipient=self.user)
+        self.assertEqual(notification.verb, Notification.Verb.FOLLOW)
+        self.assertEqual(notification.last_actor, self.actors[0])
+
+    def test_own_actions_are_not_notified(self):
+        notify(self.user.pk, Notification.Verb.LIKE, self.user.pk, tweet_id=self.tweet.pk)
+
+        self.assertFalse(Notification.objects.exists())
+
+    def test_new_row_after_read(self):
+        notify(self.user.pk, Notification.Verb.LIKE, self.actors[0].pk, tweet_id=self.tweet.pk)
+        self.client.force_login(self.user)
+        self.client.post(reverse("notifications:read"))
+        self.assertEqual(unread_count(self.user.pk), 0)
+
+        notify(self.user.pk, Notification.Verb.LIKE, self.actors[1].pk, tweet_id=self.tweet.pk)
+        self.assertEqual(Notification.objects.filter(recipient=self.user).count(), 2)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread_count, 1)
+
+    def test_tweet_delete_keeps_notification(self):
+        notify(self.user.pk, Notification.Verb.LIKE, self.actors[0].pk, tweet_id=self.tweet.pk)
+        self.client.force_login(self.user)
+        self.client.post(reverse("tweets:delete", args=[self.tweet.pk]))
+
+        self.assertIsNone(Notification.objects.get(recipient=self.user).tweet_id)
+        self.assertEqual(unread_count(self.user.pk), 1)
+        self.assertContains(self.client.get(reverse("notifications:list")), "削除されたツイート")
+
+
+class TestNotificationListView(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.actor = User.objects.create_user(username="actor", email="test@test.com", password="testpassword")
+        self.client.force_login(self.user)
+        for i in range(25):
+            tweet = Tweet.objects.create(user=self.user, content="testcontent")
+            notify(self.user.pk, Notification.Verb.LIKE, self.actor.pk, tweet_id=tweet.pk)
+        self.url = reverse("notifications:list")
+
+    def test_success_get_with_keyset_pagination(self):
+        response = self.client.get(self.url)
+        first_page = response.context["notification_list"]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(first_page), 20)
+
+        response = self.client.get(self.url, {"before": response.context["next_cursor"]})
+        second_page = response.context["notification_list"]
+        self.assertEqual(len(second_page), 5)
+        self.assertNotIn("next_cursor", response.context)
+        self.assertFalse({n.pk for n in first_page} & {n.pk for n in second_page})
+
+    def test_failure_get_with_invalid_cursor(self):
+        response = self.client.get(self.url, {"before": "invalid"})
+        self.assertEqual(response.status_code, 400)
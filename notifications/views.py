@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Q
+from django.http import HttpResponseBadRequest
+from django.urls import reverse_lazy
+from django.views.generic import ListView, RedirectView
+
+from .models import Notification
+from .services import mark_all_read
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_cursor(notification):
+    return f"{(notification.updated_at - EPOCH) // MICROSECOND}_{notification.pk}"
+
+
+def decode_cursor(cursor):
+    microseconds, pk = cursor.split("_")
+    return EPOCH + int(microseconds) * MICROSECOND, int(pk)
+
+
+class NotificationListView(LoginRequiredMixin, ListView):
+    template_name = "notifications/list.html"
+    model = Notification
+    page_size = 20
+
+    def get(self, request, *args, **kwargs):
+        try:
+            self.cursor = decode_cursor(request.GET["before"]) if "before" in request.GET else None
+        except ValueError:
+            return HttpResponseBadRequest()
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        # テンプレートは tweet_id しか使わないので，別のシャードにあるツイートは JOIN しない
+        queryset = self.model.objects.filter(recipient=self.request.user).select_related("last_actor")
+        if self.cursor is not None:
+            updated_at, pk = self.cursor
+            queryset = queryset.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, pk__lt=pk))
+        # 次のページがあるか判定するため1件多く取る
+        return list(queryset.order_by("-updated_at", "-pk")[: self.page_size + 1])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        notifications = context["object_list"]
+        context["notification_list"] = notifications[: self.page_size]
+        if len(notifications) > self.page_size:
+            context["next_cursor"] = encode_cursor(notifications[self.page_size - 1])
+        return context
+
+
+class NotificationReadView(LoginRequiredMixin, RedirectView):
+    url = reverse_lazy("notifications:list")
+
+    def post(self, request, *args, **kwargs):
+        mark_all_read(request.user.pk)
+        return super().post(request, *args, **kwargs)
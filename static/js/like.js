@@ -12,29 +12,84 @@ function getCookie(name) {
     }
     return cookieValue;
 }
-const csrftoken = getCookie('csrftoken');
+
+
+function setLiked(button, isLiked) {
+    button.dataset.isLiked = String(isLiked)
+    button.innerHTML = isLiked ? '❤︎' : '♡'
+}
 
 
 async function changeLike(event) {
     const pk = event.target.dataset.pk
     const process = event.target.dataset.isLiked == 'false' ? 'like' : 'unlike'
-    const url = `/tweets/${pk}/${process}/`
+    // 作者の ID を付けるとサーバーはシャードを探さずに済む
+    const url = `/tweets/${pk}/${process}/?author=${event.target.dataset.author}`
     const data = {
         method: "POST",
         headers: {
             'Content-Type': 'application/json',
-            'X-CSRFToken': csrftoken,
+            'X-CSRFToken': getCookie('csrftoken'),
         },
     }
     const response = await fetch(url, data)
     const jsonResponse = await response.json()
 
-    if (process == 'like') {
-        event.target.dataset.isLiked = 'true'
-        event.target.innerHTML = '❤︎'
-    } else {
-        event.target.dataset.isLiked = 'false'
-        event.target.innerHTML = '♡'
-    }
+    setLiked(event.target, process == 'like')
     document.getElementById(pk).innerHTML = jsonResponse.liked_by_count
 }
+
+
+// キャッシュされたページに閲覧者ごとの状態（ログイン状態・いいね・フォロー）を反映する
+async function hydrateViewerState() {
+    const root = document.querySelector('[data-viewer-state-url]')
+    if (!root) {
+        return
+    }
+    const buttons = document.querySelectorAll('button[data-pk]')
+    // アーカイブしたツイートはボタンがなく，いいね済みかを表示するだけ
+    const archived = document.querySelectorAll('[data-liked-pk]')
+    const pks = Array.from(buttons, (button) => button.dataset.pk)
+    archived.forEach((element) => pks.push(element.dataset.likedPk))
+    const params = new URLSearchParams({ tweets: pks.join(',') })
+    if (root.dataset.profileUsername) {
+        params.set('user', root.dataset.profileUsername)
+    }
+    const response = await fetch(`${root.dataset.viewerStateUrl}?${params}`, { credentials: 'same-origin' })
+    const state = await response.json()
+
+    document.querySelectorAll('[data-viewer]').forEach((element) => {
+        element.hidden = element.dataset.viewer != (state.authenticated ? 'authenticated' : 'anonymous')
+    })
+    for (const [pk, count] of Object.entries(state.like_counts)) {
+        const counter = document.getElementById(pk)
+        if (counter) {
+            counter.innerHTML = count
+        }
+    }
+    if (!state.authenticated) {
+        buttons.forEach((button) => { button.disabled = true })
+        return
+    }
+
+    document.querySelectorAll('[data-viewer-profile-link]').forEach((link) => { link.href = state.profile_url })
+    const liked = new Set(state.liked)
+    buttons.forEach((button) => setLiked(button, liked.has(button.dataset.pk)))
+    archived.forEach((element) => { element.innerHTML = liked.has(element.dataset.likedPk) ? '❤︎' : '♡' })
+    document.querySelectorAll('[data-owner]').forEach((element) => {
+        element.hidden = !state.own_tweets.includes(element.dataset.owner)
+    })
+    document.querySelectorAll('[data-self-only]').forEach((element) => { element.hidden = !state.is_self })
+
+    const followForm = document.querySelector('[data-follow-form]')
+    if (followForm && state.is_self === false) {
+        followForm.querySelector('[name=csrfmiddlewaretoken]').value = getCookie('csrftoken')
+        followForm.querySelectorAll('[data-following]').forEach((button) => {
+            button.hidden = button.dataset.following != String(state.following)
+        })
+        followForm.hidden = false
+    }
+}
+
+
+document.addEventListener('DOMContentLoaded', hydrateViewerState)
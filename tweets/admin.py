@@ -1,5 +1,44 @@
 from django.contrib import admin
 
-from .models import Tweet
+from mysite.paginator import EstimatedCountPaginator
 
-admin.site.register(Tweet)
+from .forms import TweetCreateForm
+from .models import ArchivedTweet, Tweet
+
+
+class TweetAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "created_at", "like_count")
+    list_select_related = ("user",)
+    raw_id_fields = ("user",)
+    # 本文は TweetCreateForm で Tweet.content に入れ，保存時に TweetBody にする。作成後は変えられない。
+    # いいねしたユーザーは多すぎてフォームに出せないので LikeAdmin で見る
+    form = TweetCreateForm
+    fields = ("user", "content")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_readonly_fields(self, request, obj=None):
+        return ("user", "content") if obj is not None else ()
+
+
+class LikeAdmin(admin.ModelAdmin):
+    list_display = ("id", "tweet_id", "user", "created_at")
+    list_select_related = ("user",)
+    raw_id_fields = ("tweet", "user")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ArchivedTweetAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "created_at", "like_count")
+    list_select_related = ("user",)
+    raw_id_fields = ("user",)
+    readonly_fields = ("content",)
+    exclude = ("content_z",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+admin.site.register(Tweet, TweetAdmin)
+admin.site.register(Tweet.liked_by.through, LikeAdmin)
+admin.site.register(ArchivedTweet, ArchivedTweetAdmin)
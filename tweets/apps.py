@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TweetsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tweets"
+
+    def ready(self):
+        from mysite import checks  # noqa: F401
+
+        from . import signals  # noqa: F401
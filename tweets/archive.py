@@ -0,0 +1,95 @@
+from collections import Counter
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from mysite.db import delete_in
+
+from .models import ArchivedLike, ArchivedTweet, Like, Tweet
+from .sharding import attach_users, locate, shard_aliases, shard_for_user
+
+
+def archive_batch(cutoff, batch_size=1000, using="default"):
+    with transaction.atomic(using=using):
+        tweets = list(Tweet.objects.using(using).filter(created_at__lt=cutoff).order_by("pk")[:batch_size])
+        if not tweets:
+            return 0
+        pks = [tweet.pk for tweet in tweets]
+        likes = Like.objects.using(using).filter(tweet_id__in=pks)
+        archived_likes = [
+            ArchivedLike(tweet_id=tweet_id, user_id=user_id, created_at=created_at)
+            for tweet_id, user_id, created_at in likes.values_list("tweet_id", "user_id", "created_at")
+        ]
+        like_counts = Counter(like.tweet_id for like in archived_likes)
+        ArchivedTweet.objects.using(using).bulk_create(
+            [ArchivedTweet.from_tweet(tweet, like_counts[tweet.pk]) for tweet in tweets], ignore_conflicts=True
+        )
+        # いいねした側から引けるように，いいねは行のまま ArchivedLike に移す
+        ArchivedLike.objects.using(using).bulk_create(archived_likes, ignore_conflicts=True)
+        # 通知はアーカイブしたツイートを指したまま残すので，Collector の CASCADE を通さずに消す
+        likes.delete()
+        delete_in(Tweet, pks, using=using)
+    return len(tweets)
+
+
+def archive_tweets(older_than_days=None, batch_size=1000):
+    days = settings.TWEET_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = timezone.now() - timedelta(days=days)
+    for alias in shard_aliases():
+        while archived := archive_batch(cutoff, batch_size, alias):
+            yield archived
+
+
+def get_tweet(pk, **filters):
+    # ホットテーブルになければアーカイブを読む
+    if settings.TWEET_SHARDS:
+        # filters は user__ で始まるものだけを受け付ける
+        tweet = locate(Tweet, pk) or locate(ArchivedTweet, pk)
+        user_filters = {key.removeprefix("user__"): value for key, value in filters.items()}
+        tweets = attach_users([tweet], **user_filters) if tweet is not None else []
+        return tweets[0] if tweets else None
+    tweet = Tweet.objects.select_related("user").filter(pk=pk, **filters).first()
+    if tweet is None:
+        tweet = ArchivedTweet.objects.select_related("user").filter(pk=pk, **filters).first()
+    return tweet
+
+
+class UserTimeline:
+    # 新しい順にホットテーブルを読み切ってから，必要になった時点でアーカイブを読みに行く
+    def __init__(self, user):
+        self.user = user
+        alias = shard_for_user(user.pk)
+        self.hot = Tweet.objects.using(alias).filter(user=user).order_by("-pk")
+        self.archived = ArchivedTweet.objects.using(alias).filter(user=user).order_by("-pk")
+
+    def __iter__(self):
+        for tweet in chain(self.hot, self.archived.iterator()):
+            tweet.user = self.user
+            yield tweet
+
+    def page(self, before=None, limit=20, summary=None):
+        # 新しい順に limit 件と，続きがあれば次のページの before を返す。id は時刻順で，
+        # アーカイブにあるのはホットテーブルより古いツイートなので，id で区切ればそのままつながる
+        tweets = None
+        # 最初のページは ProfileSummary の latest_tweet_ids を主キーで読む。削除で足りなくなっていたら使わない
+        latest_ids = summary.latest_tweet_ids if before is None and summary is not None else []
+        if len(latest_ids) > limit or (latest_ids and len(latest_ids) == summary.tweet_count):
+            ids = latest_ids[: limit + 1]
+            tweets = list(self.hot.filter(pk__in=ids))
+            if len(tweets) < len(ids):
+                tweets += self.archived.filter(pk__in=set(ids) - {tweet.pk for tweet in tweets})
+            tweets = sorted(tweets, key=lambda tweet: tweet.pk, reverse=True) if len(tweets) == len(ids) else None
+        if tweets is None:
+            hot, archived = self.hot, self.archived
+            if before is not None:
+                hot, archived = hot.filter(pk__lt=before), archived.filter(pk__lt=before)
+            tweets = list(hot[: limit + 1])
+            if len(tweets) <= limit:
+                tweets += archived[: limit + 1 - len(tweets)]
+        for tweet in tweets:
+            tweet.user = self.user
+        next_cursor = tweets[limit - 1].pk if len(tweets) > limit else None
+        return tweets[:limit], next_cursor
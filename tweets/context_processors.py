@@ -0,0 +1,16 @@
+from django.urls import reverse
+
+
+def url_prefix(viewname, placeholder):
+    url = reverse(viewname, args=[placeholder])
+    prefix, _, suffix = url.rpartition(str(placeholder))
+    assert suffix == "/", url
+    return prefix
+
+
+def url_prefixes(request):
+    # ツイートごとに {% url %} を評価しないよう，描画ごとに一度だけ逆引きしておく
+    return {
+        "tweet_url_prefix": url_prefix("tweets:detail", 0),
+        "profile_url_prefix": url_prefix("accounts:user_profile", "-"),
+    }
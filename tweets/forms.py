@@ -4,6 +4,13 @@ from .models import Tweet
 
 
 class TweetCreateForm(forms.ModelForm):
+    # 本文はモデルのフィールドではなく Tweet.content (保存時に TweetBody になる) に入れる
+    content = forms.CharField(label="Content", max_length=255, widget=forms.Textarea)
+
     class Meta:
         model = Tweet
-        fields = ("content",)
+        fields = ()
+
+    def save(self, commit=True):
+        self.instance.content = self.cleaned_data["content"]
+        return super().save(commit)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from tweets.archive import archive_tweets
+
+
+class Command(BaseCommand):
+    help = "Move tweets older than TWEET_ARCHIVE_AFTER_DAYS into the compressed archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, older_than_days, batch_size, **options):
+        total = 0
+        for archived in archive_tweets(older_than_days, batch_size):
+            total += archived
+            self.stdout.write(f"{total} tweets archived")
+        self.stdout.write(f"Archived {total} tweets")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tweets.models import RateLimitBucket
+
+
+class Command(BaseCommand):
+    help = "Delete rate-limit buckets that have refilled, in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to wait between batches")
+
+    def handle(self, *args, batch_size, sleep, **options):
+        # tat が過ぎたバケットは行がないときと同じ扱いになるので消してよい
+        now = time.time_ns() // 1000
+        total = 0
+        while True:
+            keys = list(RateLimitBucket.objects.filter(tat__lt=now).values_list("pk", flat=True)[:batch_size])
+            if not keys:
+                break
+            total += RateLimitBucket.objects.filter(pk__in=keys, tat__lt=now).delete()[0]
+            if sleep:
+                time.sleep(sleep)
+        self.stdout.write(f"deleted {total} refilled rate-limit buckets")
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from tweets.sharding import reshard, shard_aliases
+
+
+class Command(BaseCommand):
+    help = "Move tweets, their likes and archived tweets to the shard their author hashes to."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shards", nargs="+", help="Target database aliases (default: TWEET_SHARDS).")
+        parser.add_argument("--sources", nargs="+", help="Database aliases to read from (default: the targets).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, shards, sources, batch_size, dry_run, **options):
+        targets = shards or shard_aliases()
+        for alias in [*targets, *(sources or [])]:
+            if alias not in connections.databases:
+                raise CommandError(f"Unknown database alias: {alias}")
+        if not shards and not settings.TWEET_SHARDS:
+            self.stderr.write("TWEET_SHARDS is empty; checking the default database only")
+        total = 0
+        for model, source, moved in reshard(targets, sources, batch_size, dry_run):
+            total += moved
+            if moved:
+                self.stdout.write(f"{model._meta.label} {source}: {moved} moved")
+        verb = "Would move" if dry_run else "Moved"
+        self.stdout.write(f"{verb} {total} rows")
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from mysite.db import delete_in
+from tweets.models import Tweet, TweetBody
+from tweets.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = "Report how much space storing each tweet body once (compressed) saves, per database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--prune", action="store_true", help="Delete bodies no tweet refers to (left by deletes and archiving)."
+        )
+
+    def handle(self, *args, batch_size, prune, **options):
+        for alias in shard_aliases():
+            self.report(alias, batch_size, prune)
+
+    def report(self, alias, batch_size, prune):
+        # inline: 本文を各ツイートに持った場合，unique: 同じ本文を1つにまとめた場合，stored: 実際の大きさ
+        tweets = inline = unique = stored = bodies = unused = 0
+        last_pk = 0
+        while batch := list(TweetBody.objects.using(alias).filter(pk__gt=last_pk).order_by("pk")[:batch_size]):
+            last_pk = batch[-1].pk
+            refs = dict(
+                Tweet.objects.using(alias)
+                .filter(body__in=batch)
+                .order_by()
+                .values("body")
+                .annotate(count=Count("pk"))
+                .values_list("body", "count")
+            )
+            orphans = []
+            for body in batch:
+                count = refs.get(body.pk, 0)
+                size = len(body.text.encode())
+                if count == 0:
+                    orphans.append(body.pk)
+                    if prune:
+                        continue
+                bodies += 1
+                tweets += count
+                inline += size * count
+                unique += size
+                stored += len(body.data)
+            unused += len(orphans)
+            if prune and orphans:
+                delete_in(TweetBody, orphans, using=alias)
+
+        saved = 1 - stored / inline if inline else 0
+        self.stdout.write(
+            f"{alias}: {tweets} tweets, {bodies} bodies ({unused} unreferenced{', pruned' if prune else ''})"
+        )
+        self.stdout.write(f"  inline:       {inline:,} bytes")
+        self.stdout.write(f"  deduplicated: {unique:,} bytes")
+        self.stdout.write(f"  stored:       {stored:,} bytes ({saved:.1%} saved)")
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.13 on 2026-10-19 16:03
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_like_count(apps, schema_editor):
+    Tweet = apps.get_model("tweets", "Tweet")
+    likes = (
+        Tweet.liked_by.through.objects.filter(tweet_id=OuterRef("pk"))
+        .order_by()
+        .values("tweet_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    Tweet.objects.update(like_count=Coalesce(Subquery(likes, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0004_tweet_liked_by"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tweet",
+            name="like_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_like_count, migrations.RunPython.noop),
+    ]
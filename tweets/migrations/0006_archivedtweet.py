@@ -0,0 +1,38 @@
+# Generated by Django 4.1.13 on 2026-10-19 16:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("tweets", "0005_tweet_like_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedTweet",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField()),
+                ("content_z", models.BinaryField()),
+                ("like_count", models.PositiveIntegerField(default=0)),
+                ("liked_by_z", models.BinaryField(default=b"")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_tweets",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="archivedtweet",
+            index=models.Index(fields=["user", "-created_at"], name="archived_tweet_user_created"),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.13 on 2026-10-19 16:49
+
+from django.db import migrations, models
+import mysite.snowflake
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0007_tweetidticket_alter_archivedtweet_user_and_more"),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="TweetIdTicket",
+        ),
+        migrations.RemoveIndex(
+            model_name="archivedtweet",
+            name="archived_tweet_user_created",
+        ),
+        migrations.AlterField(
+            model_name="tweet",
+            name="id",
+            field=models.BigIntegerField(
+                default=mysite.snowflake.next_id, editable=False, primary_key=True, serialize=False
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedtweet",
+            index=models.Index(fields=["user", "-id"], name="archived_tweet_user_id"),
+        ),
+    ]
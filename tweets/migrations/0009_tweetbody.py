@@ -0,0 +1,58 @@
+# Generated by Django 4.1.13 on 2026-10-19 18:12
+
+import hashlib
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_content_to_bodies(apps, schema_editor):
+    Tweet = apps.get_model("tweets", "Tweet")
+    TweetBody = apps.get_model("tweets", "TweetBody")
+    using = schema_editor.connection.alias
+    tweets = Tweet.objects.using(using).filter(body__isnull=True).order_by("pk")
+    while batch := list(tweets.values_list("pk", "content")[:1000]):
+        digests = {content: hashlib.sha256(content.encode()).hexdigest() for _, content in batch}
+        bodies = []
+        for content, digest in digests.items():
+            raw = content.encode()
+            data = zlib.compress(raw, 9)
+            compressed = len(data) < len(raw)
+            bodies.append(TweetBody(digest=digest, data=data if compressed else raw, compressed=compressed))
+        TweetBody.objects.using(using).bulk_create(bodies, ignore_conflicts=True)
+        body_ids = dict(
+            TweetBody.objects.using(using).filter(digest__in=digests.values()).values_list("digest", "pk")
+        )
+        for pk, content in batch:
+            Tweet.objects.using(using).filter(pk=pk).update(body_id=body_ids[digests[content]])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0008_snowflake_ids"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TweetBody",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("digest", models.CharField(max_length=64, unique=True)),
+                ("data", models.BinaryField()),
+                ("compressed", models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="tweet",
+            name="body",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="tweets",
+                to="tweets.tweetbody",
+            ),
+        ),
+        migrations.RunPython(move_content_to_bodies, migrations.RunPython.noop),
+    ]
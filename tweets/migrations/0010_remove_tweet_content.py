@@ -0,0 +1,29 @@
+# Generated by Django 4.1.13 on 2026-10-19 18:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0009_tweetbody"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="tweet",
+            name="content",
+        ),
+        migrations.AlterField(
+            model_name="tweet",
+            name="body",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT, related_name="tweets", to="tweets.tweetbody"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tweet",
+            index=models.Index(fields=["user", "body"], name="tweet_user_body"),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.13 on 2026-10-19 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0011_tweet_tweet_created_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SnowflakeLease",
+            fields=[
+                ("worker_id", models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ("owner", models.CharField(max_length=128)),
+                ("expires_at", models.DateTimeField()),
+            ],
+        ),
+    ]
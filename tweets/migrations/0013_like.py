@@ -0,0 +1,64 @@
+# Generated by Django 4.1.13 on 2026-10-19 17:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("tweets", "0012_snowflakelease"),
+    ]
+
+    operations = [
+        # 自動で作られていた中間テーブル tweets_tweet_liked_by を Like として扱う。表はそのまま使う
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="Like",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                            ),
+                        ),
+                        ("tweet", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="tweets.tweet")),
+                        (
+                            "user",
+                            models.ForeignKey(
+                                db_constraint=False,
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="+",
+                                to=settings.AUTH_USER_MODEL,
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "tweets_tweet_liked_by",
+                        "unique_together": {("tweet", "user")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="tweet",
+                    name="liked_by",
+                    field=models.ManyToManyField(
+                        related_name="liking", through="tweets.Like", to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+        ),
+        # 既存の行はいつのいいねかわからないので，マイグレーションした日時になる
+        migrations.AddField(
+            model_name="like",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name="like",
+            index=models.Index(fields=["created_at", "id"], name="like_created_id"),
+        ),
+    ]
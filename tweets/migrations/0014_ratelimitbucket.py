@@ -0,0 +1,20 @@
+# Generated by Django 4.1.13 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0013_like"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RateLimitBucket",
+            fields=[
+                ("key", models.CharField(max_length=191, primary_key=True, serialize=False)),
+                ("tat", models.BigIntegerField()),
+            ],
+        ),
+    ]
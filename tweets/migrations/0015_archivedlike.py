@@ -0,0 +1,50 @@
+# Generated by Django 4.1.13 on 2026-10-19 18:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("tweets", "0014_ratelimitbucket"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="archivedtweet",
+            name="liked_by_z",
+        ),
+        migrations.CreateModel(
+            name="ArchivedLike",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField()),
+                (
+                    "tweet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="likes", to="tweets.archivedtweet"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="archivedlike",
+            index=models.Index(fields=["user", "tweet"], name="archived_like_user_tweet"),
+        ),
+        migrations.AlterUniqueTogether(
+            name="archivedlike",
+            unique_together={("tweet", "user")},
+        ),
+    ]
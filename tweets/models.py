@@ -1,9 +1,195 @@
+import hashlib
+import zlib
+
 from django.conf import settings
-from django.db import models
+from django.db import models, router
+from django.utils import timezone
+
+from mysite.snowflake import next_id
+
+from .sharding import shard_for_user
+
+
+def content_digest(content):
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class TweetBody(models.Model):
+    # ツイートの本文。同じ本文は DB ごとに1行だけ持ち，zlib で縮むときは圧縮して保存する
+    digest = models.CharField(max_length=64, unique=True)
+    data = models.BinaryField()
+    compressed = models.BooleanField(default=False)
+
+    @classmethod
+    def encode(cls, content):
+        raw = content.encode()
+        data = zlib.compress(raw, 9)
+        if len(data) < len(raw):
+            return cls(digest=content_digest(content), data=data, compressed=True)
+        return cls(digest=content_digest(content), data=raw, compressed=False)
+
+    @classmethod
+    def intern(cls, contents, using="default"):
+        # 本文から TweetBody を引く。なければまとめて作り，{本文: TweetBody} を返す
+        digests = {content: content_digest(content) for content in set(contents)}
+        bodies = cls.objects.using(using).in_bulk(digests.values(), field_name="digest")
+        missing = {digest: content for content, digest in digests.items() if digest not in bodies}
+        if missing:
+            cls.objects.using(using).bulk_create(
+                [cls.encode(content) for content in missing.values()], ignore_conflicts=True
+            )
+            bodies.update(cls.objects.using(using).in_bulk(missing, field_name="digest"))
+        return {content: bodies[digest] for content, digest in digests.items()}
+
+    @property
+    def text(self):
+        return (zlib.decompress(self.data) if self.compressed else bytes(self.data)).decode()
+
+
+class TweetQuerySet(models.QuerySet):
+    def _content_lookup(self, kwargs):
+        # content=... での絞り込みは本文を比べずにハッシュの比較にする
+        if "content" in kwargs:
+            kwargs["body__digest"] = content_digest(kwargs.pop("content"))
+        return kwargs
+
+    def filter(self, *args, **kwargs):
+        return super().filter(*args, **self._content_lookup(kwargs))
+
+    def exclude(self, *args, **kwargs):
+        return super().exclude(*args, **self._content_lookup(kwargs))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # save() を通らないので，ここで本文を TweetBody にする
+        objs = list(objs)
+        pending = [tweet for tweet in objs if "_content" in tweet.__dict__]
+        if pending:
+            bodies = TweetBody.intern([tweet._content for tweet in pending], using=self.db)
+            for tweet in pending:
+                tweet.body = bodies[tweet.__dict__.pop("_content")]
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class TweetManager(models.Manager.from_queryset(TweetQuerySet)):
+    def get_queryset(self):
+        # 本文は TweetBody にあるので，ツイートと一緒に読む
+        return super().get_queryset().select_related("body")
 
 
 class Tweet(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    content = models.TextField(max_length=255)
+    # 時刻順の 64bit ID (mysite.snowflake)。DB の連番を使わないのでシャードをまたいでも衝突せず，id の順がそのまま新しい順になる
+    id = models.BigIntegerField(primary_key=True, default=next_id, editable=False)
+    # ツイートといいねは tweets.sharding でユーザーごとに別の DB に置けるので，User への外部キー制約は張らない
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False)
+    body = models.ForeignKey(TweetBody, on_delete=models.PROTECT, related_name="tweets")
     created_at = models.DateTimeField(auto_now_add=True)
-    liked_by = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name="liking")
+    liked_by = models.ManyToManyField(settings.AUTH_USER_MODEL, through="Like", related_name="liking")
+    # liked_by の件数。jobs から更新されるので一時的にずれることがある
+    like_count = models.PositiveIntegerField(default=0)
+
+    objects = TweetManager()
+
+    class Meta:
+        indexes = [
+            # 同じ本文の連投を本文を比べずに調べる (tweets.services.is_duplicate)
+            models.Index(fields=["user", "body"], name="tweet_user_body"),
+            # 集計 (analytics.rollups) が作成順に読む
+            models.Index(fields=["created_at", "id"], name="tweet_created_id"),
+        ]
+
+    @property
+    def content(self):
+        if "_content" in self.__dict__:
+            return self._content
+        return self.body.text
+
+    @content.setter
+    def content(self, value):
+        # 保存するときに TweetBody にする
+        self._content = value
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and settings.TWEET_SHARDS:
+            # objects.create() は using に default を渡してくるので，ここで作者のシャードに決める
+            kwargs["using"] = shard_for_user(self.user_id)
+        if "_content" in self.__dict__:
+            # 本文はツイートと同じ DB に置く
+            using = kwargs.get("using") or router.db_for_write(Tweet, instance=self)
+            self.body = TweetBody.intern([self._content], using=using)[self._content]
+            del self._content
+        super().save(*args, **kwargs)
+
+
+class Like(models.Model):
+    # Tweet.liked_by の中間テーブル。集計 (analytics.rollups) がいいねした日時で数えられるように created_at を持つ
+    tweet = models.ForeignKey(Tweet, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+", db_constraint=False)
+    # シャードを移すときや取り込むときに日時を引き継げるように，auto_now_add ではなく default にする
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # 自動で作られていた中間テーブルをそのまま使う
+        db_table = "tweets_tweet_liked_by"
+        unique_together = [("tweet", "user")]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="like_created_id"),
+        ]
+
+
+class ArchivedTweet(models.Model):
+    # 古いツイートの保管先。id は元の Tweet の id をそのまま使い，本文は zlib で圧縮して持つ。いいねは ArchivedLike に移す
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_tweets", db_constraint=False
+    )
+    created_at = models.DateTimeField()
+    content_z = models.BinaryField()
+    like_count = models.PositiveIntegerField(default=0)
+
+    is_archived = True
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-id"], name="archived_tweet_user_id"),
+        ]
+
+    @classmethod
+    def from_tweet(cls, tweet, like_count):
+        return cls(
+            id=tweet.pk,
+            user_id=tweet.user_id,
+            created_at=tweet.created_at,
+            content_z=zlib.compress(tweet.content.encode(), 9),
+            like_count=like_count,
+        )
+
+    @property
+    def content(self):
+        return zlib.decompress(self.content_z).decode()
+
+
+class ArchivedLike(models.Model):
+    # アーカイブしたツイートのいいね。ArchivedTweet と同じシャードに置き，エクスポートや退会時の削除でいいねした側から引く
+    tweet = models.ForeignKey(ArchivedTweet, on_delete=models.CASCADE, related_name="likes")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+", db_constraint=False)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = [("tweet", "user")]
+        indexes = [
+            models.Index(fields=["user", "tweet"], name="archived_like_user_tweet"),
+        ]
+
+
+class SnowflakeLease(models.Model):
+    # mysite.snowflake のワーカー ID の貸し出し。期限までに延長しなかった ID は別のプロセスが使える
+    worker_id = models.PositiveSmallIntegerField(primary_key=True)
+    owner = models.CharField(max_length=128)
+    expires_at = models.DateTimeField()
+
+
+class RateLimitBucket(models.Model):
+    # mysite.middleware.RateLimitMiddleware のバケット。tat は次の1回分が払える理論上の時刻 (マイクロ秒)。
+    # tat が過ぎた行は満タンのバケットと同じなので purge_ratelimits で消してよい
+    key = models.CharField(max_length=191, primary_key=True)
+    tat = models.BigIntegerField()
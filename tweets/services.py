@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from mysite.bloom import CachedBloomFilters
+from mysite.db import delete_where, insert_ignore
+
+from .models import Tweet, TweetBody, content_digest
+from .sharding import liked_tweet_ids, shard_for_user
+
+# ユーザーごとのいいねしたツイート ID。いいねしていないツイートは DB に問い合わせずに済む
+like_filters = CachedBloomFilters("likes", liked_tweet_ids)
+
+
+# using にはツイートのある DB を渡す (tweets.sharding)
+def like(tweet_id, user_id, using=None):
+    created = insert_ignore(Tweet.liked_by.through, using=using, tweet_id=tweet_id, user_id=user_id)
+    if created:
+        like_filters.add(user_id, tweet_id)
+    return created
+
+
+def unlike(tweet_id, user_id, using=None):
+    # フィルタから消さなくても偽陽性が増えるだけなので，次に作り直すまでそのままにする
+    return delete_where(Tweet.liked_by.through, using=using, tweet_id=tweet_id, user_id=user_id)
+
+
+def liked_among(user_id, tweet_ids):
+    bloom = like_filters.get(user_id)
+    candidates = list(tweet_ids) if bloom is None else [pk for pk in tweet_ids if pk in bloom]
+    return liked_tweet_ids(user_id, candidates) if candidates else set()
+
+
+def is_duplicate(user_id, content):
+    # 本文は比べず，ハッシュから TweetBody を引いて (user, body) の索引だけを見る
+    alias = shard_for_user(user_id)
+    bodies = TweetBody.objects.using(alias).filter(digest=content_digest(content))
+    body_id = bodies.values_list("pk", flat=True).first()
+    if body_id is None:
+        return False
+    since = timezone.now() - timedelta(seconds=settings.TWEET_DUPLICATE_WINDOW)
+    return Tweet.objects.using(alias).filter(user_id=user_id, body_id=body_id, created_at__gte=since).exists()
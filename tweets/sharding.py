@@ -0,0 +1,164 @@
+import hashlib
+import heapq
+from bisect import bisect
+from collections import defaultdict
+from functools import lru_cache
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from mysite.db import delete_in
+
+# ユーザーごとに同じシャードに置くモデル。いいねはツイートと同じシャードに置く
+SHARDED_MODELS = {"tweets.tweet", "tweets.archivedtweet", "tweets.like", "tweets.archivedlike"}
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(str(value).encode(), usedforsecurity=False).digest()[:8], "big")
+
+
+class HashRing:
+    # コンシステントハッシュ。シャードを1つ足しても移動するキーはおよそ 1/N で済む
+    def __init__(self, nodes, vnodes=128):
+        self.nodes = list(nodes)
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        return self._nodes[bisect(self._points, _hash(key)) % len(self._points)]
+
+
+def shard_aliases():
+    return list(settings.TWEET_SHARDS) or ["default"]
+
+
+@lru_cache(maxsize=8)
+def _ring(aliases):
+    return HashRing(aliases)
+
+
+def shard_for_user(user_id, aliases=None):
+    return _ring(tuple(aliases or shard_aliases())).node_for(user_id)
+
+
+class TweetShardRouter:
+    # TWEET_SHARDS が空なら何も決めない（すべて default）
+    def db_for_write(self, model, **hints):
+        if not settings.TWEET_SHARDS or model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        instance = hints.get("instance")
+        if instance is None or instance._state.db:
+            return None
+        user_id = getattr(instance, "user_id", None)
+        return None if user_id is None else shard_for_user(user_id)
+
+    db_for_read = db_for_write
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._meta.label_lower, obj2._meta.label_lower} & SHARDED_MODELS:
+            return True
+        return None
+
+
+def attach_users(tweets, **filters):
+    # シャードでは User と JOIN できないので default から まとめて読んで付ける。filters に合わないユーザーのツイートは除く
+    user_ids = {tweet.user_id for tweet in tweets}
+    users = get_user_model().objects.filter(pk__in=user_ids, **filters).in_bulk()
+    attached = []
+    for tweet in tweets:
+        user = users.get(tweet.user_id)
+        if user is not None:
+            tweet.user = user
+            attached.append(tweet)
+    return attached
+
+
+def merge_recent(querysets, limit):
+    # 各シャードから新しい順に limit 件ずつ読み，id (時刻順) で突き合わせて新しいほうから limit 件を返す
+    iterators = [queryset.order_by("-pk")[:limit] for queryset in querysets]
+    return list(islice(heapq.merge(*iterators, key=lambda tweet: tweet.pk, reverse=True), limit))
+
+
+def locate(model, pk, user_id=None):
+    # 作者 (user_id) がわかっていればそのシャードだけを読む
+    for alias in shard_aliases() if user_id is None else [shard_for_user(user_id)]:
+        obj = model.objects.using(alias).filter(pk=pk).first()
+        if obj is not None:
+            return obj
+    return None
+
+
+def liked_tweet_ids(user_id, tweet_ids=None):
+    # アーカイブしたツイートのいいね (ArchivedLike) も含める
+    from .models import ArchivedLike, Like
+
+    liked = set()
+    for alias in shard_aliases():
+        likes, archived = (model.objects.using(alias).filter(user_id=user_id) for model in (Like, ArchivedLike))
+        if tweet_ids is not None:
+            likes, archived = likes.filter(tweet_id__in=tweet_ids), archived.filter(tweet_id__in=tweet_ids)
+        liked.update(likes.values_list("tweet_id", flat=True).union(archived.values_list("tweet_id", flat=True)))
+    return liked
+
+
+def _move(model, source, moves):
+    from .models import ArchivedLike, Like, Tweet, TweetBody
+
+    pks = [row.pk for row, _ in moves]
+    through = Like if model is Tweet else ArchivedLike
+    likes = defaultdict(list)
+    for tweet_id, user_id, created_at in (
+        through.objects.using(source).filter(tweet_id__in=pks).values_list("tweet_id", "user_id", "created_at")
+    ):
+        likes[tweet_id].append((user_id, created_at))
+    by_target = defaultdict(list)
+    for row, target in moves:
+        by_target[target].append(row)
+    # 先にコピーしてから元を消すので，途中で止まってもやり直せば続きから移せる
+    for target, rows in by_target.items():
+        with transaction.atomic(using=target):
+            if model is Tweet:
+                # 本文はツイートと同じ DB に置くので，移動先の TweetBody に付け替える。移動元に残った本文は tweet_body_report --prune で消す
+                bodies = TweetBody.intern([row.content for row in rows], using=target)
+                for row in rows:
+                    row.body = bodies[row.content]
+            copied = set(
+                model.objects.using(target).filter(pk__in=[row.pk for row in rows]).values_list("pk", flat=True)
+            )
+            for row in rows:
+                if row.pk not in copied:
+                    # raw=True なら created_at の auto_now_add で日時が上書きされない
+                    row.save_base(raw=True, force_insert=True, using=target)
+            through.objects.using(target).bulk_create(
+                [
+                    through(tweet_id=row.pk, user_id=user_id, created_at=created_at)
+                    for row in rows
+                    for user_id, created_at in likes[row.pk]
+                ],
+                ignore_conflicts=True,
+            )
+    with transaction.atomic(using=source):
+        through.objects.using(source).filter(tweet_id__in=pks).delete()
+        delete_in(model, pks, using=source)
+
+
+def reshard(targets, sources=None, batch_size=1000, dry_run=False):
+    # sources の各 DB を見て，targets のリングで別のシャードに割り当てられるツイートを移す。
+    # 移したモデル，移動元，件数を1バッチごとに返す
+    from .models import ArchivedTweet, Tweet
+
+    targets = list(targets)
+    sources = list(sources or targets)
+    for source in sources:
+        for model in (Tweet, ArchivedTweet):
+            last_pk = 0
+            while rows := list(model.objects.using(source).filter(pk__gt=last_pk).order_by("pk")[:batch_size]):
+                last_pk = rows[-1].pk
+                moves = [(row, shard_for_user(row.user_id, targets)) for row in rows]
+                moves = [(row, target) for row, target in moves if target != source]
+                if moves and not dry_run:
+                    _move(model, source, moves)
+                yield model, source, len(moves)
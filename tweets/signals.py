@@ -0,0 +1,16 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from .models import Tweet
+from .services import like_filters
+
+
+@receiver(m2m_changed, sender=Tweet.liked_by.through)
+def update_like_filters(sender, instance, action, reverse, pk_set, **kwargs):
+    # tweet.liked_by.add() などは tweets.services.like を通らない
+    if action == "post_clear":
+        like_filters.clear()
+    elif action == "post_add":
+        for pk in pk_set:
+            user_id, tweet_id = (instance.pk, pk) if reverse else (pk, instance.pk)
+            like_filters.add(user_id, tweet_id)
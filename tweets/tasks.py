@@ -0,0 +1,42 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.summary import bump, record_like
+from jobs.queue import task
+from notifications.models import Notification
+from notifications.services import notify
+
+from .models import Like, Tweet
+from .sharding import locate
+
+
+def like_count_subquery(through=Like):
+    # ArchivedTweet を数え直すときは through=ArchivedLike
+    likes = (
+        through.objects.filter(tweet_id=OuterRef("pk"))
+        .order_by()
+        .values("tweet_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Coalesce(Subquery(likes, output_field=IntegerField()), 0)
+
+
+def rebuild_like_counts(queryset=None):
+    queryset = Tweet.objects.all() if queryset is None else queryset
+    return queryset.update(like_count=like_count_subquery())
+
+
+@task
+def refresh_like_count(tweet_id, actor_id=None, delta=0, author_id=None):
+    # delta はいいね (1) か取り消し (-1)。作者の ProfileSummary と通知もここで更新し，リクエストでは書かない
+    tweet = locate(Tweet, tweet_id, user_id=author_id)
+    if tweet is not None:
+        rebuild_like_counts(Tweet.objects.using(tweet._state.db).filter(pk=tweet_id))
+        if delta:
+            record_like(tweet.user_id, actor_id, delta)
+        else:
+            # プロフィールに出るいいね数が変わった
+            bump(tweet.user_id)
+        if delta > 0:
+            notify(tweet.user_id, Notification.Verb.LIKE, actor_id, tweet_id=tweet_id)
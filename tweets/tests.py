@@ -1,8 +1,47 @@
+import gzip
+import hashlib
+import io
+import json
+import multiprocessing
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from django.urls import reverse
-
-from .models import Tweet
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import URLResolver, path, reverse
+from django.urls.resolvers import RegexPattern
+from django.utils import timezone
+
+from accounts.deletion import request_deletion
+from accounts.exports import export_rows
+from accounts.graph import follow_graph
+from accounts.models import FriendShip, ProfileSummary
+from accounts.services import follow, follow_filters, is_following
+from jobs.queue import work
+from mysite import snowflake
+from mysite.apps import LazyAdminResolver
+from mysite.bloom import BloomFilter
+from mysite.checks import check_templates_use_hashed_assets
+from mysite.loaders import minify
+from mysite.startup import warm_up
+from mysite.static import StaticFilesMiddleware
+from notifications.models import Notification
+from notifications.services import notify, unread_count
+
+from .models import ArchivedTweet, RateLimitBucket, SnowflakeLease, Tweet, TweetBody
+from .services import like, like_filters, liked_among, unlike
+from .sharding import HashRing, shard_for_user
 
 User = get_user_model()
 
@@ -21,6 +60,27 @@ class TestHomeView(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertQuerysetEqual(response.context["tweet_list"], Tweet.objects.all(), ordered=False)
 
+    def test_paginates_by_id(self):
+        Tweet.objects.bulk_create(Tweet(user=self.user, content="testcontent") for _ in range(51))
+        tweet_ids = list(Tweet.objects.order_by("-pk").values_list("pk", flat=True))
+        response = self.client.get(self.url)
+
+        self.assertEqual([tweet.pk for tweet in response.context["tweet_list"]], tweet_ids[:50])
+        self.assertEqual(response.context["next_cursor"], tweet_ids[49])
+        response = self.client.get(self.url, {"before": response.context["next_cursor"]})
+        self.assertEqual([tweet.pk for tweet in response.context["tweet_list"]], tweet_ids[50:])
+        self.assertNotIn("next_cursor", response.context)
+        self.assertEqual(self.client.get(self.url, {"before": "x"}).status_code, 400)
+
+    def test_tweet_card_links(self):
+        tweet = Tweet.objects.create(user=self.user, content="testcontent")
+        tweet.liked_by.add(self.user)
+        response = self.client.get(self.url)
+
+        self.assertContains(response, f'href="{reverse("tweets:detail", args=[tweet.pk])}"')
+        self.assertContains(response, f'href="{reverse("accounts:user_profile", args=[self.user.username])}"')
+        self.assertContains(response, f'data-is-liked="true" data-pk="{tweet.pk}"')
+
 
 class TestTweetCreateView(TestCase):
     def setUp(self):
@@ -74,6 +134,7 @@ class TestTweetCreateView(TestCase):
 
 class TestTweetDetailView(TestCase):
     def setUp(self):
+        cache.clear()
         user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
         self.client.force_login(user)
         self.tweet = Tweet.objects.create(user=user, content="testcontent")
@@ -85,6 +146,66 @@ class TestTweetDetailView(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context["tweet"], Tweet.objects.get(pk=self.tweet.pk))
 
+    def test_not_modified_with_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_etag_changes_after_like(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.client.post(reverse("tweets:like", args=[self.tweet.pk]))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.context["tweet"].like_count, 1)
+
+    def test_cached_for_anonymous(self):
+        self.client.logout()
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+
+        self.assertIsNotNone(first.context)
+        self.assertIsNone(second.context)
+        self.assertEqual(second.content, first.content)
+        self.assertNotIn("Cookie", second.get("Vary", ""))
+
+
+class TestViewerStateView(TestCase):
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        self.user1 = User.objects.create_user(username="testuser1", email="test@test.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test@test.com", password="testpassword")
+        self.tweet1 = Tweet.objects.create(user=self.user1, content="testcontent")
+        self.tweet2 = Tweet.objects.create(user=self.user2, content="testcontent")
+        self.tweet2.liked_by.add(self.user1)
+        self.url = reverse("tweets:viewer_state")
+
+    def test_success_get(self):
+        self.client.force_login(self.user1)
+        response = self.client.get(self.url, {"tweets": f"{self.tweet1.pk},{self.tweet2.pk}", "user": "testuser2"})
+        data = response.json()
+
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertEqual(data["username"], "testuser1")
+        self.assertEqual(data["liked"], [str(self.tweet2.pk)])
+        self.assertEqual(data["own_tweets"], [str(self.tweet1.pk)])
+        self.assertFalse(data["is_self"])
+        self.assertFalse(data["following"])
+
+    def test_success_get_anonymous(self):
+        response = self.client.get(self.url, {"tweets": str(self.tweet1.pk)})
+
+        self.assertEqual(response.json(), {"authenticated": False, "like_counts": {str(self.tweet1.pk): 0}})
+
+    def test_failure_get_with_invalid_ids(self):
+        response = self.client.get(self.url, {"tweets": "1,abc"})
+
+        self.assertEqual(response.status_code, 400)
+
 
 class TestTweetDeleteView(TestCase):
     def setUp(self):
@@ -116,7 +237,7 @@ class TestTweetDeleteView(TestCase):
         response = self.client.post(reverse("tweets:delete", args=[self.tweet1.pk]))
 
         self.assertEqual(response.status_code, 403)
-        self.assertTrue(User.objects.filter(pk=self.tweet1.pk).exists())
+        self.assertTrue(Tweet.objects.filter(pk=self.tweet1.pk).exists())
 
 
 class TestLikeView(TestCase):
@@ -172,3 +293,693 @@ class TestUnLikeView(TestCase):
 
         self.assertTrue(response.status_code, 200)
         self.assertEqual(self.tweet.liked_by.count(), count_former)
+
+
+@override_settings(JOBS_EAGER=True)
+class TestLikeCount(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.client.force_login(self.user)
+        self.tweet = Tweet.objects.create(user=self.user, content="testcontent")
+
+    def test_like_and_unlike_update_like_count(self):
+        response = self.client.post(reverse("tweets:like", args=[self.tweet.pk]))
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.like_count, 1)
+        self.assertEqual(response.json()["liked_by_count"], 1)
+
+        self.client.post(reverse("tweets:unlike", args=[self.tweet.pk]))
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.like_count, 0)
+
+    @override_settings(JOBS_EAGER=False)
+    def test_like_count_is_updated_by_worker(self):
+        self.client.post(reverse("tweets:like", args=[self.tweet.pk]))
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.like_count, 0)
+
+        work()
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.like_count, 1)
+
+
+@override_settings(RATELIMITS={"tweets:like": {"user": "2/m", "ip": "3/m"}})
+class TestRateLimit(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.tweet = Tweet.objects.create(user=self.user, content="testcontent")
+        self.url = reverse("tweets:like", args=[self.tweet.pk])
+        self.client.force_login(self.user)
+
+    def test_user_bucket(self):
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response["Retry-After"]), 30)
+
+    def test_bucket_refills_one_request_per_interval(self):
+        now = time.time_ns()
+        with mock.patch("mysite.middleware.time.time_ns", return_value=now):
+            self.client.post(self.url)
+            self.client.post(self.url)
+            self.assertEqual(self.client.post(self.url).status_code, 429)
+        # 2/m なので30秒ごとに1回分ずつ戻り，固定の枠のように期間の境目でまとめて戻ることはない
+        with mock.patch("mysite.middleware.time.time_ns", return_value=now + 30 * 10**9):
+            self.assertEqual(self.client.post(self.url).status_code, 200)
+            self.assertEqual(self.client.post(self.url).status_code, 429)
+
+    def test_purge_refilled_buckets(self):
+        self.client.post(self.url)
+        self.assertEqual(RateLimitBucket.objects.count(), 2)
+        later = time.time_ns() + 61 * 10**9
+        with mock.patch("tweets.management.commands.purge_ratelimits.time.time_ns", return_value=later):
+            call_command("purge_ratelimits", stdout=io.StringIO())
+
+        self.assertFalse(RateLimitBucket.objects.exists())
+
+    def test_ip_bucket(self):
+        other = User.objects.create_user(username="testuser2", email="test@test.com", password="testpassword")
+        self.client.post(self.url)
+        self.client.post(self.url)
+        self.client.force_login(other)
+
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        self.assertEqual(self.client.post(self.url).status_code, 429)
+
+    def test_reads_are_not_limited(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get(reverse("tweets:detail", args=[self.tweet.pk])).status_code, 200)
+
+
+class TestDefaultRateLimit(TestCase):
+    # 既定の設定 (RATELIMITS) のまま制限がかかること
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.client.force_login(self.user)
+
+    def test_tweet_create_is_limited(self):
+        limit, _ = settings.RATELIMITS["tweets:create"]["user"].split("/")
+        for i in range(int(limit)):
+            response = self.client.post(reverse("tweets:create"), {"content": f"testcontent{i}"})
+            self.assertEqual(response.status_code, 302)
+        response = self.client.post(reverse("tweets:create"), {"content": "testcontent"})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Tweet.objects.count(), int(limit))
+
+
+class TestLikeRace(TransactionTestCase):
+    threads = 8
+    toggles = 250
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f"testuser{i}", email="test@test.com", password="testpassword")
+            for i in range(4)
+        ]
+        self.tweet = Tweet.objects.create(user=self.users[0], content="testcontent")
+
+    def run_threads(self, target):
+        errors = []
+
+        def run(i):
+            try:
+                target(i)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_double_click_likes_once(self):
+        changed = []
+        self.run_threads(lambda i: changed.extend(like(self.tweet.pk, self.users[0].pk) for _ in range(self.toggles)))
+
+        self.assertEqual(changed.count(True), 1)
+        self.assertEqual(self.tweet.liked_by.count(), 1)
+
+    def test_concurrent_toggles(self):
+        # 2スレッドずつ同じユーザーのいいねを切り替え続ける。報告された変化の差し引きが最終的な行と一致すること
+        net = [0] * len(self.users)
+        lock = threading.Lock()
+
+        def toggle(i):
+            user = self.users[i % len(self.users)]
+            for n in range(self.toggles):
+                changed = like(self.tweet.pk, user.pk) if n % 2 == 0 else unlike(self.tweet.pk, user.pk)
+                if changed:
+                    with lock:
+                        net[i % len(self.users)] += 1 if n % 2 == 0 else -1
+
+        self.run_threads(toggle)
+        liked = set(self.tweet.liked_by.values_list("pk", flat=True))
+
+        self.assertEqual(net, [int(user.pk in liked) for user in self.users])
+
+
+class TestStartup(TestCase):
+    def test_warm_up_does_not_load_admin(self):
+        admin_resolver = LazyAdminResolver("admin/")
+        resolver = URLResolver(RegexPattern(r"^/"), [admin_resolver, path("x/", HttpResponse, name="x")])
+        warm_up(resolver)
+
+        self.assertFalse(admin_resolver.urlconf_name.loaded)
+        self.assertEqual(resolver.reverse("x"), "x/")
+        self.assertEqual(resolver.resolve("/x/").url_name, "x")
+        self.assertFalse(admin_resolver.urlconf_name.loaded)
+        self.assertEqual(admin_resolver.reverse("index"), "")
+        self.assertTrue(admin_resolver.urlconf_name.loaded)
+
+    def test_admin_is_served(self):
+        user = User.objects.create_superuser(username="admin", email="test@test.com", password="testpassword")
+        self.client.force_login(user)
+
+        self.assertEqual(self.client.get(reverse("admin:index")).status_code, 200)
+        self.assertEqual(self.client.get(reverse("admin:tweets_tweet_changelist")).status_code, 200)
+
+
+class TestStaticFiles(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        settings_override = override_settings(
+            STATIC_ROOT=self.root, STATICFILES_STORAGE="mysite.storage.CompressedManifestStaticFilesStorage"
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+        self.hashed_name = json.loads((self.root / "staticfiles.json").read_text())["paths"]["js/like.js"]
+        self.app = StaticFilesMiddleware(lambda environ, start_response: [b"django"], root=self.root)
+
+    def request(self, path, **environ):
+        response = {}
+
+        def start_response(status, headers):
+            response["status"] = status
+            response["headers"] = dict(headers)
+
+        body = b"".join(self.app({"REQUEST_METHOD": "GET", "PATH_INFO": path, **environ}, start_response))
+        return response.get("status"), response.get("headers", {}), body
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        original = (self.root / "js/like.js").read_bytes()
+
+        self.assertRegex(self.hashed_name, r"^js/like\.[0-9a-f]{12}\.js$")
+        self.assertEqual(gzip.decompress((self.root / (self.hashed_name + ".gz")).read_bytes()), original)
+        self.assertEqual(static("js/like.js"), "/static/" + self.hashed_name)
+
+    def test_hashed_file_is_immutable(self):
+        status, headers, body = self.request("/static/" + self.hashed_name)
+
+        self.assertEqual(status, "200 OK")
+        self.assertEqual(headers["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(headers["Content-Type"], "text/javascript")
+        self.assertEqual(body, (self.root / self.hashed_name).read_bytes())
+
+    def test_precompressed_variant(self):
+        status, headers, body = self.request("/static/" + self.hashed_name, HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(body), (self.root / self.hashed_name).read_bytes())
+
+    def test_unhashed_file_is_revalidated(self):
+        status, headers, body = self.request("/static/js/like.js")
+        status, _, body = self.request("/static/js/like.js", HTTP_IF_NONE_MATCH=headers["ETag"])
+
+        self.assertEqual(headers["Cache-Control"], "no-cache")
+        self.assertEqual(status, "304 Not Modified")
+        self.assertEqual(body, b"")
+
+    def test_falls_through_to_django(self):
+        self.assertEqual(self.request("/static/js/missing.js")[2], b"django")
+        self.assertEqual(self.request("/static/../staticfiles.json")[2], b"django")
+        self.assertEqual(self.request("/tweets/home/")[2], b"django")
+
+    def test_templates_reference_hashed_assets(self):
+        self.assertEqual(check_templates_use_hashed_assets(), [])
+
+    def test_check_detects_hardcoded_static_url(self):
+        (self.root / "bad.html").write_text('<script src="/static/js/like.js"></script>{% static "js/nope.js" %}')
+        engine = dict(settings.TEMPLATES[0], DIRS=[self.root])
+        with override_settings(TEMPLATES=[engine]):
+            errors = check_templates_use_hashed_assets()
+
+        self.assertEqual({error.id for error in errors}, {"mysite.E001", "mysite.E002"})
+
+
+class TestResponseSize(TestCase):
+    # 100件のタイムラインの転送量の上限。増やすときは理由を書くこと
+    tweet_count = 100
+    html_budget_per_tweet = 260
+    gzip_budget = 7 * 1024
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.client.force_login(self.user)
+        Tweet.objects.bulk_create(
+            Tweet(user=self.user, content=hashlib.sha256(str(i).encode()).hexdigest()) for i in range(self.tweet_count)
+        )
+        self.content_bytes = sum(len(tweet.content) for tweet in Tweet.objects.all())
+        self.url = reverse("tweets:home")
+
+    def test_html_budget(self):
+        response = self.client.get(self.url)
+        markup_bytes = len(response.content) - self.content_bytes
+
+        self.assertNotIn("Content-Encoding", response)
+        self.assertLessEqual(markup_bytes / self.tweet_count, self.html_budget_per_tweet)
+
+    def test_gzip_budget(self):
+        plain = self.client.get(self.url).content
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertLessEqual(len(response.content), self.gzip_budget)
+        self.assertEqual(gzip.decompress(response.content), plain)
+
+    def test_small_response_is_not_compressed(self):
+        response = self.client.get(reverse("tweets:viewer_state"), HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_export_is_not_compressed_twice(self):
+        response = self.client.get(reverse("accounts:export"), HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(len(gzip.decompress(b"".join(response.streaming_content)).splitlines()), self.tweet_count)
+
+    def test_minify(self):
+        source = "<div>\n    {% if a %}\n    <p>x</p>\n\n    {% endif %}\n</div>\n"
+
+        self.assertEqual(minify(source), "<div>\n{% if a %}<p>x</p>\n{% endif %}</div>\n")
+
+
+class TestArchiveTweets(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.client.force_login(self.user)
+        self.old_tweet = Tweet.objects.create(user=self.user, content="oldcontent")
+        self.old_tweet.liked_by.add(self.user)
+        Tweet.objects.filter(pk=self.old_tweet.pk).update(created_at=timezone.now() - timedelta(days=400))
+        self.new_tweet = Tweet.objects.create(user=self.user, content="newcontent")
+
+    def test_archive_tweets_command(self):
+        call_command("archive_tweets", older_than_days=365, stdout=io.StringIO())
+
+        self.assertFalse(Tweet.objects.filter(pk=self.old_tweet.pk).exists())
+        self.assertTrue(Tweet.objects.filter(pk=self.new_tweet.pk).exists())
+        archived = ArchivedTweet.objects.get(pk=self.old_tweet.pk)
+        self.assertEqual(archived.content, "oldcontent")
+        self.assertEqual(archived.like_count, 1)
+        self.assertEqual(list(archived.likes.values_list("user_id", flat=True)), [self.user.pk])
+
+    def test_archived_likes_are_kept_per_liker(self):
+        other = User.objects.create_user(username="otheruser", email="test@test.com", password="testpassword")
+        self.old_tweet.liked_by.add(other)
+        call_command("archive_tweets", older_than_days=365, stdout=io.StringIO())
+
+        self.assertEqual(liked_among(self.user.pk, [self.old_tweet.pk]), {self.old_tweet.pk})
+        response = self.client.get(reverse("tweets:viewer_state"), {"tweets": str(self.old_tweet.pk)})
+        self.assertEqual(response.json()["liked"], [str(self.old_tweet.pk)])
+        self.assertEqual(response.json()["like_counts"], {str(self.old_tweet.pk): 2})
+        exported = [row for row in export_rows(other) if row["type"] == "like"]
+        self.assertEqual([(row["id"], row["username"]) for row in exported], [(self.old_tweet.pk, "testuser")])
+
+        like_count = ProfileSummary.objects.get(pk=self.user.pk).like_count
+        request_deletion(other)
+        call_command("process_deletions", stdout=io.StringIO())
+        archived = ArchivedTweet.objects.get(pk=self.old_tweet.pk)
+        self.assertEqual(archived.like_count, 1)
+        self.assertEqual(list(archived.likes.values_list("user_id", flat=True)), [self.user.pk])
+        self.assertEqual(ProfileSummary.objects.get(pk=self.user.pk).like_count, like_count - 1)
+
+    def test_archive_keeps_notifications(self):
+        other = User.objects.create_user(username="otheruser", email="test@test.com", password="testpassword")
+        notify(self.user.pk, Notification.Verb.LIKE, other.pk, tweet_id=self.old_tweet.pk)
+        call_command("archive_tweets", older_than_days=365, stdout=io.StringIO())
+
+        notification = Notification.objects.get(recipient=self.user)
+        self.assertEqual(notification.tweet_id, self.old_tweet.pk)
+        self.assertEqual(unread_count(self.user.pk), 1)
+
+    def test_detail_reads_through_archive(self):
+        call_command("archive_tweets", older_than_days=365, stdout=io.StringIO())
+        response = self.client.get(reverse("tweets:detail", args=[self.old_tweet.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "oldcontent")
+
+    def test_profile_reads_through_archive(self):
+        call_command("archive_tweets", older_than_days=365, stdout=io.StringIO())
+        response = self.client.get(reverse("accounts:user_profile", args=[self.user.username]))
+
+        tweet_list = response.context["tweet_list"]
+
+        self.assertEqual([tweet.pk for tweet in tweet_list], [self.new_tweet.pk, self.old_tweet.pk])
+
+
+class TestHashRing(TestCase):
+    def test_keys_are_spread_over_nodes(self):
+        ring = HashRing(["a", "b", "c"])
+        counts = {"a": 0, "b": 0, "c": 0}
+        for key in range(3000):
+            counts[ring.node_for(key)] += 1
+
+        for count in counts.values():
+            self.assertGreater(count, 700)
+
+    def test_adding_node_moves_only_its_share(self):
+        old = HashRing(["a", "b", "c"])
+        new = HashRing(["a", "b", "c", "d"])
+        moved = [key for key in range(3000) if old.node_for(key) != new.node_for(key)]
+
+        self.assertTrue(all(new.node_for(key) == "d" for key in moved))
+        self.assertLess(len(moved), 3000 * 0.35)
+
+
+@override_settings(JOBS_EAGER=True, TWEET_SHARDS=["shard_a", "shard_b"])
+class TestTweetSharding(TransactionTestCase):
+    shards = ["shard_a", "shard_b"]
+    # テストランナーが起動時に知らない別名なので，setUpClass で足してから __all__ で含める
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        # シャードごとに一時ファイルの SQLite を用意する
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        for alias in cls.shards:
+            connections.databases[alias] = {
+                **connections.databases["default"],
+                "NAME": str(Path(cls.tmpdir.name) / f"{alias}.sqlite3"),
+            }
+            call_command("migrate", database=alias, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in cls.shards:
+            connections[alias].close()
+            del connections.databases[alias]
+        cls.tmpdir.cleanup()
+
+    def setUp(self):
+        follow_graph.clear()
+        cache.clear()
+        self.users = [
+            User.objects.create_user(username=f"testuser{i}", email="test@test.com", password="testpassword")
+            for i in range(6)
+        ]
+        self.client.force_login(self.users[0])
+
+    def test_tweets_are_stored_on_author_shard(self):
+        tweets = [Tweet.objects.create(user=user, content="testcontent") for user in self.users]
+
+        self.assertEqual(len({tweet.pk for tweet in tweets}), len(tweets))
+        self.assertFalse(Tweet.objects.using("default").exists())
+        for tweet in tweets:
+            self.assertEqual(tweet._state.db, shard_for_user(tweet.user_id))
+        self.assertEqual({tweet._state.db for tweet in tweets}, set(self.shards))
+
+    def test_home_merges_shards(self):
+        tweets = [Tweet.objects.create(user=user, content="testcontent") for user in self.users]
+        response = self.client.get(reverse("tweets:home"))
+
+        self.assertEqual([tweet.pk for tweet in response.context["tweet_list"]], [tweet.pk for tweet in tweets][::-1])
+
+    def test_like_routes_by_author(self):
+        author = self.users[1]
+        tweet = Tweet.objects.create(user=author, content="testcontent")
+        other = next(user for user in self.users if shard_for_user(user.pk) != tweet._state.db)
+        url = reverse("tweets:like", args=[tweet.pk])
+
+        # 作者のシャードだけを読むので，違う作者を渡すと見つからない
+        self.assertEqual(self.client.post(f"{url}?author={other.pk}").status_code, 404)
+        self.assertEqual(self.client.post(f"{url}?author=x").status_code, 400)
+        self.assertEqual(self.client.post(f"{url}?author={author.pk}").json(), {"liked_by_count": 1})
+        self.assertEqual(self.client.post(f"{url}?author={author.pk}").json(), {"liked_by_count": 1})
+        unlike_url = reverse("tweets:unlike", args=[tweet.pk])
+        self.assertEqual(self.client.post(f"{unlike_url}?author={author.pk}").json(), {"liked_by_count": 0})
+
+    def test_like_detail_and_profile(self):
+        author = self.users[1]
+        tweet = Tweet.objects.create(user=author, content="testcontent")
+        response = self.client.post(reverse("tweets:like", args=[tweet.pk]))
+
+        self.assertEqual(response.json(), {"liked_by_count": 1})
+        self.assertEqual(Tweet.liked_by.through.objects.using(tweet._state.db).count(), 1)
+        self.assertEqual(author.notifications.get().tweet_id, tweet.pk)
+        response = self.client.get(reverse("tweets:viewer_state"), {"tweets": str(tweet.pk)})
+        self.assertEqual(response.json()["liked"], [str(tweet.pk)])
+        self.assertEqual(response.json()["like_counts"], {str(tweet.pk): 1})
+        self.assertContains(self.client.get(reverse("tweets:detail", args=[tweet.pk])), "testcontent")
+        response = self.client.get(reverse("accounts:user_profile", args=[author.username]))
+        self.assertEqual([t.pk for t in response.context["tweet_list"]], [tweet.pk])
+
+    def test_delete(self):
+        tweet = Tweet.objects.create(user=self.users[0], content="testcontent")
+        response = self.client.post(reverse("tweets:delete", args=[tweet.pk]))
+
+        self.assertRedirects(response, reverse("tweets:home"))
+        self.assertFalse(Tweet.objects.using(tweet._state.db).exists())
+
+    def test_export_import_and_delete_account(self):
+        user = self.users[0]
+        author = next(other for other in self.users if shard_for_user(other.pk) != shard_for_user(user.pk))
+        own = Tweet.objects.create(user=user, content="own")
+        liked = Tweet.objects.create(user=author, content="liked")
+        like(liked.pk, user.pk, using=liked._state.db)
+        like(own.pk, author.pk, using=own._state.db)
+
+        rows = [(row["type"], row["id"], row["username"]) for row in export_rows(user)]
+        self.assertEqual(rows, [("tweet", own.pk, ""), ("like", liked.pk, author.username)])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "dump.jsonl"
+            records = [
+                {"type": "user", "username": "imported"},
+                {"type": "tweet", "username": "imported", "content": "imported", "created_at": "2021-01-01T00:00:00Z"},
+            ]
+            path.write_text("".join(json.dumps(record) + "\n" for record in records))
+            call_command("import_dump", str(path), stdout=io.StringIO())
+        imported = User.objects.get(username="imported")
+        tweet = Tweet.objects.using(shard_for_user(imported.pk)).get(user=imported)
+        self.assertEqual(tweet.content, "imported")
+
+        request_deletion(user)
+        call_command("process_deletions", stdout=io.StringIO())
+        for alias in self.shards:
+            self.assertFalse(Tweet.objects.using(alias).filter(user_id=user.pk).exists())
+            self.assertFalse(Tweet.liked_by.through.objects.using(alias).filter(user_id=user.pk).exists())
+            self.assertFalse(Tweet.liked_by.through.objects.using(alias).filter(tweet_id=own.pk).exists())
+        self.assertEqual(Tweet.objects.using(liked._state.db).get(pk=liked.pk).like_count, 0)
+
+    def test_reshard_moves_rows_from_default(self):
+        with override_settings(TWEET_SHARDS=[]):
+            tweets = [Tweet.objects.create(user=user, content="testcontent") for user in self.users]
+            for tweet in tweets:
+                like(tweet.pk, self.users[0].pk)
+        call_command("reshard_tweets", "--sources", "default", stdout=io.StringIO())
+
+        self.assertFalse(Tweet.objects.using("default").exists())
+        self.assertFalse(Tweet.liked_by.through.objects.using("default").exists())
+        for tweet in tweets:
+            moved = Tweet.objects.using(shard_for_user(tweet.user_id)).get(pk=tweet.pk)
+            self.assertEqual(moved.created_at, tweet.created_at)
+            likes = Tweet.liked_by.through.objects.using(moved._state.db).filter(tweet_id=tweet.pk)
+            self.assertEqual(list(likes.values_list("user_id", flat=True)), [self.users[0].pk])
+        new_tweet = Tweet.objects.create(user=self.users[0], content="testcontent")
+        self.assertGreater(new_tweet.pk, max(tweet.pk for tweet in tweets))
+
+
+def generate_ids(worker_id, count=20000):
+    generator = snowflake.Snowflake(worker_id)
+    return [generator.next_id() for _ in range(count)]
+
+
+def worker_id_of(snowflake_id):
+    return (snowflake_id >> snowflake.SEQUENCE_BITS) & snowflake.MAX_WORKER_ID
+
+
+class TestSnowflake(TestCase):
+    def setUp(self):
+        # テストのトランザクションで借りた ID はロールバックで消えるので，テストごとに借り直す
+        snowflake._reset()
+        self.addCleanup(snowflake._reset)
+
+    def test_ids_are_time_ordered(self):
+        generator = snowflake.Snowflake(5)
+        ids = [generator.next_id() for _ in range(10000)]
+
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual((ids[0] >> snowflake.SEQUENCE_BITS) & snowflake.MAX_WORKER_ID, 5)
+        self.assertLess(abs(snowflake.id_to_datetime(ids[-1]) - timezone.now()), timedelta(seconds=5))
+
+    def test_waits_when_sequence_runs_out_or_clock_goes_back(self):
+        generator = snowflake.Snowflake(0)
+        now = 1_700_000_000_000
+        clock = [now] * (snowflake.MAX_SEQUENCE + 1) + [now - 5, now, now + 1, now + 1]
+        with mock.patch.object(snowflake, "_now_ms", side_effect=clock), mock.patch.object(snowflake.time, "sleep"):
+            ids = [generator.next_id() for _ in range(snowflake.MAX_SEQUENCE + 3)]
+
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual(ids[-2] >> snowflake.TIMESTAMP_SHIFT, now + 1 - snowflake.EPOCH_MS)
+
+    def test_no_collisions_across_processes(self):
+        with multiprocessing.get_context("fork").Pool(4) as pool:
+            results = pool.map(generate_ids, range(4))
+        ids = [pk for worker_ids in results for pk in worker_ids]
+
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_leases_distinct_worker_ids(self):
+        first = snowflake.lease_worker_id("host-a:1")
+        second = snowflake.lease_worker_id("host-b:1")
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(snowflake.lease_worker_id("host-a:1", first), first)
+
+    def test_expired_lease_is_taken_over(self):
+        SnowflakeLease.objects.bulk_create(
+            SnowflakeLease(worker_id=worker_id, owner="gone", expires_at=timezone.now() + timedelta(minutes=5))
+            for worker_id in range(snowflake.MAX_WORKER_ID + 1)
+        )
+        with self.assertRaises(RuntimeError):
+            snowflake.lease_worker_id("host-a:1")
+
+        SnowflakeLease.objects.filter(worker_id=3).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(snowflake.lease_worker_id("host-a:1"), 3)
+
+    def test_forked_process_leases_its_own_worker_id(self):
+        parent = worker_id_of(snowflake.next_id())
+        # fork した子プロセスで呼ばれるのと同じ
+        snowflake._reset()
+        child = worker_id_of(snowflake.next_id())
+
+        self.assertNotEqual(parent, child)
+        self.assertEqual(SnowflakeLease.objects.filter(worker_id__in=[parent, child]).count(), 2)
+
+    @override_settings(SNOWFLAKE_WORKER_ID=7)
+    def test_worker_id_setting(self):
+        self.assertEqual(worker_id_of(snowflake.next_id()), 7)
+
+        # 同じ ID を決めた別のプロセス (fork した子プロセスを含む) は失敗する
+        snowflake._reset()
+        with self.assertRaises(ImproperlyConfigured):
+            snowflake.next_id()
+
+
+class TestBloomFilter(TestCase):
+    def setUp(self):
+        like_filters.cache.clear()
+        follow_graph.clear()
+        self.user = User.objects.create_user(username="testuser1", email="test@test.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test@test.com", password="testpassword")
+        self.tweet = Tweet.objects.create(user=self.user2, content="testcontent")
+
+    def test_no_false_negatives_and_error_rate(self):
+        bloom = BloomFilter.build(range(1000), 0.01)
+        restored = BloomFilter.from_bytes(bloom.to_bytes())
+        false_positives = sum(key in restored for key in range(1000, 11000))
+
+        self.assertTrue(all(key in restored for key in range(1000)))
+        self.assertLess(false_positives / 10000, 0.03)
+        self.assertLess(len(bloom.to_bytes()), 1300)
+
+    def test_not_liked_without_query(self):
+        like_filters.get(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(liked_among(self.user.pk, [self.tweet.pk]), set())
+
+    def test_updated_after_like(self):
+        self.assertEqual(liked_among(self.user.pk, [self.tweet.pk]), set())
+        # いいねしてもフィルタを全件から作り直さない
+        with mock.patch.object(like_filters, "load") as load:
+            like(self.tweet.pk, self.user.pk)
+            with self.assertNumQueries(1):
+                self.assertEqual(liked_among(self.user.pk, [self.tweet.pk]), {self.tweet.pk})
+        load.assert_not_called()
+
+        other = Tweet.objects.create(user=self.user2, content="testcontent")
+        other.liked_by.add(self.user)
+        self.assertEqual(liked_among(self.user.pk, [self.tweet.pk, other.pk]), {self.tweet.pk, other.pk})
+
+        unlike(self.tweet.pk, self.user.pk)
+        self.assertEqual(liked_among(self.user.pk, [self.tweet.pk, other.pk]), {other.pk})
+
+    def test_follow(self):
+        with self.assertNumQueries(1):
+            self.assertFalse(is_following(self.user.pk, self.user2.pk))
+        follow(self.user.pk, self.user2.pk)
+        self.assertTrue(is_following(self.user.pk, self.user2.pk))
+
+        user3 = User.objects.create_user(username="testuser3", email="test@test.com", password="testpassword")
+        follow_filters.get(self.user.pk)
+        FriendShip.objects.create(following=self.user, follower=user3)
+        self.assertTrue(is_following(self.user.pk, user3.pk))
+
+    @override_settings(BLOOM_FILTER_CACHE=None)
+    def test_disabled(self):
+        self.assertIsNone(like_filters.get(self.user.pk))
+        like(self.tweet.pk, self.user.pk)
+        self.assertEqual(liked_among(self.user.pk, [self.tweet.pk]), {self.tweet.pk})
+        follow(self.user.pk, self.user2.pk)
+        self.assertTrue(is_following(self.user.pk, self.user2.pk))
+
+
+class TestTweetBody(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test@test.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test@test.com", password="testpassword")
+
+    def test_same_content_stored_once(self):
+        content = "spam " * 50
+        first = Tweet.objects.create(user=self.user1, content=content)
+        Tweet.objects.bulk_create([Tweet(user=self.user2, content=content), Tweet(user=self.user2, content="other")])
+        body = TweetBody.objects.get(tweets=first)
+
+        self.assertEqual(TweetBody.objects.count(), 2)
+        self.assertEqual(Tweet.objects.filter(body=body).count(), 2)
+        self.assertTrue(body.compressed)
+        self.assertLess(len(body.data), len(content))
+        self.assertEqual(Tweet.objects.get(pk=first.pk).content, content)
+        self.assertEqual(Tweet.objects.get(content="other").user, self.user2)
+
+    def test_duplicate_post_rejected(self):
+        self.client.force_login(self.user1)
+        self.client.post(reverse("tweets:create"), {"content": "testcontent"})
+        response = self.client.post(reverse("tweets:create"), {"content": "testcontent"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("同じ内容のツイートを続けて投稿することはできません", response.context["form"].errors["content"])
+        self.assertEqual(Tweet.objects.filter(user=self.user1).count(), 1)
+
+        self.client.force_login(self.user2)
+        response = self.client.post(reverse("tweets:create"), {"content": "testcontent"})
+        self.assertEqual(response.status_code, 302)
+        with override_settings(TWEET_DUPLICATE_WINDOW=0):
+            response = self.client.post(reverse("tweets:create"), {"content": "testcontent"})
+        self.assertEqual(response.status_code, 302)
+
+    def test_report_command(self):
+        Tweet.objects.bulk_create([Tweet(user=self.user1, content="x" * 100) for _ in range(10)])
+        Tweet.objects.create(user=self.user1, content="deleted").delete()
+        stdout = io.StringIO()
+        call_command("tweet_body_report", "--prune", stdout=stdout)
+        output = stdout.getvalue()
+
+        self.assertIn("default: 10 tweets, 1 bodies (1 unreferenced, pruned)", output)
+        self.assertIn("inline:       1,000 bytes", output)
+        self.assertIn("deduplicated: 100 bytes", output)
+        self.assertEqual(TweetBody.objects.count(), 1)
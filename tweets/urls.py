@@ -7,6 +7,7 @@ app_name = "tweets"
 urlpatterns = [
     path("home/", views.HomeView.as_view(), name="home"),
     path("create/", views.TweetCreateView.as_view(), name="create"),
+    path("viewer_state/", views.ViewerStateView.as_view(), name="viewer_state"),
     path("<int:pk>/", views.TweetDetailView.as_view(), name="detail"),
     path("<int:pk>/delete/", views.TweetDeleteView.as_view(), name="delete"),
     path("<int:pk>/like/", views.LikeView.as_view(), name="like"),
@@ -1,21 +1,55 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
-from django.urls import reverse_lazy
+from django.db.models import Q
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
+from django.middleware.csrf import get_token
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import add_never_cache_headers
+from django.utils.decorators import method_decorator
 from django.views.generic import CreateView, DeleteView, DetailView, ListView, View
 
+from accounts.services import is_following
+from accounts.tasks import forget_deleted_tweet
+from mysite.decorators import public_page
+
+from .archive import get_tweet
 from .forms import TweetCreateForm
-from .models import Tweet
+from .models import ArchivedTweet, Tweet
+from .services import is_duplicate, like, liked_among, unlike
+from .sharding import attach_users, locate, merge_recent, shard_aliases
+from .tasks import refresh_like_count
+
+User = get_user_model()
 
 
 class HomeView(LoginRequiredMixin, ListView):
     template_name = "tweets/home.html"
     model = Tweet
+    page_size = 50
+
+    def get(self, request, *args, **kwargs):
+        try:
+            self.before = int(request.GET["before"]) if "before" in request.GET else None
+        except ValueError:
+            return HttpResponseBadRequest()
+        return super().get(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["tweet_list"] = self.model.objects.select_related("user").prefetch_related("liked_by")
-        context["liking_tweet_list"] = self.request.user.liking.all()
+        # id は時刻順なので，新しい順に並べるのも続きを読むのも id だけで済む。次のページがあるか判定するため1件多く取る
+        page = Q(pk__lt=self.before) if self.before is not None else Q()
+        limit = self.page_size + 1
+        if settings.TWEET_SHARDS:
+            tweets = merge_recent([self.model.objects.using(alias).filter(page) for alias in shard_aliases()], limit)
+        else:
+            tweets = self.model.objects.select_related("user").filter(page, user__is_active=True)
+            tweets = list(tweets.order_by("-pk")[:limit])
+        if len(tweets) > self.page_size:
+            context["next_cursor"] = tweets[self.page_size - 1].pk
+        tweets = tweets[: self.page_size]
+        context["tweet_list"] = attach_users(tweets, is_active=True) if settings.TWEET_SHARDS else tweets
+        context["liked_tweet_ids"] = liked_among(self.request.user.pk, [tweet.pk for tweet in context["tweet_list"]])
         return context
 
 
@@ -25,18 +59,76 @@ class TweetCreateView(LoginRequiredMixin, CreateView):
     success_url = reverse_lazy("tweets:home")
 
     def form_valid(self, form):
+        if is_duplicate(self.request.user.pk, form.cleaned_data["content"]):
+            form.add_error("content", "同じ内容のツイートを続けて投稿することはできません")
+            return self.form_invalid(form)
         form.instance.user = self.request.user
         return super().form_valid(form)
 
 
-class TweetDetailView(LoginRequiredMixin, DetailView):
-    template_name = "tweets/detail.html"
-    model = Tweet
+def tweet_detail_etag(request, pk):
+    # 本文は作成後に変わらないので，いいね数だけを見る
+    if settings.TWEET_SHARDS:
+        tweet = get_tweet(pk, user__is_active=True)
+        row = None if tweet is None else (tweet.created_at, tweet.like_count)
+    else:
+        row = Tweet.objects.filter(pk=pk, user__is_active=True).values_list("created_at", "like_count").first()
+    if row is None:
+        return None
+    created_at, like_count = row
+    return f"tweet-{pk}-{created_at.timestamp()}-{like_count}"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context["liking_tweet_list"] = self.request.user.liking.all()
-        return context
+
+@method_decorator(public_page(tweet_detail_etag), name="get")
+class TweetDetailView(DetailView):
+    # 誰が見ても同じ内容を返し，いいねの状態や削除リンクは like.js が viewer_state から取得する
+    template_name = "tweets/detail.html"
+    context_object_name = "tweet"
+
+    def get_object(self, queryset=None):
+        tweet = get_tweet(self.kwargs["pk"], user__is_active=True)
+        if tweet is None:
+            raise Http404
+        return tweet
+
+
+class ViewerStateView(View):
+    max_tweets = 100
+
+    def get(self, request, *args, **kwargs):
+        try:
+            tweet_ids = [int(pk) for pk in request.GET.get("tweets", "").split(",") if pk][: self.max_tweets]
+        except ValueError:
+            return HttpResponseBadRequest()
+        # アーカイブしたツイートもいいね数といいね済みかを返す
+        tweets = [
+            row
+            for alias in shard_aliases()
+            for model in (Tweet, ArchivedTweet)
+            for row in model.objects.using(alias).filter(pk__in=tweet_ids).values_list("pk", "like_count", "user_id")
+        ]
+        # 64bit の id は JavaScript の Number では丸められるので文字列で返す
+        data = {
+            "authenticated": request.user.is_authenticated,
+            "like_counts": {str(pk): like_count for pk, like_count, _ in tweets},
+        }
+        if request.user.is_authenticated:
+            get_token(request)
+            liked = liked_among(request.user.pk, [pk for pk, _, _ in tweets])
+            own = [pk for pk, _, user_id in tweets if user_id == request.user.pk]
+            data.update(
+                username=request.user.username,
+                profile_url=reverse("accounts:user_profile", args=[request.user.username]),
+                liked=[str(pk) for pk in liked],
+                own_tweets=[str(pk) for pk in own],
+            )
+            target_id = User.objects.filter(username=request.GET.get("user")).values_list("pk", flat=True).first()
+            if target_id is not None:
+                data["is_self"] = target_id == request.user.pk
+                data["following"] = is_following(request.user.pk, target_id)
+        response = JsonResponse(data)
+        add_never_cache_headers(response)
+        return response
 
 
 class TweetDeleteView(UserPassesTestMixin, DeleteView):
@@ -44,23 +136,51 @@ class TweetDeleteView(UserPassesTestMixin, DeleteView):
     model = Tweet
     success_url = reverse_lazy("tweets:home")
 
-    def test_func(self):
-        return self.request.user == self.get_object().user
+    def get_object(self, queryset=None):
+        tweet = locate(Tweet, self.kwargs["pk"])
+        if tweet is None:
+            raise Http404
+        return tweet
 
+    def test_func(self):
+        return self.get_object().user_id == self.request.user.pk
 
-class LikeView(LoginRequiredMixin, View):
-    def post(self, request, *args, **kwargs):
-        tweet = get_object_or_404(Tweet, pk=self.kwargs["pk"])
-        tweet.liked_by.add(self.request.user)
+    def form_valid(self, form):
+        # delete() のあとは pk が None になるので先に控えておく
+        tweet = self.object
+        user_id, tweet_id = tweet.user_id, tweet.pk
+        like_count = Tweet.liked_by.through.objects.using(tweet._state.db).filter(tweet_id=tweet_id).count()
+        response = super().form_valid(form)
+        forget_deleted_tweet.delay(user_id=user_id, tweet_id=tweet_id, like_count=like_count)
+        return response
 
-        data = {"liked_by_count": tweet.liked_by.count()}
-        return JsonResponse(data)
 
+class LikeMixin(LoginRequiredMixin):
+    # like.js は ?author= にツイートの作者の ID を付けるので，各シャードを探さずに作者のシャードを主キーで読む。
+    # 件数は数えず，jobs が更新する like_count に今回の分を足して返す
+    delta = 1
 
-class UnlikeView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
-        tweet = get_object_or_404(Tweet, pk=self.kwargs["pk"])
-        tweet.liked_by.remove(self.request.user)
-
-        data = {"liked_by_count": tweet.liked_by.count()}
-        return JsonResponse(data)
+        try:
+            author_id = int(request.GET["author"]) if "author" in request.GET else None
+        except ValueError:
+            return HttpResponseBadRequest()
+        tweet = locate(Tweet, self.kwargs["pk"], user_id=author_id)
+        if tweet is None:
+            raise Http404
+        like_count = tweet.like_count
+        if self.change(tweet.pk, self.request.user.pk, using=tweet._state.db):
+            refresh_like_count.delay(
+                tweet_id=tweet.pk, actor_id=self.request.user.pk, delta=self.delta, author_id=tweet.user_id
+            )
+            like_count = max(like_count + self.delta, 0)
+        return JsonResponse({"liked_by_count": like_count})
+
+
+class LikeView(LikeMixin, View):
+    change = staticmethod(like)
+
+
+class UnlikeView(LikeMixin, View):
+    change = staticmethod(unlike)
+    delta = -1